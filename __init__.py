@@ -1,22 +1,70 @@
 """The ATEM Switcher integration with services."""
 from __future__ import annotations
 
+import asyncio
 import logging
+from typing import Awaitable, Callable, List, Optional
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers import selector
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
-from .coordinator import AtemDataUpdateCoordinator
+from .asrun import FORMAT_CSV, FORMAT_JSON, remove_log
+from .client import AtemCommand
+from .const import DEFAULT_FRAME_RATE, DOMAIN
+from .coordinator import (
+    STORAGE_VERSION,
+    AtemDataUpdateCoordinator,
+    asrun_path,
+    storage_key,
+)
+from .targets import (
+    TARGET_FIELDS,
+    async_get_target_index,
+    async_release_target_index,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 # Plateformes supportées
-PLATFORMS: list[Platform] = [Platform.SENSOR]
+PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.SELECT, Platform.BINARY_SENSOR]
+
+# Actions du service run_sequence -> commande ATEM
+SEQUENCE_ACTIONS = {
+    "cut": "DCut",
+    "auto": "DAut",
+    "program": "CPgI",
+    "preview": "CPvI",
+    "aux": "CAuS",
+}
+# Actions qui demandent une entrée
+SEQUENCE_INPUT_ACTIONS = ("program", "preview", "aux")
+
+# Transitions du service synchronized_transition -> commande ATEM
+SYNC_TRANSITIONS = {
+    "cut": "DCut",
+    "auto": "DAut",
+}
+
+# Dossier des exports du journal de diffusion, sous le dossier de configuration
+ASRUN_EXPORT_DIR = (DOMAIN, "asrun")
+
+# M/E ciblé par les services (0 à 3 selon le modèle)
+ME_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=0, max=3))
+
+SEQUENCE_STEP_SCHEMA = vol.Schema({
+    vol.Required("action"): vol.In(list(SEQUENCE_ACTIONS)),
+    vol.Optional("me", default=0): ME_SCHEMA,
+    vol.Optional("aux", default=0): vol.All(vol.Coerce(int), vol.Range(min=0, max=23)),
+    vol.Optional("input"): cv.string,
+    vol.Optional("delay_frames", default=0): vol.All(
+        vol.Coerce(int), vol.Range(min=0, max=10000)
+    ),
+})
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -34,18 +82,32 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Transfère la configuration aux plateformes
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
+    # Indexer l'appareil et les entités pour le ciblage des services
+    async_get_target_index(hass).async_add(entry.entry_id, coordinator)
+    
     # Enregistrer les services si pas déjà fait
     await async_setup_services(hass)
+
+    # Recharger l'entrée quand les options changent
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     
     return True
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Recharge l'entrée après une modification des options."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Décharge une entrée de configuration."""
     # Décharger les plateformes
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     
     if unload_ok:
+        # Plus aucun service ne doit être routé vers cette entrée
+        async_get_target_index(hass).async_remove(entry.entry_id)
+        
         # Récupérer et arrêter le coordinator
         coordinator = hass.data[DOMAIN][entry.entry_id]
         await coordinator.async_shutdown()
@@ -56,13 +118,20 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         # Si c'était la dernière instance, nettoyer complètement
         if not hass.data[DOMAIN]:
             hass.data.pop(DOMAIN)
+            async_release_target_index(hass)
             # Désenregistrer les services
-            for service_name in ["perform_cut", "set_program_input", "set_preview_input", "auto_transition"]:
+            for service_name in ["perform_cut", "set_program_input", "set_preview_input", "auto_transition", "run_sequence", "synchronized_transition", "export_as_run"]:
                 hass.services.async_remove(DOMAIN, service_name)
     
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Supprime l'instantané et le journal de diffusion d'une entrée supprimée."""
+    await Store(hass, STORAGE_VERSION, storage_key(entry.entry_id)).async_remove()
+    await hass.async_add_executor_job(remove_log, asrun_path(hass, entry.entry_id))
+
+
 async def async_setup_services(hass: HomeAssistant) -> None:
     """Configure les services de l'intégration."""
     
@@ -70,153 +139,350 @@ async def async_setup_services(hass: HomeAssistant) -> None:
     if hass.services.has_service(DOMAIN, "perform_cut"):
         return
     
-    async def get_coordinator() -> AtemDataUpdateCoordinator:
-        """Get the first available coordinator."""
-        if DOMAIN in hass.data and hass.data[DOMAIN]:
-            # Retourne le premier coordinator disponible
-            entry_id = next(iter(hass.data[DOMAIN]))
-            return hass.data[DOMAIN][entry_id]
-        raise ValueError("No ATEM coordinator available")
+    index = async_get_target_index(hass)
     
-    async def handle_perform_cut(call: ServiceCall) -> None:
+    def targeted(
+        action: str,
+        handler: Callable[[AtemDataUpdateCoordinator, ServiceCall], Awaitable[None]],
+    ) -> Callable[[ServiceCall], Awaitable[None]]:
+        """Route a service call to its target switchers, in parallel."""
+        async def handle(call: ServiceCall) -> None:
+            try:
+                coordinators = index.async_resolve(call)
+            except ValueError as e:
+                _LOGGER.error(f"Error {action}: {e}")
+                return
+            
+            async def run(coordinator: AtemDataUpdateCoordinator) -> None:
+                try:
+                    await handler(coordinator, call)
+                except Exception as e:
+                    _LOGGER.error(f"Error {action} on {coordinator.atem_ip}: {e}")
+            
+            await asyncio.gather(*(run(coordinator) for coordinator in coordinators))
+        
+        return handle
+    
+    def valid_me(coordinator: AtemDataUpdateCoordinator, me: int) -> bool:
+        """Check that the switcher has the requested M/E."""
+        if me < coordinator.topology[0]:
+            return True
+        _LOGGER.error(f"ATEM {coordinator.atem_ip} has no M/E {me + 1}")
+        return False
+    
+    def valid_aux(coordinator: AtemDataUpdateCoordinator, aux: int) -> bool:
+        """Check that the switcher has the requested aux output."""
+        if aux < coordinator.topology[1]:
+            return True
+        _LOGGER.error(f"ATEM {coordinator.atem_ip} has no aux {aux + 1}")
+        return False
+    
+    async def handle_perform_cut(coordinator: AtemDataUpdateCoordinator, call: ServiceCall) -> None:
         """Gère le service perform_cut."""
-        try:
-            coordinator = await get_coordinator()
-            if coordinator.switcher.connected:
-                await hass.async_add_executor_job(
-                    coordinator.switcher.execCutME,
-                    0
-                )
-                # Forcer une mise à jour
-                await coordinator.async_request_refresh()
-                _LOGGER.info("Cut performed successfully")
-            else:
-                _LOGGER.error("Cannot perform cut: ATEM not connected")
-        except Exception as e:
-            _LOGGER.error(f"Error performing cut: {e}")
+        me = call.data["me"]
+        if not valid_me(coordinator, me):
+            return
+        if coordinator.client.connected:
+            await coordinator.async_switch([AtemCommand("DCut", me)])
+            _LOGGER.info(f"Cut performed successfully on {coordinator.atem_ip}")
+        else:
+            _LOGGER.error(f"Cannot perform cut: ATEM {coordinator.atem_ip} not connected")
     
-    async def handle_set_program_input(call: ServiceCall) -> None:
+    async def handle_set_program_input(coordinator: AtemDataUpdateCoordinator, call: ServiceCall) -> None:
         """Gère le service set_program_input."""
-        try:
-            coordinator = await get_coordinator()
-            
-            # Récupérer l'input depuis les données du service
-            input_value = call.data.get("input")
-            
-            # Si c'est une string, essayer de trouver le numéro correspondant
-            if isinstance(input_value, str):
-                # Chercher dans les inputs disponibles
-                if coordinator.data and "available_inputs" in coordinator.data:
-                    for num, name in coordinator.data["available_inputs"].items():
-                        if name == input_value:
-                            input_value = num
-                            break
-                else:
-                    # Essayer de parser comme un nombre
-                    try:
-                        input_value = int(input_value)
-                    except ValueError:
-                        _LOGGER.error(f"Invalid input value: {input_value}")
-                        return
-            
-            if coordinator.switcher.connected:
-                await hass.async_add_executor_job(
-                    coordinator.switcher.setProgramInputVideoSource,
-                    0,  # M/E index
-                    input_value
-                )
-                await coordinator.async_request_refresh()
-                _LOGGER.info(f"Program input set to: {input_value}")
-            else:
-                _LOGGER.error("Cannot set program input: ATEM not connected")
-        except Exception as e:
-            _LOGGER.error(f"Error setting program input: {e}")
+        me = call.data["me"]
+        if not valid_me(coordinator, me):
+            return
+        
+        # Numéro, nom long, nom court ou alias du modèle
+        input_value = coordinator.inputs.resolve(call.data.get("input"))
+        if input_value is None:
+            _LOGGER.error(f"Invalid input value for {coordinator.atem_ip}: {call.data.get('input')}")
+            return
+        
+        if coordinator.client.connected:
+            await coordinator.async_switch([
+                AtemCommand("CPgI", me, input_value)
+            ])
+            _LOGGER.info(f"Program input of {coordinator.atem_ip} set to: {input_value}")
+        else:
+            _LOGGER.error(f"Cannot set program input: ATEM {coordinator.atem_ip} not connected")
     
-    async def handle_set_preview_input(call: ServiceCall) -> None:
+    async def handle_set_preview_input(coordinator: AtemDataUpdateCoordinator, call: ServiceCall) -> None:
         """Gère le service set_preview_input."""
-        try:
-            coordinator = await get_coordinator()
-            
-            # Récupérer l'input depuis les données du service
-            input_value = call.data.get("input")
-            
-            # Si c'est une string, essayer de trouver le numéro correspondant
-            if isinstance(input_value, str):
-                # Chercher dans les inputs disponibles
-                if coordinator.data and "available_inputs" in coordinator.data:
-                    for num, name in coordinator.data["available_inputs"].items():
-                        if name == input_value:
-                            input_value = num
-                            break
-                else:
-                    # Essayer de parser comme un nombre
-                    try:
-                        input_value = int(input_value)
-                    except ValueError:
-                        _LOGGER.error(f"Invalid input value: {input_value}")
-                        return
-            
-            if coordinator.switcher.connected:
-                await hass.async_add_executor_job(
-                    coordinator.switcher.setPreviewInputVideoSource,
-                    0,  # M/E index
-                    input_value
-                )
-                await coordinator.async_request_refresh()
-                _LOGGER.info(f"Preview input set to: {input_value}")
-            else:
-                _LOGGER.error("Cannot set preview input: ATEM not connected")
-        except Exception as e:
-            _LOGGER.error(f"Error setting preview input: {e}")
+        me = call.data["me"]
+        if not valid_me(coordinator, me):
+            return
+        
+        # Numéro, nom long, nom court ou alias du modèle
+        input_value = coordinator.inputs.resolve(call.data.get("input"))
+        if input_value is None:
+            _LOGGER.error(f"Invalid input value for {coordinator.atem_ip}: {call.data.get('input')}")
+            return
+        
+        if coordinator.client.connected:
+            await coordinator.async_switch([
+                AtemCommand("CPvI", me, input_value)
+            ])
+            _LOGGER.info(f"Preview input of {coordinator.atem_ip} set to: {input_value}")
+        else:
+            _LOGGER.error(f"Cannot set preview input: ATEM {coordinator.atem_ip} not connected")
     
-    async def handle_auto_transition(call: ServiceCall) -> None:
+    async def handle_auto_transition(coordinator: AtemDataUpdateCoordinator, call: ServiceCall) -> None:
         """Gère le service auto_transition."""
+        me = call.data["me"]
+        if not valid_me(coordinator, me):
+            return
+        if coordinator.client.connected:
+            await coordinator.async_switch([AtemCommand("DAut", me)])
+            _LOGGER.info(f"Auto transition performed successfully on {coordinator.atem_ip}")
+        else:
+            _LOGGER.error(f"Cannot perform auto transition: ATEM {coordinator.atem_ip} not connected")
+    
+    async def handle_run_sequence(coordinator: AtemDataUpdateCoordinator, call: ServiceCall) -> None:
+        """Gère le service run_sequence."""
+        frame_duration = 1 / call.data["frame_rate"]
+        
+        # Tout est validé et résolu avant d'envoyer la moindre commande ;
+        # les noms d'entrées sont propres à chaque mélangeur
+        steps = []
+        for step in call.data["steps"]:
+            action = step["action"]
+            source = 0
+            if action in SEQUENCE_INPUT_ACTIONS:
+                source = coordinator.inputs.resolve(step.get("input", ""))
+                if source is None:
+                    _LOGGER.error(
+                        f"Invalid input value in sequence for {coordinator.atem_ip}: {step.get('input')}"
+                    )
+                    return
+            if action == "aux":
+                if not valid_aux(coordinator, step["aux"]):
+                    return
+            elif not valid_me(coordinator, step["me"]):
+                return
+            index = step["aux"] if action == "aux" else step["me"]
+            steps.append((
+                step["delay_frames"] * frame_duration,
+                AtemCommand(SEQUENCE_ACTIONS[action], index, source),
+            ))
+        
+        if coordinator.client.connected:
+            await coordinator.async_run_sequence(steps)
+            _LOGGER.info(f"Sequence of {len(steps)} steps performed successfully on {coordinator.atem_ip}")
+        else:
+            _LOGGER.error(f"Cannot run sequence: ATEM {coordinator.atem_ip} not connected")
+    
+    async def handle_synchronized_transition(call: ServiceCall) -> ServiceResponse:
+        """Gère le service synchronized_transition."""
+        transition = call.data["transition"]
+        me = call.data["me"]
+        response = {"transition": transition, "me": me, "released": False}
         try:
-            coordinator = await get_coordinator()
-            if coordinator.switcher.connected:
-                await hass.async_add_executor_job(
-                    coordinator.switcher.execAutoME,
-                    0  # M/E index
-                )
-                await coordinator.async_request_refresh()
-                _LOGGER.info("Auto transition performed successfully")
+            coordinators = index.async_resolve(call)
+        except ValueError as e:
+            _LOGGER.error(f"Error running synchronized transition: {e}")
+            return {**response, "error": str(e)}
+        
+        # Aucun mélangeur ne part si l'un d'eux n'est pas prêt
+        offline = [c.atem_ip for c in coordinators if not c.connection.alive]
+        if offline:
+            _LOGGER.error(f"Cannot run synchronized transition: ATEM {', '.join(offline)} not connected")
+            return {**response, "error": f"Not connected: {', '.join(offline)}"}
+        missing = [c.atem_ip for c in coordinators if me >= c.topology[0]]
+        if missing:
+            _LOGGER.error(f"Cannot run synchronized transition: ATEM {', '.join(missing)} has no M/E {me + 1}")
+            return {**response, "error": f"No M/E {me + 1}: {', '.join(missing)}"}
+        
+        # Chaque coordinateur prépare sa commande puis attend le signal commun
+        command = AtemCommand(SYNC_TRANSITIONS[transition], me)
+        release = asyncio.Event()
+        tasks = [
+            hass.async_create_task(coordinator.async_synchronized_switch([command], release))
+            for coordinator in coordinators
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Instants relatifs à la première libération (ms)
+        timings = [result for result in results if not isinstance(result, BaseException)]
+        origin = min((released for released, _, _ in timings), default=0.0)
+        
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round((value - origin) * 1000, 3)
+        
+        def spread(values: List[Optional[float]]) -> Optional[float]:
+            if not values or None in values:
+                return None
+            return round((max(values) - min(values)) * 1000, 3)
+        
+        switchers = {}
+        for coordinator, result in zip(coordinators, results):
+            if isinstance(result, BaseException):
+                _LOGGER.error(f"Error running synchronized transition on {coordinator.atem_ip}: {result}")
+                switchers[coordinator.atem_ip] = {"error": str(result)}
+                continue
+            released, dispatched, echoed = result
+            switchers[coordinator.atem_ip] = {
+                "released_ms": ms(released),
+                "dispatched_ms": ms(dispatched),
+                "echo_ms": ms(echoed),
+            }
+        
+        dispatch_skew = spread([dispatched for _, dispatched, _ in timings])
+        echo_skew = spread([echoed for _, _, echoed in timings])
+        confirmed = len(timings) == len(results) and all(echoed is not None for _, _, echoed in timings)
+        _LOGGER.info(
+            f"Synchronized {transition} on {len(coordinators)} switcher(s): "
+            f"dispatch skew {dispatch_skew} ms, echo skew {echo_skew} ms"
+        )
+        return {
+            **response,
+            "released": True,
+            "confirmed": confirmed,
+            "dispatch_skew_ms": dispatch_skew,
+            "echo_skew_ms": echo_skew,
+            "switchers": switchers,
+        }
+    
+    async def handle_export_as_run(call: ServiceCall) -> ServiceResponse:
+        """Gère le service export_as_run."""
+        file_format = call.data["format"]
+        # Les dates sans fuseau (sélecteur de l'interface) sont dans celui de HA
+        start = dt_util.as_utc(call.data["start"]).timestamp()
+        end = dt_util.as_utc(call.data.get("end") or dt_util.utcnow()).timestamp()
+        try:
+            coordinators = index.async_resolve(call)
+        except ValueError as e:
+            _LOGGER.error(f"Error exporting as-run log: {e}")
+            return {"error": str(e)}
+        
+        # Un fichier par mélangeur, dans un dossier réservé aux exports
+        filename = call.data.get("filename")
+        stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+        exports = {}
+        for coordinator in coordinators:
+            host = coordinator.atem_ip.replace(":", "_")
+            if filename is None:
+                name = f"atem_asrun_{host}_{stamp}.{file_format}"
+            elif len(coordinators) > 1:
+                stem, dot, ext = filename.rpartition(".")
+                name = f"{stem}_{host}.{ext}" if dot else f"{filename}_{host}"
             else:
-                _LOGGER.error("Cannot perform auto transition: ATEM not connected")
-        except Exception as e:
-            _LOGGER.error(f"Error performing auto transition: {e}")
+                name = filename
+            path = hass.config.path(*ASRUN_EXPORT_DIR, name)
+            if not await hass.async_add_executor_job(hass.config.is_allowed_path, path):
+                error = (
+                    f"Cannot write {path}: add {hass.config.path(*ASRUN_EXPORT_DIR)} "
+                    "to allowlist_external_dirs"
+                )
+                _LOGGER.error(f"Error exporting as-run log of {coordinator.atem_ip}: {error}")
+                exports[coordinator.atem_ip] = {"error": error}
+                continue
+            try:
+                # Un fichier existant n'est jamais écrasé
+                count = await coordinator.asrun.async_export(start, end, path, file_format)
+            except FileExistsError:
+                error = f"{path} already exists"
+                _LOGGER.error(f"Error exporting as-run log of {coordinator.atem_ip}: {error}")
+                exports[coordinator.atem_ip] = {"error": error}
+                continue
+            except OSError as e:
+                _LOGGER.error(f"Error exporting as-run log of {coordinator.atem_ip}: {e}")
+                exports[coordinator.atem_ip] = {"error": str(e)}
+                continue
+            _LOGGER.info(f"Exported {count} as-run events of {coordinator.atem_ip} to {path}")
+            exports[coordinator.atem_ip] = {"path": path, "events": count}
+        return {"exports": exports}
     
     # Enregistrer les services
     hass.services.async_register(
         DOMAIN, 
         "perform_cut", 
-        handle_perform_cut,
-        schema=vol.Schema({})
+        targeted("performing cut", handle_perform_cut),
+        schema=vol.Schema({
+            **TARGET_FIELDS,
+            vol.Optional("me", default=0): ME_SCHEMA,
+        })
     )
     
     # Service avec paramètre input (nombre ou string)
     hass.services.async_register(
         DOMAIN,
         "set_program_input",
-        handle_set_program_input,
+        targeted("setting program input", handle_set_program_input),
         schema=vol.Schema({
-            vol.Required("input"): cv.string
+            **TARGET_FIELDS,
+            vol.Required("input"): cv.string,
+            vol.Optional("me", default=0): ME_SCHEMA,
         })
     )
     
     hass.services.async_register(
         DOMAIN,
         "set_preview_input",
-        handle_set_preview_input,
+        targeted("setting preview input", handle_set_preview_input),
         schema=vol.Schema({
-            vol.Required("input"): cv.string
+            **TARGET_FIELDS,
+            vol.Required("input"): cv.string,
+            vol.Optional("me", default=0): ME_SCHEMA,
         })
     )
     
     hass.services.async_register(
         DOMAIN,
         "auto_transition",
-        handle_auto_transition,
-        schema=vol.Schema({})
+        targeted("performing auto transition", handle_auto_transition),
+        schema=vol.Schema({
+            **TARGET_FIELDS,
+            vol.Optional("me", default=0): ME_SCHEMA,
+        })
+    )
+    
+    # Liste ordonnée d'opérations envoyées d'un bloc
+    hass.services.async_register(
+        DOMAIN,
+        "run_sequence",
+        targeted("running sequence", handle_run_sequence),
+        schema=vol.Schema({
+            **TARGET_FIELDS,
+            vol.Required("steps"): vol.All(
+                cv.ensure_list, vol.Length(min=1), [SEQUENCE_STEP_SCHEMA]
+            ),
+            vol.Optional("frame_rate", default=DEFAULT_FRAME_RATE): vol.All(
+                vol.Coerce(float), vol.Range(min=1, max=120)
+            ),
+        })
+    )
+    
+    # Cut/auto lâchés ensemble sur plusieurs mélangeurs, avec mesure des écarts
+    hass.services.async_register(
+        DOMAIN,
+        "synchronized_transition",
+        handle_synchronized_transition,
+        schema=vol.Schema({
+            **TARGET_FIELDS,
+            vol.Optional("transition", default="cut"): vol.In(list(SYNC_TRANSITIONS)),
+            vol.Optional("me", default=0): ME_SCHEMA,
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    
+    # Export d'une période du journal de diffusion
+    hass.services.async_register(
+        DOMAIN,
+        "export_as_run",
+        handle_export_as_run,
+        schema=vol.Schema({
+            **TARGET_FIELDS,
+            vol.Required("start"): cv.datetime,
+            vol.Optional("end"): cv.datetime,
+            vol.Optional("format", default=FORMAT_CSV): vol.In([FORMAT_CSV, FORMAT_JSON]),
+            # Nom de fichier simple, écrit dans le dossier de configuration
+            vol.Optional("filename"): vol.All(cv.string, vol.Match(r"^[\w][\w.-]*$")),
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
     )
     
     _LOGGER.info("ATEM services registered successfully")
\ No newline at end of file
@@ -0,0 +1,332 @@
+"""As-run log of the switching events of an ATEM switcher.
+
+Events are appended to a fixed-size ring buffer made of typed arrays (no
+object per event) and flushed to an append-only binary file:
+
+* event record: ``<dBBH`` = wall clock time, kind, M/E, source (12 bytes);
+* name record: the same header with kind ``KIND_NAME``, the name length in
+  place of the M/E and the UTF-8 name after it, written before the first
+  event of a source and after each rename.
+
+Buffered events are encoded before an input is renamed, so every event
+keeps the name the input had when it happened.
+
+Exports read the file record by record, so a long log is never loaded
+in memory.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import json
+import logging
+import os
+import struct
+import time
+from array import array
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .inputs import AtemInputIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+# Types d'événements
+KIND_PROGRAM = 0
+KIND_PREVIEW = 1
+KIND_TRANSITION_START = 2
+KIND_TRANSITION_END = 3
+KIND_NAME = 255
+KIND_NAMES = {
+    KIND_PROGRAM: "program",
+    KIND_PREVIEW: "preview",
+    KIND_TRANSITION_START: "transition_start",
+    KIND_TRANSITION_END: "transition_end",
+}
+
+# Capacité du tampon circulaire (événements)
+ASRUN_CAPACITY = 4096
+# Écriture sur disque au plus tard après ce délai, ou dès que le tampon est à moitié plein
+ASRUN_FLUSH_DELAY = 10.0
+# Au-delà, le fichier est renommé en .1 (l'ancien .1 est supprimé)
+ASRUN_MAX_FILE_SIZE = 16 * 1024 * 1024
+# Taille des lectures lors d'un export
+READ_CHUNK = 64 * 1024
+
+FORMAT_CSV = "csv"
+FORMAT_JSON = "json"
+
+_RECORD = struct.Struct("<dBBH")
+
+# Événement exporté : (horodatage, type, M/E, source, nom)
+AsRunEvent = Tuple[float, str, int, int, str]
+
+
+def iter_records(file: IO[bytes]) -> Iterator[Tuple[float, int, int, int, bytes]]:
+    """Yield (time, kind, M/E, source, name bytes) records from an as-run file."""
+    buffer = b""
+    offset = 0
+    while True:
+        chunk = file.read(READ_CHUNK)
+        if not chunk:
+            return
+        buffer = buffer[offset:] + chunk
+        offset = 0
+        while offset + _RECORD.size <= len(buffer):
+            timestamp, kind, me, source = _RECORD.unpack_from(buffer, offset)
+            name = b""
+            if kind == KIND_NAME:
+                end = offset + _RECORD.size + me
+                if end > len(buffer):
+                    break
+                name = buffer[offset + _RECORD.size:end]
+                offset = end
+            else:
+                offset += _RECORD.size
+            yield timestamp, kind, me, source, name
+
+
+def iter_events(paths: List[str], start: float, end: float) -> Iterator[AsRunEvent]:
+    """Yield the events of the as-run files (oldest first) within [start, end]."""
+    names: Dict[int, str] = {}
+    for path in paths:
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            continue
+        with file:
+            for timestamp, kind, me, source, name in iter_records(file):
+                if kind == KIND_NAME:
+                    names[source] = name.decode("utf-8", "replace")
+                elif timestamp > end:
+                    return
+                elif timestamp >= start:
+                    yield timestamp, KIND_NAMES.get(kind, str(kind)), me, source, names.get(source, "")
+
+
+def write_export(
+    paths: List[str], start: float, end: float, output: str, file_format: str
+) -> int:
+    """Stream the events within [start, end] to a new CSV or JSON file; returns the count.
+
+    Raises FileExistsError rather than overwriting an existing file.
+    """
+    count = 0
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "x", encoding="utf-8", newline="") as file:
+        if file_format == FORMAT_CSV:
+            writer = csv.writer(file)
+            writer.writerow(("timestamp", "event", "me", "source", "name"))
+            for event in iter_events(paths, start, end):
+                writer.writerow(event)
+                count += 1
+        else:
+            # Tableau JSON écrit élément par élément
+            file.write("[")
+            for timestamp, kind, me, source, name in iter_events(paths, start, end):
+                file.write(",\n" if count else "\n")
+                file.write(json.dumps({
+                    "timestamp": timestamp,
+                    "event": kind,
+                    "me": me,
+                    "source": source,
+                    "name": name,
+                }))
+                count += 1
+            file.write("\n]\n")
+    return count
+
+
+def remove_log(path: str) -> None:
+    """Delete an as-run file and its rotated copy; runs in the executor."""
+    for name in (f"{path}.1", path):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+class AtemAsRunLog:
+    """Ring buffer of switching events, flushed to an append-only file."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: str,
+        inputs: AtemInputIndex,
+        capacity: int = ASRUN_CAPACITY,
+    ) -> None:
+        """Initialize the log (path of the current file)."""
+        self.hass = hass
+        self.path = path
+        self.inputs = inputs
+        self.capacity = capacity
+
+        # Tampon circulaire préalloué, une colonne par champ
+        self._times = array("d", bytes(8 * capacity))
+        self._kinds = array("B", bytes(capacity))
+        self._mes = array("B", bytes(capacity))
+        self._sources = array("H", bytes(2 * capacity))
+        # Prochaine case écrite et nombre d'événements pas encore sur disque
+        self._head = 0
+        self._unflushed = 0
+
+        # Dernier nom écrit dans le fichier pour chaque source (lu au démarrage)
+        self._written_names: Dict[int, str] = {}
+        # Enregistrements encodés, pas encore écrits
+        self._encoded = bytearray()
+        self._flush_lock = asyncio.Lock()
+        self._unsub_flush: Optional[CALLBACK_TYPE] = None
+
+        # Compteurs
+        self.events = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    @property
+    def paths(self) -> List[str]:
+        """Return the log files, oldest first."""
+        return [f"{self.path}.1", self.path]
+
+    @callback
+    def async_append(self, kind: int, me: int, source: Optional[int]) -> None:
+        """Record an event now."""
+        head = self._head
+        self._times[head] = time.time()
+        self._kinds[head] = kind
+        self._mes[head] = me
+        self._sources[head] = source or 0
+        self._head = (head + 1) % self.capacity
+        self.events += 1
+        if self._unflushed == self.capacity:
+            # Écriture en retard : l'événement le plus ancien est écrasé
+            self.dropped += 1
+        else:
+            self._unflushed += 1
+
+        if self._unflushed >= self.capacity // 2:
+            self._async_schedule_flush(0)
+        elif self._unsub_flush is None:
+            self._async_schedule_flush(ASRUN_FLUSH_DELAY)
+
+    @callback
+    def _async_schedule_flush(self, delay: float) -> None:
+        """Flush the buffer after delay seconds."""
+        if self._unsub_flush is not None:
+            if delay > 0:
+                return
+            self._unsub_flush()
+
+        @callback
+        def _async_flush(_now: Any) -> None:
+            self._unsub_flush = None
+            self.hass.async_create_task(self.async_flush())
+
+        self._unsub_flush = async_call_later(self.hass, delay, _async_flush)
+
+    @callback
+    def async_encode(self) -> None:
+        """Encode the buffered events with the current input names."""
+        records = self._encoded
+        start = (self._head - self._unflushed) % self.capacity
+        for offset in range(self._unflushed):
+            index = (start + offset) % self.capacity
+            source = self._sources[index]
+            kind = self._kinds[index]
+            name = self.inputs.long_name(source) or ""
+            if self._written_names.get(source) != name:
+                encoded = name.encode("utf-8")[:255]
+                records += _RECORD.pack(self._times[index], KIND_NAME, len(encoded), source)
+                records += encoded
+                self._written_names[source] = name
+            records += _RECORD.pack(self._times[index], kind, self._mes[index], source)
+        self._unflushed = 0
+
+    def _rotate(self) -> bool:
+        """Rename a full file to .1; runs in the executor."""
+        try:
+            if os.path.getsize(self.path) < ASRUN_MAX_FILE_SIZE:
+                return False
+        except FileNotFoundError:
+            return False
+        os.replace(self.path, f"{self.path}.1")
+        return True
+
+    def _write(self, records: bytes) -> None:
+        """Append records to the file; runs in the executor."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab") as file:
+            file.write(records)
+
+    def _read_names(self) -> Dict[int, str]:
+        """Return the last name written for each source; runs in the executor."""
+        names: Dict[int, str] = {}
+        try:
+            with open(self.path, "rb") as file:
+                for _timestamp, kind, _me, source, name in iter_records(file):
+                    if kind == KIND_NAME:
+                        names[source] = name.decode("utf-8", "replace")
+        except FileNotFoundError:
+            pass
+        return names
+
+    async def async_start(self) -> None:
+        """Load the names already written in the file."""
+        self._written_names = await self.hass.async_add_executor_job(self._read_names)
+
+    async def async_flush(self) -> None:
+        """Write the buffered events to the file."""
+        async with self._flush_lock:
+            if not self._unflushed and not self._encoded:
+                return
+            try:
+                if await self.hass.async_add_executor_job(self._rotate):
+                    # Le nouveau fichier commence par les noms connus, utilisés
+                    # par les événements déjà encodés
+                    now = time.time()
+                    names = bytearray()
+                    for source, name in self._written_names.items():
+                        encoded = name.encode("utf-8")[:255]
+                        names += _RECORD.pack(now, KIND_NAME, len(encoded), source) + encoded
+                    self._encoded[:0] = names
+                    _LOGGER.debug(f"ATEM as-run log rotated: {self.path}")
+                self.async_encode()
+                records = bytes(self._encoded)
+                await self.hass.async_add_executor_job(self._write, records)
+            except OSError as err:
+                # Les enregistrements restent en mémoire pour l'écriture suivante
+                _LOGGER.error(
+                    f"Error writing the ATEM as-run log, {len(self._encoded)} bytes kept: {err}"
+                )
+                return
+            # Seulement ce qui a été écrit : d'autres ont pu s'ajouter entre-temps
+            del self._encoded[:len(records)]
+            self.flushes += 1
+
+    async def async_stop(self) -> None:
+        """Cancel the scheduled flush and write what is buffered."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        await self.async_flush()
+
+    async def async_export(
+        self, start: float, end: float, output: str, file_format: str
+    ) -> int:
+        """Flush, then stream the events within [start, end] to output."""
+        await self.async_flush()
+        return await self.hass.async_add_executor_job(
+            write_export, self.paths, start, end, output, file_format
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return the as-run counters."""
+        return {
+            "events": self.events,
+            "buffered": self._unflushed,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+        }
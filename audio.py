@@ -0,0 +1,239 @@
+"""Audio level metering of the switcher inputs (AMLv/FMLv)."""
+from __future__ import annotations
+
+import math
+from array import array
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+# Ce que les listeners suivent
+AUDIO_LEVEL = 0x01
+AUDIO_LIVE = 0x02
+
+# Nombre maximal d'entrées audio mesurées (tableaux préalloués)
+AUDIO_MAX_CHANNELS = 128
+# Plancher des niveaux publiés (dBFS)
+AUDIO_FLOOR_DB = -60.0
+# Une entrée active ne repasse silencieuse que sous le seuil moins cet écart...
+AUDIO_HYSTERESIS_DB = 6.0
+# ... pendant au moins ce délai (s)
+AUDIO_SILENCE_HOLD = 2.0
+
+
+def _to_db(level: float) -> float:
+    """Convert a linear level (1.0 = 0 dBFS) to dBFS, rounded to 1 dB."""
+    if level <= 0:
+        return AUDIO_FLOOR_DB
+    return max(AUDIO_FLOOR_DB, float(round(20 * math.log10(level))))
+
+
+class AtemAudioMeter:
+    """Aggregate the metering stream per input and publish it at a bounded rate.
+
+    Samples (linear levels, 1.0 = 0 dBFS) are folded into preallocated
+    per-channel arrays: the peak is a running maximum and the RMS level a sum
+    of squares. Every window the arrays are turned into dBFS values, reset,
+    and only the inputs whose rounded values or live state changed are
+    notified.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        window: float,
+        threshold: float,
+        on_inputs: Callable[[], None],
+        capacity: int = AUDIO_MAX_CHANNELS,
+    ) -> None:
+        """Initialize the meter (window in seconds, threshold in dBFS)."""
+        self.hass = hass
+        self.window = window
+        self.threshold = threshold
+        self.capacity = capacity
+        # Appelé quand une entrée audio apparaît
+        self._on_inputs = on_inputs
+
+        # Entrée audio -> canal, et l'inverse
+        self._channels: Dict[int, int] = {}
+        self._sources: List[int] = []
+        # Entrées mesurées, même tuple tant qu'aucune n'apparaît
+        self.inputs: Tuple[int, ...] = ()
+
+        # Accumulateurs de la fenêtre en cours
+        self._peak = array("d", bytes(8 * capacity))
+        self._energy = array("d", bytes(8 * capacity))
+        self._samples = array("L", bytes(array("L").itemsize * capacity))
+        # Valeurs publiées (dBFS) et état actif/silencieux
+        self._level_db = array("d", [AUDIO_FLOOR_DB]) * capacity
+        self._peak_db = array("d", [AUDIO_FLOOR_DB]) * capacity
+        self._live = bytearray(capacity)
+        # Début du silence en cours (heure de la boucle), 0 si aucun
+        self._quiet_since = array("d", bytes(8 * capacity))
+
+        # Entrée -> [(valeurs suivies, callback)]
+        self._listeners: Dict[int, List[Tuple[int, Callable[[], None]]]] = {}
+        self._unsub_publish: Optional[CALLBACK_TYPE] = None
+
+        # Compteurs
+        self.samples = 0
+        self.dropped = 0
+        self.publishes = 0
+        self.notifications = 0
+
+    @callback
+    def async_record(self, source: int, level: float, peak: float) -> None:
+        """Fold one metering sample of an input into the current window."""
+        channel = self._channels.get(source)
+        if channel is None:
+            channel = self._add_channel(source)
+            if channel is None:
+                self.dropped += 1
+                return
+        if peak > self._peak[channel]:
+            self._peak[channel] = peak
+        self._energy[channel] += level * level
+        self._samples[channel] += 1
+        self.samples += 1
+
+    def _add_channel(self, source: int) -> Optional[int]:
+        """Allocate the channel of a new input, None when the arrays are full."""
+        if len(self._sources) >= self.capacity:
+            return None
+        channel = self._channels[source] = len(self._sources)
+        self._sources.append(source)
+        self.inputs = tuple(sorted((*self.inputs, source)))
+        self._on_inputs()
+        return channel
+
+    @callback
+    def async_start(self) -> None:
+        """Publish the levels every window."""
+        if self._unsub_publish is None:
+            self._unsub_publish = async_track_time_interval(
+                self.hass, self._async_publish, timedelta(seconds=self.window)
+            )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop publishing."""
+        if self._unsub_publish is not None:
+            self._unsub_publish()
+            self._unsub_publish = None
+
+    @callback
+    def _async_publish(self, _now=None) -> None:
+        """Close the window: compute the levels and notify what changed."""
+        self.publishes += 1
+        now = self.hass.loop.time()
+        off = self.threshold - AUDIO_HYSTERESIS_DB
+        for channel, source in enumerate(self._sources):
+            samples = self._samples[channel]
+            if samples:
+                level = _to_db(math.sqrt(self._energy[channel] / samples))
+                peak = _to_db(self._peak[channel])
+                self._peak[channel] = 0.0
+                self._energy[channel] = 0.0
+                self._samples[channel] = 0
+            else:
+                # Plus de mesures (flux coupé) : l'entrée est muette
+                level = peak = AUDIO_FLOOR_DB
+
+            changed = 0
+            if level != self._level_db[channel] or peak != self._peak_db[channel]:
+                self._level_db[channel] = level
+                self._peak_db[channel] = peak
+                changed |= AUDIO_LEVEL
+
+            # Hystérésis : actif dès le seuil, silencieux après AUDIO_SILENCE_HOLD
+            # secondes sous le seuil moins AUDIO_HYSTERESIS_DB
+            live = self._live[channel]
+            if level >= self.threshold:
+                self._quiet_since[channel] = 0.0
+                live_now = 1
+            elif level < off:
+                if not self._quiet_since[channel]:
+                    self._quiet_since[channel] = now
+                live_now = 0 if now - self._quiet_since[channel] >= AUDIO_SILENCE_HOLD else live
+            else:
+                self._quiet_since[channel] = 0.0
+                live_now = live
+            if live_now != live:
+                self._live[channel] = live_now
+                changed |= AUDIO_LIVE
+
+            if changed:
+                self._async_notify(source, changed)
+
+    @callback
+    def async_clear(self) -> None:
+        """Reset every input to silent (e.g. when the switcher is lost)."""
+        for channel, source in enumerate(self._sources):
+            self._peak[channel] = 0.0
+            self._energy[channel] = 0.0
+            self._samples[channel] = 0
+            self._quiet_since[channel] = 0.0
+            changed = 0
+            if self._level_db[channel] != AUDIO_FLOOR_DB or self._peak_db[channel] != AUDIO_FLOOR_DB:
+                self._level_db[channel] = self._peak_db[channel] = AUDIO_FLOOR_DB
+                changed |= AUDIO_LEVEL
+            if self._live[channel]:
+                self._live[channel] = 0
+                changed |= AUDIO_LIVE
+            if changed:
+                self._async_notify(source, changed)
+
+    @callback
+    def _async_notify(self, source: int, changed: int) -> None:
+        """Call the listeners of an input watching what changed."""
+        for watched, update_callback in self._listeners.get(source, ()):
+            if watched & changed:
+                self.notifications += 1
+                update_callback()
+
+    def level(self, source: int) -> Optional[float]:
+        """Return the RMS level (dBFS) of the last window."""
+        channel = self._channels.get(source)
+        return None if channel is None else self._level_db[channel]
+
+    def peak(self, source: int) -> Optional[float]:
+        """Return the peak level (dBFS) of the last window."""
+        channel = self._channels.get(source)
+        return None if channel is None else self._peak_db[channel]
+
+    def is_live(self, source: int) -> bool:
+        """Return True while an input carries audio."""
+        channel = self._channels.get(source)
+        return channel is not None and bool(self._live[channel])
+
+    @callback
+    def async_add_listener(
+        self, source: int, watched: int, update_callback: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Call update_callback when the watched values of an input change."""
+        listener = (watched, update_callback)
+        self._listeners.setdefault(source, []).append(listener)
+
+        @callback
+        def _remove() -> None:
+            listeners = self._listeners.get(source)
+            if listeners and listener in listeners:
+                listeners.remove(listener)
+                if not listeners:
+                    del self._listeners[source]
+
+        return _remove
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return the metering counters."""
+        return {
+            "inputs": len(self._sources),
+            "samples": self.samples,
+            "dropped": self.dropped,
+            "publishes": self.publishes,
+            "notifications": self.notifications,
+            "live": sum(self._live),
+        }
@@ -0,0 +1,430 @@
+"""End-to-end latency and throughput benchmarks against the ATEM simulator.
+
+Run with ``python -m hass_atem.benchmark --transport native --output bench.json``.
+
+Three scenarios are measured on a real HomeAssistant core instance:
+
+* ``event_to_state``: switcher ``PrgI`` packet -> ``AtemProgramSensor`` state write.
+* ``service_to_state``: ``set_program_input`` service call -> optimistic
+  sensor state write.
+* ``service_to_confirm``: ``set_program_input`` service call -> ``PrgI`` echo
+  confirming the change.
+* ``tally_to_wire``: switcher ``PrgI``/``TlSr`` packet -> TSL UMD v5 frame
+  received by a local tally light, without any state write in between.
+* ``max_event_rate``: highest sustained rate of switcher events for which the
+  event loop lag and the state write latency stay under their limits.
+
+The simulator runs in the same event loop, so its own cost is included in
+the throughput figures.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import struct
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from . import async_setup_services
+from .const import (
+    CONF_COALESCE_MAX_LATENCY,
+    CONF_COALESCE_WINDOW,
+    CONF_TRANSPORT,
+    CONF_TSL_UDP_TARGETS,
+    DEFAULT_COALESCE_MAX_LATENCY,
+    DEFAULT_COALESCE_WINDOW,
+    DOMAIN,
+    TRANSPORT_NATIVE,
+    TRANSPORT_PYATEMMAX,
+)
+from .coordinator import AtemDataUpdateCoordinator
+from .sensor import AtemProgramSensor
+from .simulator import AtemSimulator
+from .tally import TALLY_PROGRAM
+from .targets import async_get_target_index
+
+_LOGGER = logging.getLogger(__name__)
+
+# Débits testés pour la recherche du débit maximal (événements/s)
+RATE_STEPS = (50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# Retard de la boucle au-delà duquel on considère qu'elle décroche
+MAX_LOOP_LAG = 0.050
+# Délai maximal de publication du dernier état après la rafale
+MAX_SETTLE = 0.250
+# Timeout d'attente d'une écriture d'état
+STATE_TIMEOUT = 2.0
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    """Summarize samples (seconds) as milliseconds percentiles."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def _pick(fraction: float) -> float:
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": _pick(0.50),
+        "p90_ms": _pick(0.90),
+        "p99_ms": _pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+class _StateProbe:
+    """Record the program sensor state writes."""
+
+    def __init__(self) -> None:
+        self._waiters: List[Any] = []
+        self.writes = 0
+
+    def attach(self, sensor: AtemProgramSensor) -> None:
+        """Replace the sensor state write with a timestamped probe."""
+
+        def _write() -> None:
+            self.writes += 1
+            value = sensor.native_value
+            sensor.extra_state_attributes  # coût réel du calcul des attributs
+            now = time.perf_counter()
+            for waiter in list(self._waiters):
+                expected, future = waiter
+                if value == expected and not future.done():
+                    future.set_result(now)
+                    self._waiters.remove(waiter)
+
+        sensor.async_write_ha_state = _write
+
+    def wait_for(self, expected: str) -> asyncio.Future:
+        """Return a future resolved with the time the expected state is written."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((expected, future))
+        return future
+
+
+class _LoopLagMonitor:
+    """Measure how late the event loop runs a periodic timer."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self) -> None:
+        self.samples = []
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+async def _bench_event_to_state(
+    simulator: AtemSimulator,
+    coordinator: AtemDataUpdateCoordinator,
+    probe: _StateProbe,
+    samples: int,
+) -> List[float]:
+    """Time from a PrgI sent by the switcher to the sensor state write."""
+    results: List[float] = []
+    sources = simulator.external_inputs
+    for index in range(samples):
+        source = sources[index % len(sources)]
+        if simulator.program[0] == source:
+            source = sources[(index + 1) % len(sources)]
+        waiter = probe.wait_for(coordinator.inputs.long_name(source))
+        start = time.perf_counter()
+        simulator.set_program(0, source)
+        try:
+            end = await asyncio.wait_for(waiter, STATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(f"No state write for program {source}")
+            continue
+        results.append(end - start)
+    return results
+
+
+async def _bench_service_to_confirm(
+    hass: HomeAssistant,
+    simulator: AtemSimulator,
+    coordinator: AtemDataUpdateCoordinator,
+    probe: _StateProbe,
+    samples: int,
+) -> Tuple[List[float], List[float]]:
+    """Time from a set_program_input call to the state write and to the echo."""
+    to_state: List[float] = []
+    to_confirm: List[float] = []
+    sources = simulator.external_inputs
+    echoes: List[Tuple[int, asyncio.Future]] = []
+
+    def _on_echo(cmd: str, me: Optional[int]) -> None:
+        now = time.perf_counter()
+        for echo in list(echoes):
+            source, future = echo
+            if coordinator.client.get_program_input(0) == source and not future.done():
+                future.set_result(now)
+                echoes.remove(echo)
+
+    unsubscribe = coordinator.async_register_command_handler(("PrgI",), _on_echo)
+    try:
+        for index in range(samples):
+            source = sources[index % len(sources)]
+            if simulator.program[0] == source:
+                source = sources[(index + 1) % len(sources)]
+            echo = asyncio.get_running_loop().create_future()
+            echoes.append((source, echo))
+            waiter = probe.wait_for(coordinator.inputs.long_name(source))
+            start = time.perf_counter()
+            await hass.services.async_call(
+                DOMAIN, "set_program_input", {"input": str(source)}, blocking=True
+            )
+            try:
+                state_at = await asyncio.wait_for(waiter, STATE_TIMEOUT)
+                confirmed_at = await asyncio.wait_for(echo, STATE_TIMEOUT)
+            except asyncio.TimeoutError:
+                _LOGGER.warning(f"Program change to {source} never confirmed")
+                echoes.clear()
+                continue
+            to_state.append(state_at - start)
+            to_confirm.append(confirmed_at - start)
+    finally:
+        unsubscribe()
+    return to_state, to_confirm
+
+
+class _TallyLight(asyncio.DatagramProtocol):
+    """Local TSL UMD v5 receiver timestamping the program tally frames."""
+
+    def __init__(self) -> None:
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self.frames = 0
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        now = time.perf_counter()
+        self.frames += 1
+        # PBC, VER, FLAGS, SCREEN puis INDEX, CONTROL du premier message
+        index, control = struct.unpack_from("<HH", data, 6)
+        future = self._waiters.get(index)
+        if future is not None and control & 0x03 and not future.done():
+            future.set_result(now)
+
+    def wait_for(self, source: int) -> asyncio.Future:
+        """Return a future resolved when source goes to program."""
+        future = self._waiters[source] = asyncio.get_running_loop().create_future()
+        return future
+
+
+async def _bench_tally_to_wire(
+    simulator: AtemSimulator,
+    coordinator: AtemDataUpdateCoordinator,
+    light: _TallyLight,
+    samples: int,
+) -> List[float]:
+    """Time from a PrgI/TlSr sent by the switcher to the TSL frame on the wire."""
+    results: List[float] = []
+    sources = simulator.external_inputs
+    for index in range(samples):
+        source = sources[index % len(sources)]
+        if coordinator.tally.flags(source) & TALLY_PROGRAM:
+            source = sources[(index + 1) % len(sources)]
+        waiter = light.wait_for(source)
+        start = time.perf_counter()
+        simulator.set_program(0, source)
+        try:
+            end = await asyncio.wait_for(waiter, STATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(f"No tally frame for program {source}")
+            continue
+        results.append(end - start)
+    return results
+
+
+async def _bench_max_event_rate(
+    simulator: AtemSimulator,
+    coordinator: AtemDataUpdateCoordinator,
+    probe: _StateProbe,
+    duration: float,
+) -> Dict[str, Any]:
+    """Find the highest sustained event rate the loop keeps up with."""
+    loop = asyncio.get_running_loop()
+    monitor = _LoopLagMonitor()
+    sources = simulator.external_inputs
+    steps: List[Dict[str, Any]] = []
+    max_rate = 0
+
+    for rate in RATE_STEPS:
+        monitor.start()
+        start = loop.time()
+        sent = 0
+        # Envoi par paquets de 1 ms pour tenir les débits élevés
+        while loop.time() - start < duration:
+            due = int((loop.time() - start) * rate)
+            while sent < due:
+                simulator.set_program(0, sources[sent % len(sources)])
+                sent += 1
+            await asyncio.sleep(0.001)
+
+        # Le dernier état doit être publié dans la fenêtre de regroupement
+        last = coordinator.inputs.long_name(simulator.program[0])
+        settle_start = time.perf_counter()
+        waiter = probe.wait_for(last)
+        if coordinator.data and coordinator.data.get("program_name") == last:
+            waiter.set_result(settle_start)
+        try:
+            settle = await asyncio.wait_for(waiter, STATE_TIMEOUT) - settle_start
+        except asyncio.TimeoutError:
+            settle = None
+        monitor.stop()
+
+        lag = percentiles(monitor.samples)
+        keeps_up = (
+            settle is not None
+            and settle <= MAX_SETTLE
+            and lag.get("p99_ms", 0) <= MAX_LOOP_LAG * 1000
+        )
+        steps.append({
+            "rate": rate,
+            "events_sent": sent,
+            "loop_lag": lag,
+            "settle_ms": None if settle is None else round(settle * 1000, 3),
+            "keeps_up": keeps_up,
+        })
+        if not keeps_up:
+            break
+        max_rate = rate
+
+    return {"max_sustained_rate": max_rate, "steps": steps}
+
+
+async def async_run_benchmark(
+    transport: str = TRANSPORT_NATIVE,
+    samples: int = 200,
+    rate_duration: float = 2.0,
+    host: str = "127.0.0.1",
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Run every scenario and return the results as a JSON-serializable dict."""
+    simulator = AtemSimulator()
+    await simulator.async_start(host)
+    # Lampe de tally TSL locale, abonnée en UDP
+    light_transport, light = await asyncio.get_running_loop().create_datagram_endpoint(
+        _TallyLight, local_addr=("127.0.0.1", 0)
+    )
+    light_port = light_transport.get_extra_info("sockname")[1]
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        # Registres lus par l'index des cibles des services
+        await dr.async_load(hass)
+        await er.async_load(hass)
+        entry_options = {
+            CONF_TRANSPORT: transport,
+            CONF_COALESCE_WINDOW: DEFAULT_COALESCE_WINDOW,
+            CONF_COALESCE_MAX_LATENCY: DEFAULT_COALESCE_MAX_LATENCY,
+            CONF_TSL_UDP_TARGETS: f"127.0.0.1:{light_port}",
+            **(options or {}),
+        }
+        entry = SimpleNamespace(
+            entry_id="benchmark",
+            title=host,
+            data={"host": host},
+            options=entry_options,
+        )
+
+        coordinator = AtemDataUpdateCoordinator(hass, entry)
+        try:
+            await coordinator.async_config_entry_first_refresh()
+            hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+            async_get_target_index(hass).async_add(entry.entry_id, coordinator)
+            await async_setup_services(hass)
+
+            sensor = AtemProgramSensor(coordinator, entry)
+            sensor.hass = hass
+            sensor.entity_id = "sensor.atem_program"
+            probe = _StateProbe()
+            probe.attach(sensor)
+            await sensor.async_added_to_hass()
+
+            event_to_state = await _bench_event_to_state(simulator, coordinator, probe, samples)
+            to_state, to_confirm = await _bench_service_to_confirm(
+                hass, simulator, coordinator, probe, samples
+            )
+            tally_to_wire = await _bench_tally_to_wire(simulator, coordinator, light, samples)
+            results = {
+                "timestamp": time.time(),
+                "python": platform.python_version(),
+                "transport": transport,
+                "options": entry_options,
+                "event_to_state": percentiles(event_to_state),
+                "service_to_state": percentiles(to_state),
+                "service_to_confirm": percentiles(to_confirm),
+                "tally_to_wire": percentiles(tally_to_wire),
+                "max_event_rate": await _bench_max_event_rate(
+                    simulator, coordinator, probe, rate_duration
+                ),
+                "state_writes": probe.writes,
+                "coalescer": coordinator.coalescer.stats,
+                "snapshots": coordinator.publish_stats,
+                "commands": coordinator.commands.stats,
+                "connection": coordinator.connection.stats,
+                "tally": coordinator.tally.stats,
+                "fanout": coordinator.fanout.stats if coordinator.fanout else None,
+                "metrics": coordinator.metrics.as_dict(),
+            }
+        finally:
+            await coordinator.async_shutdown()
+            await simulator.async_stop()
+            light_transport.close()
+            await hass.async_stop(force=True)
+
+    return results
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="ATEM integration benchmark")
+    parser.add_argument(
+        "--transport",
+        choices=[TRANSPORT_NATIVE, TRANSPORT_PYATEMMAX],
+        default=TRANSPORT_NATIVE,
+    )
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--rate-duration", type=float, default=2.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(async_run_benchmark(
+        transport=args.transport,
+        samples=args.samples,
+        rate_duration=args.rate_duration,
+        host=args.host,
+    ))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Platform for ATEM tally and audio binary sensors."""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .audio import AUDIO_LIVE
+from .const import DOMAIN
+from .coordinator import AtemDataUpdateCoordinator
+from .entity import AtemEntity, async_add_topology_entities
+from .tally import TALLY_BOTH, TALLY_PREVIEW, TALLY_PROGRAM
+
+# Type de tally -> (drapeaux, nom, icône)
+TALLY_KINDS = {
+    "program": (TALLY_PROGRAM, "Program", "mdi:record-circle"),
+    "preview": (TALLY_PREVIEW, "Preview", "mdi:record-circle-outline"),
+    "both": (TALLY_BOTH, "Program and Preview", "mdi:circle-double"),
+}
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up ATEM tally and audio binary sensors from a config entry."""
+    # Récupération du coordinateur
+    coordinator: AtemDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    def _binary_sensors(mes: int, auxes: int) -> List[BinarySensorEntity]:
+        # Un tally de chaque type par entrée externe
+        sensors: List[BinarySensorEntity] = [
+            AtemTallyBinarySensor(coordinator, entry, source, kind)
+            for source in coordinator.tally.inputs
+            for kind in TALLY_KINDS
+        ]
+        # Présence de son sur chaque entrée audio mesurée
+        if coordinator.audio is not None:
+            sensors.extend(
+                AtemAudioLiveBinarySensor(coordinator, entry, source)
+                for source in coordinator.audio.inputs
+            )
+        return sensors
+
+    # Ajout des entités, complétées quand les entrées sont découvertes
+    async_add_topology_entities(coordinator, entry, async_add_entities, _binary_sensors)
+
+
+class AtemTallyBinarySensor(AtemEntity, BinarySensorEntity):
+    """Tally of an ATEM input, on program, on preview or on both."""
+
+    # Les bascules de tally sont écrites par le moteur de tally, pas par le
+    # coordinateur : seule la liste des entrées est suivie ici
+    _atem_data_keys = ("tally_inputs",)
+
+    def __init__(
+        self,
+        coordinator: AtemDataUpdateCoordinator,
+        entry: ConfigEntry,
+        source: int,
+        kind: str,
+    ):
+        """Initialize the binary sensor."""
+        super().__init__(coordinator, entry)
+        self.source = source
+        self._flags, label, icon = TALLY_KINDS[kind]
+        self._attr_unique_id = f"{entry.entry_id}_input{source}_tally_{kind}"
+        self._attr_name = f"ATEM Input {source} Tally {label}"
+        self._attr_icon = icon
+        # Redondant avec program et preview, à activer au besoin
+        self._attr_entity_registry_enabled_default = kind != "both"
+        # Attributs réutilisés tant qu'aucune entrée n'est renommée
+        self._attrs_version = -1
+        self._attrs: Dict[str, Any] = {}
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to the tally flips of the input."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.tally.async_add_listener(
+                self.source, self._flags, self.async_write_ha_state
+            )
+        )
+
+    @property
+    def is_on(self) -> bool:
+        """Return True when the input has the tally of this sensor."""
+        return self.coordinator.tally.flags(self.source) & self._flags == self._flags
+
+    @property
+    def extra_state_attributes(self) -> Dict[str, Any]:
+        """Return additional attributes."""
+        inputs = self.coordinator.inputs
+        if inputs.version != self._attrs_version:
+            self._attrs_version = inputs.version
+            self._attrs = {
+                "input_number": self.source,
+                "input_name": inputs.long_name(self.source),
+            }
+        return self._attrs
+
+
+class AtemAudioLiveBinarySensor(AtemEntity, BinarySensorEntity):
+    """On while an audio input carries sound, with hysteresis."""
+
+    # Les bascules sont écrites par le vumètre, pas par le coordinateur
+    _atem_data_keys = ("audio_inputs",)
+    _attr_device_class = BinarySensorDeviceClass.SOUND
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry, source: int):
+        """Initialize the binary sensor."""
+        super().__init__(coordinator, entry)
+        self.source = source
+        self._attr_unique_id = f"{entry.entry_id}_audio{source}_live"
+        self._attr_name = f"ATEM Audio {source} Live"
+        # Attributs réutilisés tant qu'aucune entrée n'est renommée
+        self._attrs_version = -1
+        self._attrs: Dict[str, Any] = {}
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to the live/silent changes of the input."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.audio.async_add_listener(
+                self.source, AUDIO_LIVE, self.async_write_ha_state
+            )
+        )
+
+    @property
+    def is_on(self) -> bool:
+        """Return True while the input is live."""
+        return self.coordinator.audio.is_live(self.source)
+
+    @property
+    def extra_state_attributes(self) -> Dict[str, Any]:
+        """Return additional attributes."""
+        inputs = self.coordinator.inputs
+        if inputs.version != self._attrs_version:
+            self._attrs_version = inputs.version
+            self._attrs = {
+                "input_number": self.source,
+                "input_name": inputs.long_name(self.source),
+            }
+        return self._attrs
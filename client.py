@@ -0,0 +1,288 @@
+"""ATEM client implementations used by the coordinator."""
+from __future__ import annotations
+
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import PyATEMMax
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# Noms des sources vidéo tels que renvoyés par PyATEMMax ("input1", "black", ...)
+_VIDEO_SOURCE_NAMES: Dict[int, str] = {
+    src.value: src.name for src in PyATEMMax.ATEMProtocol.videoSources
+}
+
+
+class AtemCommand(NamedTuple):
+    """A command sent to the switcher, named after its ATEM protocol command."""
+
+    # DCut, DAut, CPgI, CPvI, CAuS, ou SALN/SFLN (client natif seulement)
+    name: str
+    # M/E ou sortie aux (1/0 pour activer ou couper les mesures audio)
+    index: int = 0
+    source: int = 0
+
+
+class AtemClient(ABC):
+    """Interface shared by the ATEM clients."""
+
+    # True si le callback de commandes est appelé depuis la boucle d'événements
+    runs_in_loop = False
+    # True si le client décode les mesures audio (AMLv/FMLv)
+    supports_audio_levels = False
+
+    def __init__(self, hass: HomeAssistant, host: str) -> None:
+        """Initialize the client."""
+        self.hass = hass
+        self.host = host
+        self._on_command: Callable[[str, Optional[int]], None] = lambda cmd, index: None
+        self._on_connection: Callable[[bool], None] = lambda connected: None
+        self._on_audio_level: Callable[[int, float, float], None] = lambda source, level, peak: None
+
+    def set_command_callback(self, on_command: Callable[[str, Optional[int]], None]) -> None:
+        """Set the callback called for every received command.
+
+        It receives the command name and, when the client knows it, the index
+        the command applies to (M/E, source or aux), otherwise None.
+        """
+        self._on_command = on_command
+
+    def set_connection_callback(self, on_connection: Callable[[bool], None]) -> None:
+        """Set the callback called on the event loop when the session is up or lost."""
+        self._on_connection = on_connection
+
+    def set_audio_level_callback(
+        self, on_audio_level: Callable[[int, float, float], None]
+    ) -> None:
+        """Set the callback called for every metering sample of an audio input.
+
+        It receives the audio input, its level and its peak (linear, 1.0 =
+        0 dBFS, loudest channel); only clients with supports_audio_levels
+        call it, on the event loop.
+        """
+        self._on_audio_level = on_audio_level
+
+    @staticmethod
+    def source_name(source: Optional[int]) -> str:
+        """Return the PyATEMMax name of a video source."""
+        if source is None:
+            return "Unknown"
+        return _VIDEO_SOURCE_NAMES.get(source, str(source))
+
+    @property
+    @abstractmethod
+    def connected(self) -> bool:
+        """Return True once the initial state dump has been received."""
+
+    @property
+    @abstractmethod
+    def model(self) -> str:
+        """Return the switcher model name."""
+
+    @property
+    @abstractmethod
+    def me_count(self) -> int:
+        """Return the number of M/Es of the switcher."""
+
+    @property
+    @abstractmethod
+    def aux_count(self) -> int:
+        """Return the number of aux outputs of the switcher."""
+
+    @abstractmethod
+    def get_program_input(self, me: int) -> Optional[int]:
+        """Return the program source of an M/E."""
+
+    @abstractmethod
+    def get_preview_input(self, me: int) -> Optional[int]:
+        """Return the preview source of an M/E."""
+
+    @abstractmethod
+    def get_aux_source(self, aux: int) -> Optional[int]:
+        """Return the source of an aux output."""
+
+    @abstractmethod
+    def in_transition(self, me: int) -> bool:
+        """Return True while a transition runs on an M/E."""
+
+    @abstractmethod
+    def get_tally(self) -> Dict[int, int]:
+        """Return source -> tally flags (0x01 program, 0x02 preview) from TlSr."""
+
+    @abstractmethod
+    def get_input_properties(self, source: int) -> Optional[Tuple[str, str]]:
+        """Return the (long name, short name) of a source."""
+
+    @abstractmethod
+    def get_all_input_properties(self) -> Dict[int, Tuple[str, str]]:
+        """Return the (long name, short name) of every known source."""
+
+    @abstractmethod
+    def idle_time(self) -> float:
+        """Return the seconds elapsed since the last packet from the switcher."""
+
+    @abstractmethod
+    async def async_connect(self, timeout: float) -> bool:
+        """Connect and wait for the initial state dump."""
+
+    @abstractmethod
+    async def async_disconnect(self) -> None:
+        """Close the connection."""
+
+    async def async_close(self) -> None:
+        """Close the connection and release the client resources."""
+        await self.async_disconnect()
+
+    @abstractmethod
+    async def async_send_commands(self, commands: Sequence[AtemCommand]) -> None:
+        """Send commands to the switcher, in order."""
+
+
+class AtemThreadedClient(AtemClient):
+    """Client based on PyATEMMax, which runs its own threads."""
+
+    def __init__(self, hass: HomeAssistant, host: str) -> None:
+        """Initialize the client."""
+        super().__init__(hass, host)
+        self.switcher = self._create_switcher()
+        self._switcher_used = False
+        # Thread dédié aux commandes : ordre garanti, sans occuper l'executor de HA
+        self._command_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"atem_commands_{host}"
+        )
+        self._senders: Dict[str, Callable[[AtemCommand], None]] = {
+            "DCut": lambda command: self.switcher.execCutME(command.index),
+            "DAut": lambda command: self.switcher.execAutoME(command.index),
+            "CPgI": lambda command: self.switcher.setProgramInputVideoSource(
+                command.index, command.source
+            ),
+            "CPvI": lambda command: self.switcher.setPreviewInputVideoSource(
+                command.index, command.source
+            ),
+            "CAuS": lambda command: self.switcher.setAuxSourceInput(
+                command.index, command.source
+            ),
+        }
+
+    def _create_switcher(self) -> PyATEMMax.ATEMMax:
+        """Create a PyATEMMax switcher object wired to the callbacks."""
+        switcher = PyATEMMax.ATEMMax()
+        switcher.registerEvent(switcher.atem.events.receive, self._on_receive_sync)
+        switcher.registerEvent(
+            switcher.atem.events.connect,
+            lambda params: self.hass.loop.call_soon_threadsafe(self._on_connection, True),
+        )
+        switcher.registerEvent(
+            switcher.atem.events.disconnect,
+            lambda params: self.hass.loop.call_soon_threadsafe(self._on_connection, False),
+        )
+        return switcher
+
+    def _on_receive_sync(self, params: Dict[Any, Any]) -> None:
+        """Forward PyATEMMax events; runs on the PyATEMMax event thread."""
+        # PyATEMMax ne transmet pas l'index concerné par la commande
+        self._on_command(params.get('cmd'), None)
+
+    @property
+    def connected(self) -> bool:
+        """Return True once the initial state dump has been received."""
+        return self.switcher.connected
+
+    @property
+    def model(self) -> str:
+        """Return the switcher model name."""
+        return self.switcher.atemModel
+
+    @property
+    def me_count(self) -> int:
+        """Return the number of M/Es of the switcher."""
+        return self.switcher.topology.mEs or 1
+
+    @property
+    def aux_count(self) -> int:
+        """Return the number of aux outputs of the switcher."""
+        return self.switcher.topology.auxBusses or 0
+
+    def get_program_input(self, me: int) -> Optional[int]:
+        """Return the program source of an M/E."""
+        return self.switcher.programInput[me].videoSource.value
+
+    def get_preview_input(self, me: int) -> Optional[int]:
+        """Return the preview source of an M/E."""
+        return self.switcher.previewInput[me].videoSource.value
+
+    def get_aux_source(self, aux: int) -> Optional[int]:
+        """Return the source of an aux output."""
+        return self.switcher.auxSource[aux].input.value
+
+    def in_transition(self, me: int) -> bool:
+        """Return True while a transition runs on an M/E."""
+        return bool(self.switcher.transition[me].inTransition)
+
+    def get_tally(self) -> Dict[int, int]:
+        """Return source -> tally flags (0x01 program, 0x02 preview) from TlSr."""
+        # PyATEMMax pré-remplit toutes les sources connues du protocole : on
+        # ne garde que celles annoncées par le mélangeur (InPr)
+        flags = self.switcher.tally.bySource.flags
+        return {
+            source.value: flags[source].program | flags[source].preview << 1
+            for source, props in self.switcher.inputProperties._data.items()
+            if props.longName
+        }
+
+    def get_input_properties(self, source: int) -> Optional[Tuple[str, str]]:
+        """Return the (long name, short name) of a source."""
+        props = self.switcher.inputProperties[source]
+        return (props.longName, props.shortName) if props.longName else None
+
+    def get_all_input_properties(self) -> Dict[int, Tuple[str, str]]:
+        """Return the (long name, short name) of every known source."""
+        return {
+            source.value: (props.longName, props.shortName)
+            for source, props in self.switcher.inputProperties._data.items()
+            if props.longName
+        }
+
+    def idle_time(self) -> float:
+        """Return the seconds elapsed since the last packet from the switcher."""
+        # PyATEMMax date chaque paquet reçu, keepalives compris
+        return time.time() - self.switcher._lastContact
+
+    def _connect(self, timeout: float) -> bool:
+        """Connect to the switcher; runs in the executor."""
+        # Un objet PyATEMMax réutilisé ne relit pas l'état initial : on repart de zéro
+        if self._switcher_used:
+            self.switcher.disconnect()
+            self.switcher = self._create_switcher()
+        self._switcher_used = True
+        self.switcher.connect(self.host)
+        return self.switcher.waitForConnection(infinite=False, timeout=timeout)
+
+    async def async_connect(self, timeout: float) -> bool:
+        """Connect and wait for the initial state dump."""
+        return await self.hass.async_add_executor_job(self._connect, timeout)
+
+    async def async_disconnect(self) -> None:
+        """Close the connection."""
+        await self.hass.async_add_executor_job(self.switcher.disconnect)
+
+    async def async_close(self) -> None:
+        """Close the connection and stop the command thread."""
+        await self.async_disconnect()
+        self._command_executor.shutdown(wait=False)
+
+    def _send_commands(self, commands: Sequence[AtemCommand]) -> None:
+        """Send commands; runs on the command thread."""
+        for command in commands:
+            self._senders[command.name](command)
+
+    async def async_send_commands(self, commands: Sequence[AtemCommand]) -> None:
+        """Send commands to the switcher, in order."""
+        await self.hass.loop.run_in_executor(
+            self._command_executor, self._send_commands, commands
+        )
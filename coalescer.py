@@ -0,0 +1,108 @@
+"""Coalescing stage for bursts of ATEM events."""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+
+class AtemEventCoalescer:
+    """Merge every event received inside a window into a single publish.
+
+    Each event restarts the window (trailing edge), but a burst is never held
+    longer than ``max_latency`` after its first event.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        window: float,
+        max_latency: float,
+        publish: Callable[[Set[str]], Awaitable[None]],
+    ) -> None:
+        """Initialize the coalescer (durations in seconds)."""
+        self.hass = hass
+        self.window = window
+        self.max_latency = max(max_latency, window)
+        self._publish = publish
+        self._pending: Set[str] = set()
+        self._pending_count = 0
+        self._burst_start: Optional[float] = None
+        self._unsub_timer: Optional[CALLBACK_TYPE] = None
+
+        # Compteurs
+        self.events_received = 0
+        self.events_merged = 0
+        self.publishes = 0
+
+    @callback
+    def async_push(self, cmd: str, index: Optional[int] = None) -> None:
+        """Register an event; must be called from the event loop."""
+        self.events_received += 1
+        self._pending.add(cmd)
+        self._pending_count += 1
+
+        now = self.hass.loop.time()
+        if self._burst_start is None:
+            self._burst_start = now
+
+        # Plafond de latence atteint : on publie tout de suite
+        remaining = self._burst_start + self.max_latency - now
+        if remaining <= 0:
+            self._async_fire()
+            return
+
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+        self._unsub_timer = async_call_later(
+            self.hass, min(self.window, remaining), self._async_timer_fired
+        )
+
+    @callback
+    def _async_timer_fired(self, _now: Any) -> None:
+        """Handle the end of the coalescing window."""
+        self._unsub_timer = None
+        self._async_fire()
+
+    @callback
+    def _async_fire(self) -> None:
+        """Schedule a publish of the pending changes."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+        if not self._pending:
+            return
+
+        cmds = self._pending
+        self.events_merged += self._pending_count - 1
+        self.publishes += 1
+        self._pending = set()
+        self._pending_count = 0
+        self._burst_start = None
+
+        self.hass.async_create_task(self._publish(cmds))
+
+    async def async_flush(self) -> None:
+        """Publish pending changes immediately."""
+        self._async_fire()
+
+    @callback
+    def async_cancel(self) -> None:
+        """Drop pending changes and stop the timer."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        self._pending = set()
+        self._pending_count = 0
+        self._burst_start = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return the coalescing counters."""
+        return {
+            "events_received": self.events_received,
+            "events_merged": self.events_merged,
+            "publishes": self.publishes,
+        }
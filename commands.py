@@ -0,0 +1,198 @@
+"""Ordered queue for the commands sent to an ATEM switcher."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+
+from .client import AtemClient, AtemCommand
+
+_LOGGER = logging.getLogger(__name__)
+
+# Nombre de commandes en attente au-delà duquel les appelants patientent
+DEFAULT_QUEUE_SIZE = 64
+# Commandes regroupées au plus dans un même paquet ATEM
+MAX_BATCH_SIZE = 32
+
+
+class AtemCommandTiming:
+    """Queue wait and send duration of one command type (seconds)."""
+
+    __slots__ = ("count", "wait_total", "wait_max", "send_total", "send_max")
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.send_total = 0.0
+        self.send_max = 0.0
+
+    def record(self, wait: float, send: float) -> None:
+        """Add one sent command."""
+        self.count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.send_total += send
+        self.send_max = max(self.send_max, send)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the timings in milliseconds."""
+        count = self.count or 1
+        return {
+            "count": self.count,
+            "wait_avg_ms": round(self.wait_total / count * 1000, 3),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "send_avg_ms": round(self.send_total / count * 1000, 3),
+            "send_max_ms": round(self.send_max * 1000, 3),
+        }
+
+
+class AtemCommandQueue:
+    """Send the commands of one switcher in order, from a single worker.
+
+    Callers wait while the queue is full, and the commands queued while the
+    worker was busy are sent together in one packet.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: AtemClient,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        """Initialize the queue."""
+        self.hass = hass
+        self.client = client
+        self._queue: asyncio.Queue[Tuple[AtemCommand, asyncio.Future, float]] = (
+            asyncio.Queue(maxsize)
+        )
+        self._worker: Optional[asyncio.Task] = None
+
+        # Compteurs
+        self.commands_sent = 0
+        self.commands_failed = 0
+        self.batches_sent = 0
+        self.timings: Dict[str, AtemCommandTiming] = {}
+
+    @callback
+    def async_start(self) -> None:
+        """Start the worker."""
+        if self._worker is None:
+            self._worker = self.hass.async_create_background_task(
+                self._async_run(), f"ATEM command queue {self.client.host}"
+            )
+
+    async def async_stop(self) -> None:
+        """Stop the worker and fail the commands still queued."""
+        # Plus aucune soumission n'est acceptée à partir d'ici
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._async_fail_queued()
+
+    @callback
+    def _async_fail_queued(self) -> None:
+        """Fail the commands left in the queue of a stopped worker."""
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(ConnectionError("ATEM command queue stopped"))
+
+    async def async_submit(self, command: AtemCommand) -> None:
+        """Queue a command and wait until it has been sent to the switcher."""
+        await self.async_submit_many((command,))
+
+    async def async_submit_many(self, commands: Sequence[AtemCommand]) -> None:
+        """Queue consecutive commands and wait until they have all been sent."""
+        if self._worker is None:
+            raise ConnectionError("ATEM command queue stopped")
+        futures = []
+        for command in commands:
+            future = self.hass.loop.create_future()
+            await self._queue.put((command, future, self.hass.loop.time()))
+            futures.append(future)
+            if self._worker is None:
+                # File arrêtée pendant l'attente d'une place : personne
+                # n'enverra ce qui vient d'être mis en file
+                self._async_fail_queued()
+                break
+        await asyncio.gather(*futures)
+
+    @callback
+    def async_enqueue(self, commands: Sequence[AtemCommand]) -> asyncio.Future:
+        """Queue commands without waiting; the future gives the loop time of each send.
+
+        Raises asyncio.QueueFull when the commands do not all fit in the queue.
+        """
+        if self._worker is None:
+            raise ConnectionError("ATEM command queue stopped")
+        if self._queue.maxsize and self._queue.qsize() + len(commands) > self._queue.maxsize:
+            raise asyncio.QueueFull
+        now = self.hass.loop.time()
+        futures = []
+        for command in commands:
+            future = self.hass.loop.create_future()
+            self._queue.put_nowait((command, future, now))
+            futures.append(future)
+        return asyncio.gather(*futures)
+
+    @property
+    def depth(self) -> int:
+        """Return the number of commands waiting to be sent."""
+        return self._queue.qsize()
+
+    async def _async_run(self) -> None:
+        """Send the queued commands, batching those already waiting."""
+        while True:
+            batch: List[Tuple[AtemCommand, asyncio.Future, float]] = [await self._queue.get()]
+            start = self.hass.loop.time()
+            try:
+                # Laisser les appelants du même tour de boucle compléter le paquet
+                await asyncio.sleep(0)
+                while len(batch) < MAX_BATCH_SIZE and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                start = self.hass.loop.time()
+                await self.client.async_send_commands([item[0] for item in batch])
+            except asyncio.CancelledError:
+                # Arrêt de la file : le lot retiré de la file échoue aussi
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(ConnectionError("ATEM command queue stopped"))
+                raise
+            except Exception as err:
+                _LOGGER.error(f"Error sending ATEM commands: {err}")
+                self.commands_failed += len(batch)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(err)
+                continue
+
+            end = self.hass.loop.time()
+            self.batches_sent += 1
+            self.commands_sent += len(batch)
+            for command, future, queued_at in batch:
+                timing = self.timings.get(command.name)
+                if timing is None:
+                    timing = self.timings[command.name] = AtemCommandTiming()
+                timing.record(start - queued_at, end - start)
+                if not future.done():
+                    future.set_result(end)
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        """Return the queue counters and per-command timings."""
+        return {
+            "depth": self.depth,
+            "commands_sent": self.commands_sent,
+            "commands_failed": self.commands_failed,
+            "batches_sent": self.batches_sent,
+            "timings": {name: timing.as_dict() for name, timing in self.timings.items()},
+        }
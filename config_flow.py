@@ -1,30 +1,135 @@
+import ipaddress
 import logging
+import socket
 import voluptuous as vol
 from homeassistant import config_entries
-import PyATEMMax
-import subprocess  # Pour la récupération de l'adresse MAC
+from homeassistant.core import callback
 
-from .const import DOMAIN
+from .const import (
+    CONF_AUDIO_METERING,
+    CONF_AUDIO_THRESHOLD,
+    CONF_AUDIO_WINDOW,
+    CONF_COALESCE_MAX_LATENCY,
+    CONF_COALESCE_WINDOW,
+    CONF_JSON_UDP_TARGETS,
+    CONF_TRANSPORT,
+    CONF_TSL_SCREEN,
+    CONF_TSL_TCP_TARGETS,
+    CONF_TSL_UDP_TARGETS,
+    DEFAULT_AUDIO_METERING,
+    DEFAULT_AUDIO_THRESHOLD,
+    DEFAULT_AUDIO_WINDOW,
+    DEFAULT_COALESCE_MAX_LATENCY,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_TRANSPORT,
+    DEFAULT_TSL_SCREEN,
+    DOMAIN,
+    TRANSPORT_NATIVE,
+    TRANSPORT_PYATEMMAX,
+)
+from .discovery import async_discover
+from .fanout import DEFAULT_JSON_PORT, DEFAULT_TSL_PORT, parse_targets
+from .sessions import async_get_session_registry
 
 _LOGGER = logging.getLogger(__name__)
 
+# Attente maximale de l'état initial lors de la validation (s)
+VALIDATION_TIMEOUT = 15
+# Taille maximale du sous-réseau exploré (un /22)
+MAX_DISCOVERY_HOSTS = 1024
+
 class CannotConnect(Exception):
     """Erreur pour indiquer que la connexion a échoué."""
 
+def _default_subnet() -> str:
+    """Retourne le /24 de l'adresse locale utilisée pour sortir."""
+    try:
+        # Un socket UDP "connecté" n'envoie rien, il choisit juste l'interface
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(("10.255.255.255", 1))
+            local_ip = sock.getsockname()[0]
+    except OSError:
+        return "192.168.1.0/24"
+    return str(ipaddress.ip_network(f"{local_ip}/24", strict=False))
+
 class AtemSwitcherConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self):
+        """Initialise le flux."""
+        self._discovered = {}
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Retourne le flux d'options."""
+        return AtemOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input=None):
-        """Gère le flux initié par l'utilisateur."""
+        """Propose la recherche sur le réseau ou la saisie manuelle."""
+        return self.async_show_menu(step_id="user", menu_options=["discover", "manual"])
+
+    async def async_step_discover(self, user_input=None):
+        """Recherche les mélangeurs d'un sous-réseau."""
+        errors = {}
+
+        if user_input is not None:
+            try:
+                network = ipaddress.ip_network(user_input["subnet"], strict=False)
+            except ValueError:
+                errors["base"] = "invalid_subnet"
+            else:
+                if network.num_addresses > MAX_DISCOVERY_HOSTS:
+                    errors["base"] = "subnet_too_large"
+                else:
+                    # Les hôtes déjà configurés ne sont même pas sondés
+                    configured = self._async_current_ids()
+                    hosts = [str(ip) for ip in network.hosts() if str(ip) not in configured]
+                    self._discovered = await async_discover(self.hass, hosts)
+                    if self._discovered:
+                        return await self.async_step_pick()
+                    errors["base"] = "no_devices_found"
+
+        default = user_input["subnet"] if user_input else await self.hass.async_add_executor_job(_default_subnet)
+        data_schema = vol.Schema({
+            vol.Required("subnet", default=default): str,
+        })
+        return self.async_show_form(
+            step_id="discover", data_schema=data_schema, errors=errors
+        )
+
+    async def async_step_pick(self, user_input=None):
+        """Choix d'un mélangeur parmi ceux trouvés."""
+        if user_input is not None:
+            return await self.async_step_manual({"host": user_input["host"]})
+
+        choices = {
+            host: f"{model or 'ATEM (aucune session libre)'} ({host})"
+            for host, model in sorted(
+                self._discovered.items(), key=lambda item: ipaddress.ip_address(item[0])
+            )
+        }
+        data_schema = vol.Schema({
+            vol.Required("host"): vol.In(choices),
+        })
+        return self.async_show_form(step_id="pick", data_schema=data_schema)
+
+    async def async_step_manual(self, user_input=None):
+        """Gère la saisie manuelle de l'adresse."""
         errors = {}
 
         if user_input is not None:
+            # NOTE: La récupération de l'adresse MAC est complexe et dépend de l'OS.
+            # Pour l'instant, nous utiliserons l'adresse IP comme identifiant unique
+            # pour simplifier, même si ce n'est pas l'idéal.
+            # Vérifié avant la validation : inutile d'ouvrir une session pour rien
+            unique_id = user_input["host"]
+            await self.async_set_unique_id(unique_id)
+            self._abort_if_unique_id_configured()
+
             try:
                 # Tente de valider la connexion avec l'appareil
-                # On passe la FONCTION et ses ARGUMENTS à l'executor
-                await self.hass.async_add_executor_job(
-                    self._validate_connection, user_input["host"]
-                )
+                await self._async_validate_connection(user_input["host"])
             except CannotConnect:
                 errors["base"] = "cannot_connect"
             except Exception as ex:
@@ -32,13 +137,6 @@ class AtemSwitcherConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors["base"] = "unknown"
             else:
                 # La connexion est réussie, on peut continuer
-                # NOTE: La récupération de l'adresse MAC est complexe et dépend de l'OS.
-                # Pour l'instant, nous utiliserons l'adresse IP comme identifiant unique
-                # pour simplifier, même si ce n'est pas l'idéal.
-                unique_id = user_input["host"]
-                await self.async_set_unique_id(unique_id)
-                self._abort_if_unique_id_configured()
-
                 return self.async_create_entry(
                     title=user_input["host"],
                     data=user_input,
@@ -49,35 +147,108 @@ class AtemSwitcherConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             vol.Required("host", default=user_input.get("host", "") if user_input else ""): str,
         })
         return self.async_show_form(
-            step_id="user", data_schema=data_schema, errors=errors
+            step_id="manual", data_schema=data_schema, errors=errors
         )
 
-    def _validate_connection(self, host: str) -> None:
+    async def _async_validate_connection(self, host: str) -> None:
         """Valide que nous pouvons nous connecter à l'ATEM.
-           Cette fonction est conçue pour être exécutée dans un thread executor.
+           La session ouverte est partagée : la configuration de l'entrée la
+           reprend avec son état initial au lieu de se reconnecter.
         """
         _LOGGER.info("Validation de la connexion à l'ATEM sur %s", host)
-        switcher = PyATEMMax.ATEMMax()
+        # Une nouvelle entrée n'a pas encore d'options : transport par défaut
+        registry = async_get_session_registry(self.hass)
+        client = registry.async_acquire(host, DEFAULT_TRANSPORT)
         try:
-            switcher.connect(host)
-            # On attend la connexion pendant 2 secondes maximum
-            if not switcher.waitForConnection(timeout=15):
+            if not await client.async_connect(VALIDATION_TIMEOUT):
                 _LOGGER.error("Timeout lors de la connexion à l'ATEM.")
                 raise CannotConnect
             
-            _LOGGER.info("Connexion à l'ATEM réussie. Modèle: %s", switcher.atemModel)
+            _LOGGER.info("Connexion à l'ATEM réussie. Modèle: %s", client.model)
 
+        except CannotConnect:
+            raise
         except Exception as e:
             _LOGGER.error("Échec de la connexion à l'ATEM: %s", e)
             raise CannotConnect from e
         finally:
-            # Il est crucial de se déconnecter après la validation
-            if switcher.connected:
-                switcher.disconnect()
-                _LOGGER.info("Déconnecté de l'ATEM après validation.")
+            # La session reste ouverte un moment pour la configuration de l'entrée
+            await registry.async_release(client)
 
     # La fonction _get_mac_address est complexe à implémenter de manière multi-plateforme.
     # Nous la laissons de côté pour le moment pour nous concentrer sur la logique principale.
+
+
+class AtemOptionsFlow(config_entries.OptionsFlow):
+    """Options de l'intégration ATEM."""
+
+    def __init__(self, config_entry):
+        """Initialise le flux d'options."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Gère les options."""
+        errors = {}
+        if user_input is not None:
+            # Abonnés au tally : "hôte[:port]" séparés par des virgules
+            for key, port in (
+                (CONF_TSL_UDP_TARGETS, DEFAULT_TSL_PORT),
+                (CONF_TSL_TCP_TARGETS, DEFAULT_TSL_PORT),
+                (CONF_JSON_UDP_TARGETS, DEFAULT_JSON_PORT),
+            ):
+                try:
+                    parse_targets(user_input.get(key, ""), port)
+                except vol.Invalid:
+                    errors[key] = "invalid_targets"
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = {**self.config_entry.options, **(user_input or {})}
+        data_schema = vol.Schema({
+            # Fenêtre de regroupement des événements (ms)
+            vol.Required(
+                CONF_COALESCE_WINDOW,
+                default=options.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1000)),
+            # Délai maximal avant publication (ms)
+            vol.Required(
+                CONF_COALESCE_MAX_LATENCY,
+                default=options.get(CONF_COALESCE_MAX_LATENCY, DEFAULT_COALESCE_MAX_LATENCY),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=5000)),
+            # Client PyATEMMax (threads) ou transport UDP natif asyncio
+            vol.Required(
+                CONF_TRANSPORT,
+                default=options.get(CONF_TRANSPORT, DEFAULT_TRANSPORT),
+            ): vol.In([TRANSPORT_PYATEMMAX, TRANSPORT_NATIVE]),
+            # Récepteurs de tally TSL UMD v5 (UDP, TCP) et JSON (UDP)
+            vol.Optional(
+                CONF_TSL_UDP_TARGETS, default=options.get(CONF_TSL_UDP_TARGETS, ""),
+            ): str,
+            vol.Optional(
+                CONF_TSL_TCP_TARGETS, default=options.get(CONF_TSL_TCP_TARGETS, ""),
+            ): str,
+            vol.Optional(
+                CONF_JSON_UDP_TARGETS, default=options.get(CONF_JSON_UDP_TARGETS, ""),
+            ): str,
+            vol.Optional(
+                CONF_TSL_SCREEN, default=options.get(CONF_TSL_SCREEN, DEFAULT_TSL_SCREEN),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=65534)),
+            # Vumètres des entrées audio (transport natif) : fenêtre de
+            # publication (ms) et seuil d'activité (dBFS)
+            vol.Optional(
+                CONF_AUDIO_METERING,
+                default=options.get(CONF_AUDIO_METERING, DEFAULT_AUDIO_METERING),
+            ): bool,
+            vol.Optional(
+                CONF_AUDIO_WINDOW, default=options.get(CONF_AUDIO_WINDOW, DEFAULT_AUDIO_WINDOW),
+            ): vol.All(vol.Coerce(int), vol.Range(min=100, max=10000)),
+            vol.Optional(
+                CONF_AUDIO_THRESHOLD,
+                default=options.get(CONF_AUDIO_THRESHOLD, DEFAULT_AUDIO_THRESHOLD),
+            ): vol.All(vol.Coerce(int), vol.Range(min=-60, max=0)),
+        })
+        return self.async_show_form(step_id="init", data_schema=data_schema, errors=errors)
+    
     
     
     
@@ -0,0 +1,226 @@
+"""Connection state machine for an ATEM switcher."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import Callable, Dict, Optional
+
+from homeassistant.core import HomeAssistant, callback
+
+from .client import AtemClient
+
+_LOGGER = logging.getLogger(__name__)
+
+# États de la connexion
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTING = "connecting"
+STATE_CONNECTED = "connected"
+STATE_STALLED = "stalled"
+STATE_BACKOFF = "backoff"
+
+# Durée maximale d'une tentative de connexion
+CONNECT_TIMEOUT = 3.0
+# Attente entre deux tentatives : BACKOFF_BASE * 2^n, plafonnée, avec gigue
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+BACKOFF_JITTER = 0.5
+
+# Le mélangeur envoie au moins un paquet (keepalive, Time...) toutes les 0,5 s :
+# au-delà de HEARTBEAT_TIMEOUT sans nouvelles, la session est bloquée
+HEARTBEAT_TIMEOUT = 1.5
+HEARTBEAT_CHECK_INTERVAL = 0.25
+
+
+class AtemConnectionManager:
+    """Keep a switcher connected, retrying forever with exponential backoff.
+
+    Connection changes are reported by the client; the manager only drives
+    the attempts and never blocks its callers. While connected, the packets
+    received from the switcher serve as heartbeat: a silent session is
+    considered stalled and reopened.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: AtemClient,
+        on_connected: Callable[[], None],
+        on_disconnected: Callable[[], None],
+    ) -> None:
+        """Initialize the manager; the callbacks run on the event loop."""
+        self.hass = hass
+        self.client = client
+        self._on_connected = on_connected
+        self._on_disconnected = on_disconnected
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.TimerHandle] = None
+        self._connected = asyncio.Event()
+        self._lost = asyncio.Event()
+        self.state = STATE_DISCONNECTED
+        self.state_since = hass.loop.time()
+        self._lost_at: Optional[float] = None
+        client.set_connection_callback(self._async_connection_changed)
+
+        # Compteurs
+        self.connect_attempts = 0
+        self.connections = 0
+        self.stalls = 0
+        self.reconnects = 0
+        self.last_reconnect_time: Optional[float] = None
+        self.max_reconnect_time = 0.0
+        self.total_reconnect_time = 0.0
+
+    @callback
+    def async_start(self) -> None:
+        """Start connecting in the background."""
+        if self._task is None:
+            # Session déjà ouverte (config flow, rechargement) : reprise directe
+            if self.client.connected:
+                self._async_connection_changed(True)
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), f"ATEM connection {self.client.host}"
+            )
+
+    async def async_stop(self) -> None:
+        """Stop the connection attempts."""
+        self._cancel_heartbeat()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def async_wait_connected(self, timeout: float) -> bool:
+        """Wait at most timeout seconds for the switcher to be connected."""
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            _LOGGER.debug(f"ATEM {self.client.host} connection: {self.state} -> {state}")
+            self.state = state
+            self.state_since = self.hass.loop.time()
+
+    @callback
+    def _async_connection_changed(self, connected: bool) -> None:
+        """Handle a connection change reported by the client."""
+        now = self.hass.loop.time()
+        if connected:
+            self._lost.clear()
+            self._connected.set()
+            self._set_state(STATE_CONNECTED)
+            self._schedule_heartbeat()
+            self.connections += 1
+            if self._lost_at is not None:
+                elapsed = now - self._lost_at
+                self._lost_at = None
+                self.reconnects += 1
+                self.last_reconnect_time = elapsed
+                self.total_reconnect_time += elapsed
+                self.max_reconnect_time = max(self.max_reconnect_time, elapsed)
+                _LOGGER.info(f"Reconnected to ATEM at {self.client.host} in {elapsed:.2f} s")
+            self._on_connected()
+        elif self.state == STATE_CONNECTED:
+            # Une perte déjà traitée (arrêt du flux suivi de la déconnexion
+            # PyATEMMax, échec d'une tentative) n'est ni rejournalisée ni republiée
+            self._async_lost(STATE_DISCONNECTED)
+
+    @callback
+    def _async_lost(self, state: str) -> None:
+        """Record the loss of a connected session and notify the coordinator."""
+        self._cancel_heartbeat()
+        self._connected.clear()
+        self._lost.set()
+        self._set_state(state)
+        if self._lost_at is None:
+            self._lost_at = self.hass.loop.time()
+        _LOGGER.warning(f"Connection to ATEM at {self.client.host} lost")
+        self._on_disconnected()
+
+    def _schedule_heartbeat(self) -> None:
+        self._cancel_heartbeat()
+        self._heartbeat = self.hass.loop.call_later(
+            HEARTBEAT_CHECK_INTERVAL, self._check_heartbeat
+        )
+
+    def _cancel_heartbeat(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    @callback
+    def _check_heartbeat(self) -> None:
+        """Detect a session that stopped receiving packets."""
+        self._heartbeat = None
+        idle = self.client.idle_time()
+        if idle < HEARTBEAT_TIMEOUT:
+            self._schedule_heartbeat()
+            return
+
+        self.stalls += 1
+        _LOGGER.warning(
+            f"No packet from ATEM at {self.client.host} for {idle:.1f} s, reopening the session"
+        )
+        # La boucle de connexion ferme la session et en ouvre une neuve
+        self._async_lost(STATE_STALLED)
+
+    @property
+    def alive(self) -> bool:
+        """Return True while the session is up and receiving packets."""
+        return self.state == STATE_CONNECTED
+
+    async def _async_run(self) -> None:
+        """Connect, wait for a loss, and retry with exponential backoff."""
+        failures = 0
+        while True:
+            if self.client.connected and not self._lost.is_set():
+                failures = 0
+                await self._lost.wait()
+            if self.state == STATE_STALLED:
+                await self.client.async_disconnect()
+
+            self._set_state(STATE_CONNECTING)
+            self.connect_attempts += 1
+            try:
+                # asyncio.timeout plutôt que wait_for : une annulation arrivant
+                # au moment où la connexion aboutit n'est pas perdue
+                async with asyncio.timeout(CONNECT_TIMEOUT + 1):
+                    connected = await self.client.async_connect(CONNECT_TIMEOUT)
+            except (asyncio.TimeoutError, OSError) as err:
+                _LOGGER.debug(f"ATEM connection attempt failed: {err}")
+                connected = False
+            if connected:
+                continue
+
+            # Silence complet jusqu'à la prochaine tentative
+            await self.client.async_disconnect()
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** failures)
+            delay *= 1 - BACKOFF_JITTER * random.random()
+            failures += 1
+            _LOGGER.debug(f"ATEM at {self.client.host} unreachable, retrying in {delay:.2f} s")
+            self._set_state(STATE_BACKOFF)
+            await asyncio.sleep(delay)
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        """Return the connection state and reconnection metrics."""
+        return {
+            "state": self.state,
+            "state_duration_s": round(self.hass.loop.time() - self.state_since, 3),
+            "connect_attempts": self.connect_attempts,
+            "connections": self.connections,
+            "stalls": self.stalls,
+            "reconnects": self.reconnects,
+            "last_reconnect_s": (
+                None if self.last_reconnect_time is None
+                else round(self.last_reconnect_time, 3)
+            ),
+            "max_reconnect_s": round(self.max_reconnect_time, 3),
+            "avg_reconnect_s": round(self.total_reconnect_time / (self.reconnects or 1), 3),
+        }
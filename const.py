@@ -1,3 +1,43 @@
 """Constants for the ATEM Switcher integration."""
 
-DOMAIN = "hass_atem"
\ No newline at end of file
+DOMAIN = "hass_atem"
+
+# Registre des sessions partagées par hôte (hass.data)
+DATA_SESSIONS = f"{DOMAIN}_sessions"
+# Index des cibles des services : appareil, entité, entrée -> coordinateur
+DATA_TARGETS = f"{DOMAIN}_targets"
+
+# Options : regroupement des événements
+CONF_COALESCE_WINDOW = "coalesce_window_ms"
+CONF_COALESCE_MAX_LATENCY = "coalesce_max_latency_ms"
+
+# Une trame vidéo à 50 i/s
+DEFAULT_COALESCE_WINDOW = 20
+DEFAULT_COALESCE_MAX_LATENCY = 100
+
+# Options : transport utilisé pour parler au mélangeur
+CONF_TRANSPORT = "transport"
+TRANSPORT_PYATEMMAX = "pyatemmax"
+TRANSPORT_NATIVE = "native"
+DEFAULT_TRANSPORT = TRANSPORT_PYATEMMAX
+
+# Cadence utilisée pour convertir les délais en images des séquences
+DEFAULT_FRAME_RATE = 25
+
+# Options : abonnés au tally (listes "hôte:port" séparées par des virgules)
+CONF_TSL_UDP_TARGETS = "tsl_udp_targets"
+CONF_TSL_TCP_TARGETS = "tsl_tcp_targets"
+CONF_JSON_UDP_TARGETS = "json_udp_targets"
+# Écran TSL UMD v5 adressé par les trames
+CONF_TSL_SCREEN = "tsl_screen"
+DEFAULT_TSL_SCREEN = 0
+
+# Options : mesure des niveaux audio (AMLv/FMLv)
+CONF_AUDIO_METERING = "audio_metering"
+# Fenêtre d'agrégation, qui est aussi la période de publication (ms)
+CONF_AUDIO_WINDOW = "audio_window_ms"
+# Niveau RMS (dBFS) au-dessus duquel une entrée est active
+CONF_AUDIO_THRESHOLD = "audio_threshold_db"
+DEFAULT_AUDIO_METERING = False
+DEFAULT_AUDIO_WINDOW = 500
+DEFAULT_AUDIO_THRESHOLD = -50
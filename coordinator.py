@@ -3,24 +3,94 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from datetime import timedelta
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
-import PyATEMMax
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import (
-    DataUpdateCoordinator,
-    UpdateFailed,
-)
-from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from .const import DOMAIN
+from .asrun import (
+    KIND_PREVIEW,
+    KIND_PROGRAM,
+    KIND_TRANSITION_END,
+    KIND_TRANSITION_START,
+    AtemAsRunLog,
+)
+from .audio import AtemAudioMeter
+from .client import AtemClient, AtemCommand
+from .coalescer import AtemEventCoalescer
+from .commands import AtemCommandQueue
+from .connection import CONNECT_TIMEOUT, AtemConnectionManager
+from .const import (
+    CONF_AUDIO_METERING,
+    CONF_AUDIO_THRESHOLD,
+    CONF_AUDIO_WINDOW,
+    CONF_COALESCE_MAX_LATENCY,
+    CONF_COALESCE_WINDOW,
+    CONF_JSON_UDP_TARGETS,
+    CONF_TRANSPORT,
+    CONF_TSL_SCREEN,
+    CONF_TSL_TCP_TARGETS,
+    CONF_TSL_UDP_TARGETS,
+    DEFAULT_AUDIO_METERING,
+    DEFAULT_AUDIO_THRESHOLD,
+    DEFAULT_AUDIO_WINDOW,
+    DEFAULT_COALESCE_MAX_LATENCY,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_TRANSPORT,
+    DEFAULT_TSL_SCREEN,
+    DOMAIN,
+)
+from .fanout import DEFAULT_JSON_PORT, DEFAULT_TSL_PORT, AtemTallyFanout, parse_targets
+from .inputs import AtemInputIndex
+from .metrics import AtemMetrics
+from .sessions import async_get_session_registry
+from .tally import AtemTallyEngine
 
 _LOGGER = logging.getLogger(__name__)
 
-# Intervalle de polling de secours
+# Handler de commande ATEM : (nom de la commande, index ou None)
+CommandHandler = Callable[[str, Optional[int]], None]
+
+# Intervalle de polling de secours, actif seulement sans flux d'événements
 SCAN_INTERVAL = timedelta(seconds=30)
+# Délai d'attente de l'écho PrgI/PrvI avant d'annuler un état optimiste
+OPTIMISTIC_TIMEOUT = 1.0
+# Une transition auto n'est confirmée qu'à sa fin
+OPTIMISTIC_AUTO_TIMEOUT = 10.0
+
+# Dernier état connu, restauré au démarrage avant la connexion
+STORAGE_VERSION = 1
+# Délai maximal entre un changement et son écriture sur disque
+STORAGE_SAVE_DELAY = 10
+
+# Bus mis à jour par chaque commande d'écho
+_ECHO_BUSES = {"PrgI": "program", "PrvI": "preview", "AuxS": "aux"}
+
+
+def me_key(name: str, me: int) -> str:
+    """Return the coordinator.data key of a per-M/E value."""
+    # Le M/E 1 garde les clés historiques ("program", "preview_name", ...)
+    return name if me == 0 else f"{name}_me{me + 1}"
+
+
+def aux_key(name: str, aux: int) -> str:
+    """Return the coordinator.data key of a per-aux value."""
+    return f"{name}_{aux + 1}"
+
+
+def storage_key(entry_id: str) -> str:
+    """Return the Store key of the snapshot of an entry."""
+    return f"{DOMAIN}.{entry_id}"
+
+
+def asrun_path(hass: HomeAssistant, entry_id: str) -> str:
+    """Return the as-run file of an entry."""
+    return hass.config.path(".storage", f"{DOMAIN}.{entry_id}.asrun")
 
 
 class AtemDataUpdateCoordinator(DataUpdateCoordinator):
@@ -36,185 +106,738 @@ class AtemDataUpdateCoordinator(DataUpdateCoordinator):
         )
         self.entry = entry
         self.atem_ip = entry.data["host"]
-        self.switcher = PyATEMMax.ATEMMax()
-        self._event_registered = False
-        self._reconnect_task = None
+
+        # Client natif asyncio ou PyATEMMax (threads + executor), partagé par
+        # hôte : la session validée par le config flow est reprise telle quelle
+        self.client: AtemClient = async_get_session_registry(hass).async_acquire(
+            self.atem_ip, entry.options.get(CONF_TRANSPORT, DEFAULT_TRANSPORT)
+        )
+        # async_shutdown est appelé par async_unload_entry puis par HA
+        # (async_on_unload) : la session n'est rendue qu'une fois
+        self._shut_down = False
+        self.client.set_command_callback(self._on_command)
+        # File ordonnée des commandes envoyées au mélangeur
+        self.commands = AtemCommandQueue(hass, self.client)
+        # Connexion maintenue en arrière-plan, sans jamais bloquer le refresh
+        self.connection = AtemConnectionManager(
+            hass, self.client, self._async_on_connected, self._async_on_disconnected
+        )
+
+        # Regroupe les rafales d'événements en une seule publication
+        self.coalescer = AtemEventCoalescer(
+            hass,
+            entry.options.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW) / 1000,
+            entry.options.get(CONF_COALESCE_MAX_LATENCY, DEFAULT_COALESCE_MAX_LATENCY) / 1000,
+            self._async_publish,
+        )
+
+        # Handlers par commande ATEM, enregistrés par les entités et services
+        self._command_handlers: Dict[str, List[CommandHandler]] = {}
+        # Table figée lue par le thread de réception (remplacée en bloc)
+        self._dispatch: Dict[str, Tuple[CommandHandler, ...]] = {}
+        # Compteurs par commande et histogrammes de latence des chemins chauds
+        self.metrics = AtemMetrics()
+
+        # Index des noms d'entrées, tenu à jour à partir des InPr
+        self.inputs = AtemInputIndex()
+        # Dernière topologie connue (M/E, sorties aux), lue dans _top
+        self.topology: Tuple[int, int] = (1, 0)
+        # Tally par source, appliqué dès réception sans passer par le regroupement
+        self.tally = AtemTallyEngine()
+        # Envoi du tally aux lampes externes, seulement si des abonnés sont configurés
+        self.fanout: Optional[AtemTallyFanout] = None
+        tsl_udp = parse_targets(entry.options.get(CONF_TSL_UDP_TARGETS, ""), DEFAULT_TSL_PORT)
+        tsl_tcp = parse_targets(entry.options.get(CONF_TSL_TCP_TARGETS, ""), DEFAULT_TSL_PORT)
+        json_udp = parse_targets(entry.options.get(CONF_JSON_UDP_TARGETS, ""), DEFAULT_JSON_PORT)
+        if tsl_udp or tsl_tcp or json_udp:
+            self.fanout = AtemTallyFanout(
+                hass, self.tally, self.inputs, tsl_udp, tsl_tcp, json_udp,
+                entry.options.get(CONF_TSL_SCREEN, DEFAULT_TSL_SCREEN),
+            )
+
+        # Vumètres des entrées audio, alimentés directement par le client
+        self.audio: Optional[AtemAudioMeter] = None
+        if entry.options.get(CONF_AUDIO_METERING, DEFAULT_AUDIO_METERING):
+            if self.client.supports_audio_levels:
+                self.audio = AtemAudioMeter(
+                    hass,
+                    entry.options.get(CONF_AUDIO_WINDOW, DEFAULT_AUDIO_WINDOW) / 1000,
+                    entry.options.get(CONF_AUDIO_THRESHOLD, DEFAULT_AUDIO_THRESHOLD),
+                    lambda: self.coalescer.async_push("audio_inputs"),
+                )
+                self.client.set_audio_level_callback(self.audio.async_record)
+            else:
+                _LOGGER.warning(
+                    f"Audio metering of ATEM at {self.atem_ip} needs the native transport"
+                )
+
+        # Instantané persistant, servi tant que la connexion n'est pas établie
+        self._store: Store = Store(hass, STORAGE_VERSION, storage_key(entry.entry_id))
+        self._save_scheduled = False
+        self._restored: Optional[Dict[str, Any]] = None
+        self._restore_task: Optional[asyncio.Task] = None
+
+        # Le modèle est rafraîchi à chaque _ver
+        self.async_register_command_handler(("_ver",), self.coalescer.async_push)
+        self.async_register_command_handler(("InPr",), self._async_handle_input_properties)
+        self.async_register_command_handler(("TlSr",), self._async_handle_tally)
+        # Le tally ne passe pas par la publication : il déclenche lui-même la sauvegarde
+        self.tally.async_add_flip_listener(self._async_tally_flipped)
+
+        # Journal de diffusion des changements program/preview et des transitions
+        self.asrun = AtemAsRunLog(hass, asrun_path(hass, entry.entry_id), self.inputs)
+        # Dernier état journalisé : (bus, M/E) -> source, ("transition", M/E) ->
+        # source entrante tant que la transition dure
+        self._asrun_state: Dict[Tuple[str, int], Any] = {}
+        self.async_register_command_handler(("PrgI", "PrvI", "TrPs"), self._async_log_switch)
+
+        # États optimistes en attente d'écho : (bus, M/E) -> (source, annulation
+        # du timeout, heure de la boucle à l'envoi)
+        self._pending: Dict[Tuple[str, int], Tuple[int, CALLBACK_TYPE, float]] = {}
+        self.async_register_command_handler(tuple(_ECHO_BUSES), self._async_handle_switch_echo)
+        # Attentes d'écho chronométrées : (bus, M/E) -> [(source attendue, future)]
+        self._echo_waiters: Dict[Tuple[str, int], List[Tuple[int, asyncio.Future]]] = {}
+
+        # Dernier état notifié aux entités, pour ne notifier que les clés modifiées
+        self._published_data: Dict[str, object] = {}
+        self._published_success: Optional[bool] = None
+        self.updates_published = 0
+        self.updates_suppressed = 0
         
     async def async_config_entry_first_refresh(self) -> None:
-        """Perform first refresh and setup event listeners."""
-        # Enregistrer les événements avant la première connexion
-        await self._async_setup_events()
-        
-        # Tenter la première connexion
-        await self._async_connect()
+        """Perform first refresh."""
+        self.commands.async_start()
+        await self.asrun.async_start()
+        if self.fanout is not None:
+            await self.fanout.async_start()
+        if self.audio is not None:
+            self.audio.async_start()
+        restored = await self._async_restore()
+        self.connection.async_start()
+
+        if restored:
+            # Les entités partent de l'instantané, la connexion suit en arrière-plan
+            self._restore_task = self.hass.async_create_background_task(
+                self._async_expire_restored(), f"ATEM restore {self.atem_ip}"
+            )
+        elif not await self.connection.async_wait_connected(CONNECT_TIMEOUT):
+            # Attente bornée : sans mélangeur, les entités démarrent déconnectées
+            # et la connexion se poursuit en arrière-plan
+            _LOGGER.warning(f"ATEM at {self.atem_ip} not reachable yet, retrying in the background")
         
         # Faire la première récupération de données
         await super().async_config_entry_first_refresh()
 
-    async def _async_setup_events(self) -> None:
-        """Setup event listeners for real-time updates."""
-        if not self._event_registered:
+    @callback
+    def async_register_command_handler(
+        self, cmds: Iterable[str], handler: CommandHandler
+    ) -> CALLBACK_TYPE:
+        """Register a loop-side handler for ATEM commands; returns an unsubscribe callback.
+
+        Handlers are called with the command name and its index (M/E, source
+        or aux) when the client provides it, otherwise None.
+        """
+        cmds = tuple(cmds)
+        for cmd in cmds:
+            self._command_handlers.setdefault(cmd, []).append(handler)
+        self._rebuild_dispatch()
+
+        @callback
+        def _unsubscribe() -> None:
+            for cmd in cmds:
+                handlers = self._command_handlers.get(cmd)
+                if handlers and handler in handlers:
+                    handlers.remove(handler)
+                    if not handlers:
+                        del self._command_handlers[cmd]
+            self._rebuild_dispatch()
+
+        return _unsubscribe
+
+    @callback
+    def _rebuild_dispatch(self) -> None:
+        """Precompute the command dispatch table used by the receive thread."""
+        # dict.fromkeys supprime les doublons en gardant l'ordre
+        self._dispatch = {
+            cmd: tuple(dict.fromkeys(handlers))
+            for cmd, handlers in self._command_handlers.items()
+        }
+
+    def _on_command(self, cmd: str, index: Optional[int]) -> None:
+        """Callback for received ATEM commands, may run on the PyATEMMax thread."""
+        # Les commandes sans abonné (Time, etc.) ne quittent jamais ce thread
+        handlers = self._dispatch.get(cmd)
+        if handlers is None:
+            dropped = self.metrics.dropped
+            dropped[cmd] = dropped.get(cmd, 0) + 1
+            return
+        received = self.metrics.received
+        received[cmd] = received.get(cmd, 0) + 1
+        if self.client.runs_in_loop:
+            self._async_dispatch(cmd, index, handlers)
+        else:
+            self.hass.loop.call_soon_threadsafe(
+                self._async_dispatch, cmd, index, handlers, time.monotonic()
+            )
+
+    @callback
+    def _async_dispatch(
+        self,
+        cmd: str,
+        index: Optional[int],
+        handlers: Tuple[CommandHandler, ...],
+        queued: Optional[float] = None,
+    ) -> None:
+        """Route an ATEM command to its handlers on the event loop."""
+        if queued is not None:
+            self.metrics.receive_hop.record(time.monotonic() - queued)
+        _LOGGER.debug(f"Received ATEM event: {cmd} ({index})")
+        for handler in handlers:
             try:
-                # Enregistrer le callback pour les événements
-                await self.hass.async_add_executor_job(
-                    self.switcher.registerEvent,
-                    self.switcher.atem.events.receive,
-                    self._on_receive_sync
-                )
-                self._event_registered = True
-                _LOGGER.info("ATEM event listeners registered successfully")
+                handler(cmd, index)
             except Exception as err:
-                _LOGGER.error(f"Failed to register ATEM events: {err}")
-
-    def _on_receive_sync(self, params: Dict[Any, Any]) -> None:
-        """Sync callback for ATEM events - bridge to async."""
-        # Cette fonction est appelée dans un thread, on doit la rendre async-safe
-        asyncio.run_coroutine_threadsafe(
-            self._on_receive_async(params),
-            self.hass.loop
-        )
+                _LOGGER.error(f"Error handling ATEM event {cmd}: {err}")
 
-    async def _on_receive_async(self, params: Dict[Any, Any]) -> None:
-        """Async handler for ATEM events."""
-        try:
-            cmd = params.get('cmd')
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify only the listeners subscribed to the data keys that changed.
 
-            if cmd == "Time":
-                return
-            
-            # Log pour debug
-            _LOGGER.debug(f"Received ATEM event: {cmd} - {params.get('cmdName', '')}")
-            
-            # Mettre à jour les données immédiatement selon l'événement
-            update_needed = False
-            
-            if cmd in ["PrgI", "PrvI", "_ver", "InPr"]:
-                update_needed = True
-            
-            # Si une mise à jour est nécessaire, récupérer les données et notifier
-            if update_needed:
-                data = await self._async_get_data()
-                if data:
-                    self.async_set_updated_data(data)
-                    
-        except Exception as err:
-            _LOGGER.error(f"Error handling ATEM event: {err}")
+        Listeners pass the keys they depend on as their context; listeners
+        without context are always notified. Every listener is notified when
+        the availability changes, and nobody is when the snapshot is identical
+        to the last published one (state dumps, reconnects, fallback polls).
+        """
+        data = self.data or {}
+        previous = self._published_data
+        changed = {
+            key for key in data.keys() | previous.keys()
+            if data.get(key) != previous.get(key)
+        }
+        availability_changed = self.last_update_success != self._published_success
+        if not changed and not availability_changed:
+            self.updates_suppressed += 1
+            return
+
+        self.updates_published += 1
+        self._published_data = dict(data)
+        self._published_success = self.last_update_success
+        if changed and self.connection.alive:
+            self._async_schedule_save()
+
+        for update_callback, context in list(self._listeners.values()):
+            if availability_changed or context is None or not changed.isdisjoint(context):
+                update_callback()
 
-    async def _async_connect(self) -> None:
-        """Connect to ATEM switcher."""
+    @callback
+    def _async_handle_input_properties(self, cmd: str, source: Optional[int]) -> None:
+        """Update the input index from an InPr event."""
+        # Les événements journalisés gardent le nom d'avant le renommage
+        self.asrun.async_encode()
+        if source is None:
+            changed = self._sync_inputs()
+        else:
+            props = self.client.get_input_properties(source)
+            changed = props is not None and self.inputs.update(source, *props)
+        if changed:
+            self.coalescer.async_push(cmd, source)
+
+    @callback
+    def _async_handle_tally(self, cmd: str, index: Optional[int]) -> None:
+        """Apply a TlSr tally; only the flipped inputs are written."""
+        inputs = self.tally.inputs
+        self.tally.async_update(self.client.get_tally())
+        # Nouvelles entrées : les plateformes ajoutent leurs entités
+        if self.tally.inputs is not inputs:
+            self.coalescer.async_push(cmd, index)
+
+    @callback
+    def _async_tally_flipped(self, source: int, flags: int) -> None:
+        """Save the snapshot when the live tally changes."""
+        if self.connection.alive:
+            self._async_schedule_save()
+
+    async def _async_set_audio_levels(self, enable: bool) -> None:
+        """Start or stop the metering stream of the switcher."""
+        # Un mélangeur ignore la commande de l'autre famille de mixeur audio
         try:
-            # Se connecter au switcher
-            connected = await self.hass.async_add_executor_job(
-                self.switcher.connect,
-                self.atem_ip
+            await self.commands.async_submit_many(
+                (AtemCommand("SALN", int(enable)), AtemCommand("SFLN", int(enable)))
             )
-            
-            if not connected:
-                # Attendre la connexion
-                connected = await self.hass.async_add_executor_job(
-                    self.switcher.waitForConnection,
-                    5.0,
-                    False
-                )
-            
-            if connected:
-                _LOGGER.info(f"Connected to ATEM at {self.atem_ip}: {self.switcher.atemModel}")
-                # Attendre un peu pour que les données soient disponibles
-                await asyncio.sleep(1)
-            else:
-                raise UpdateFailed(f"Failed to connect to ATEM at {self.atem_ip}")
-                
         except Exception as err:
-            _LOGGER.error(f"Connection error: {err}")
-            raise ConfigEntryNotReady(f"Could not connect to ATEM: {err}")
+            _LOGGER.debug(f"Could not set the audio metering of ATEM at {self.atem_ip}: {err}")
 
-    async def _async_ensure_connected(self) -> bool:
-        """Ensure we're connected to the ATEM."""
-        if not self.switcher.connected:
+    @callback
+    def _async_log_switch(self, cmd: str, me: Optional[int]) -> None:
+        """Append the program/preview changes and transitions to the as-run log."""
+        # Sans index (PyATEMMax), chaque M/E est comparé au dernier état journalisé
+        for index in range(self.client.me_count) if me is None else (me,):
+            if cmd == "TrPs":
+                # La fin de transition reprend la source entrante notée au début
+                incoming = self._asrun_state.get(("transition", index))
+                if self.client.in_transition(index) == (incoming is not None):
+                    continue
+                if incoming is None:
+                    incoming = self._switcher_source("preview", index) or 0
+                    self._asrun_state[("transition", index)] = incoming
+                    self.asrun.async_append(KIND_TRANSITION_START, index, incoming)
+                else:
+                    del self._asrun_state[("transition", index)]
+                    self.asrun.async_append(KIND_TRANSITION_END, index, incoming)
+                continue
+            bus, kind = ("program", KIND_PROGRAM) if cmd == "PrgI" else ("preview", KIND_PREVIEW)
+            source = self._switcher_source(bus, index)
+            if source is None or source == self._asrun_state.get((bus, index)):
+                continue
+            self._asrun_state[(bus, index)] = source
+            self.asrun.async_append(kind, index, source)
+
+    def _switcher_source(self, bus: str, index: int) -> Optional[int]:
+        """Return the source of a bus (M/E or aux) as last reported by the switcher."""
+        if bus == "program":
+            return self.client.get_program_input(index)
+        if bus == "preview":
+            return self.client.get_preview_input(index)
+        return self.client.get_aux_source(index)
+
+    def current_source(self, bus: str, index: int) -> Optional[int]:
+        """Return the source shown on a bus, including a pending optimistic change."""
+        pending = self._pending.get((bus, index))
+        if pending is not None:
+            return pending[0]
+        return self._switcher_source(bus, index)
+
+    async def async_optimistic_command(
+        self,
+        changes: Dict[Tuple[str, int], Optional[int]],
+        command: Callable[[], Awaitable[None]],
+        timeout: float = OPTIMISTIC_TIMEOUT,
+    ) -> None:
+        """Publish the expected state of a switching command, then send it.
+
+        Each (bus, M/E) stays pending until a PrgI/PrvI echo reports the
+        expected source; without it within the timeout the switcher state
+        is published again.
+        """
+        changes = {
+            key: source for key, source in changes.items()
+            if source is not None and source != self.current_source(*key)
+        }
+        for key, source in changes.items():
+            self._async_set_pending(key, source, timeout)
+        if changes:
+            await self._async_publish(set())
+        try:
+            await command()
+        except Exception:
+            for key in changes:
+                self._async_clear_pending(key)
+            await self._async_publish(set())
+            raise
+
+    def _expected_changes(
+        self, commands: Sequence[AtemCommand]
+    ) -> Dict[Tuple[str, int], Optional[int]]:
+        """Return the program/preview/aux sources expected after the commands."""
+        state: Dict[Tuple[str, int], Optional[int]] = {}
+
+        def _source(bus: str, me: int) -> Optional[int]:
+            if (bus, me) in state:
+                return state[(bus, me)]
+            return self.current_source(bus, me)
+
+        for command in commands:
+            me = command.index
+            if command.name in ("DCut", "DAut"):
+                # Le programme et le preview s'échangent
+                program, preview = _source("program", me), _source("preview", me)
+                state[("program", me)] = preview
+                state[("preview", me)] = program
+            elif command.name == "CPgI":
+                state[("program", me)] = command.source
+            elif command.name == "CPvI":
+                state[("preview", me)] = command.source
+            elif command.name == "CAuS":
+                state[("aux", command.index)] = command.source
+        return state
+
+    @staticmethod
+    def _switch_timeout(commands: Sequence[AtemCommand]) -> float:
+        """Return how long the echo of switching commands may take."""
+        # Une transition auto n'est confirmée qu'à sa fin
+        if any(command.name == "DAut" for command in commands):
+            return OPTIMISTIC_AUTO_TIMEOUT
+        return OPTIMISTIC_TIMEOUT
+
+    async def async_switch(self, commands: Sequence[AtemCommand]) -> None:
+        """Send switching commands in one batch, with their optimistic state."""
+        await self.async_optimistic_command(
+            self._expected_changes(commands),
+            lambda: self.commands.async_submit_many(commands),
+            self._switch_timeout(commands),
+        )
+
+    async def async_synchronized_switch(
+        self, commands: Sequence[AtemCommand], release: asyncio.Event
+    ) -> Tuple[float, float, Optional[float]]:
+        """Send switching commands as soon as release is set, and time them.
+
+        Everything is computed before the release so that the commands of
+        several switchers leave together. Returns the loop times of the
+        release, of the send and of the PrgI echo (None without echo).
+        """
+        if not self.connection.alive:
+            raise ConnectionError(f"ATEM {self.atem_ip} not connected")
+        expected = self._expected_changes(commands)
+        changes = {
+            key: source for key, source in expected.items()
+            if source is not None and source != self.current_source(*key)
+        }
+        echoes = [
+            self._async_expect_echo(key, source)
+            for key, source in expected.items()
+            if key[0] == "program" and source is not None
+        ]
+        timeout = self._switch_timeout(commands)
+
+        try:
+            await release.wait()
+            released = self.hass.loop.time()
+            sent = self.commands.async_enqueue(commands)
+            # L'état optimiste est publié après le départ des commandes
+            for key, source in changes.items():
+                self._async_set_pending(key, source, timeout)
+            if changes:
+                self.hass.async_create_task(self._async_publish(set()))
             try:
-                await self._async_connect()
+                dispatched = (await sent)[-1]
             except Exception:
-                return False
-        return self.switcher.connected
+                for key in changes:
+                    self._async_clear_pending(key)
+                await self._async_publish(set())
+                raise
+
+            echoed: Optional[float] = None
+            if echoes:
+                try:
+                    async with asyncio.timeout(timeout):
+                        echoed = max(await asyncio.gather(*echoes))
+                except asyncio.TimeoutError:
+                    pass
+            return released, dispatched, echoed
+        finally:
+            for echo in echoes:
+                echo.cancel()
+
+    async def async_run_sequence(self, steps: Sequence[Tuple[float, AtemCommand]]) -> None:
+        """Run (delay in seconds, command) steps in order.
+
+        Consecutive steps without delay are sent back-to-back in one packet.
+        """
+        batch: List[AtemCommand] = []
+        for delay, command in steps:
+            if delay > 0:
+                if batch:
+                    await self.async_switch(batch)
+                    batch = []
+                await asyncio.sleep(delay)
+            batch.append(command)
+        if batch:
+            await self.async_switch(batch)
+
+    @callback
+    def _async_set_pending(self, key: Tuple[str, int], source: int, timeout: float) -> None:
+        """Mark an expected source as pending until its echo."""
+        self._async_clear_pending(key)
+
+        @callback
+        def _async_timeout(_now) -> None:
+            if self._pending.pop(key, None) is not None:
+                _LOGGER.warning(f"No confirmation from ATEM for {key[0]} {source}, rolling back")
+                self.coalescer.async_push(f"rollback:{key[0]}", key[1])
+
+        self._pending[key] = (
+            source,
+            async_call_later(self.hass, timeout, _async_timeout),
+            self.hass.loop.time(),
+        )
+
+    @callback
+    def _async_clear_pending(self, key: Tuple[str, int]) -> None:
+        """Drop a pending optimistic state."""
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending[1]()
+
+    @callback
+    def _async_expect_echo(self, key: Tuple[str, int], source: int) -> asyncio.Future:
+        """Return a future set to the loop time of the echo of source on (bus, M/E)."""
+        future = self.hass.loop.create_future()
+        waiters = self._echo_waiters.setdefault(key, [])
+        waiter = (source, future)
+        waiters.append(waiter)
+
+        @callback
+        def _async_done(_future: asyncio.Future) -> None:
+            waiters.remove(waiter)
+            if not waiters and self._echo_waiters.get(key) is waiters:
+                del self._echo_waiters[key]
+
+        future.add_done_callback(_async_done)
+        return future
+
+    @callback
+    def _async_handle_switch_echo(self, cmd: str, me: Optional[int]) -> None:
+        """Confirm pending optimistic states from a PrgI/PrvI/AuxS echo."""
+        bus = _ECHO_BUSES[cmd]
+        if self._echo_waiters:
+            now = self.hass.loop.time()
+            for key, waiters in self._echo_waiters.items():
+                if key[0] != bus or (me is not None and key[1] != me):
+                    continue
+                current = self._switcher_source(bus, key[1])
+                for source, future in waiters:
+                    if source == current and not future.done():
+                        future.set_result(now)
+        for key in [key for key in self._pending if key[0] == bus]:
+            if me is not None and key[1] != me:
+                continue
+            # Les échos intermédiaires (séquences, autre M/E sans index) ne
+            # confirment rien ; l'état optimiste tient jusqu'au timeout
+            source, _cancel, started = self._pending[key]
+            if self._switcher_source(bus, key[1]) != source:
+                continue
+            self.metrics.service_echo.record(self.hass.loop.time() - started)
+            self._async_clear_pending(key)
+            self.coalescer.async_push(cmd, key[1])
+
+    def _sync_inputs(self) -> bool:
+        """Update the input index from the full client state."""
+        self.inputs.set_model(self.client.model)
+        changed = False
+        for source, props in self.client.get_all_input_properties().items():
+            changed |= self.inputs.update(source, *props)
+        return changed
+
+    @property
+    def publish_stats(self) -> Dict[str, int]:
+        """Return the published/suppressed snapshot counters."""
+        return {
+            "published": self.updates_published,
+            "suppressed": self.updates_suppressed,
+        }
+
+    async def _async_publish(self, cmds: Set[str]) -> None:
+        """Publish one snapshot for a batch of coalesced events."""
+        try:
+            _LOGGER.debug(f"Publishing ATEM snapshot for events: {sorted(cmds)}")
+            data = await self._async_get_data()
+            if data:
+                self.async_set_updated_data(data)
+        except Exception as err:
+            _LOGGER.error(f"Error publishing ATEM data: {err}")
+
+    async def _async_restore(self) -> bool:
+        """Load the last known state saved by a previous run."""
+        try:
+            snapshot = await self._store.async_load()
+        except Exception as err:
+            _LOGGER.warning(f"Could not load the saved ATEM state: {err}")
+            return False
+        if not snapshot:
+            return False
+
+        self.inputs.set_model(snapshot.get("model", ""))
+        for source, (long_name, short_name) in snapshot.get("inputs", {}).items():
+            self.inputs.update(int(source), long_name, short_name)
+        self._restored = {
+            "model": snapshot.get("model", ""),
+            **{
+                bus: {int(index): source for index, source in snapshot.get(bus, {}).items()}
+                for bus in ("program", "preview", "aux")
+            },
+        }
+        # Les instantanés antérieurs aux M/E multiples n'ont pas de topologie
+        mes, auxes = snapshot.get("topology", (len(self._restored["program"]) or 1, 0))
+        self._restored["topology"] = self.topology = (mes, auxes)
+        # Tally au moment de la sauvegarde, remplacé par celui de l'état initial
+        self.tally.async_update({
+            int(source): flags for source, flags in snapshot.get("tally", {}).items()
+        })
+        _LOGGER.debug(f"Restored ATEM state for {self.atem_ip}")
+        return True
+
+    async def _async_expire_restored(self) -> None:
+        """Drop the restored state if the switcher does not answer in time."""
+        if await self.connection.async_wait_connected(CONNECT_TIMEOUT):
+            return
+        if self._restored is not None:
+            _LOGGER.warning(f"ATEM at {self.atem_ip} not reachable yet, retrying in the background")
+            self._restored = None
+            self.tally.async_clear()
+            await self._async_publish({"restore_expired"})
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Save the snapshot at most once every STORAGE_SAVE_DELAY seconds."""
+        # Les changements suivants sont pris en compte à l'écriture
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._snapshot, STORAGE_SAVE_DELAY)
+
+    @callback
+    def _snapshot(self) -> Dict[str, Any]:
+        """Return the switcher state to persist (JSON keys are strings)."""
+        self._save_scheduled = False
+        mes = range(self.client.me_count)
+        auxes = range(self.client.aux_count)
+        return {
+            "model": self.client.model,
+            "inputs": {
+                str(source): list(names)
+                for source, names in self.client.get_all_input_properties().items()
+            },
+            # Valeurs confirmées par le mélangeur, sans les états optimistes
+            "program": {str(me): self._switcher_source("program", me) for me in mes},
+            "preview": {str(me): self._switcher_source("preview", me) for me in mes},
+            "aux": {str(aux): self._switcher_source("aux", aux) for aux in auxes},
+            "topology": [len(mes), len(auxes)],
+            "tally": {str(source): flags for source, flags in self.tally.as_dict().items()},
+        }
+
+    @callback
+    def _async_on_connected(self) -> None:
+        """Resync and publish the switcher state once a session is up."""
+        # Le flux d'événements (surveillé par heartbeat) remplace le polling
+        self.update_interval = None
+        self._restored = None
+        self.asrun.async_encode()
+        self._sync_inputs()
+        # Sources à l'antenne au moment de la connexion
+        self._async_log_switch("PrgI", None)
+        self._async_log_switch("PrvI", None)
+        # Le tally de l'état initial arrive avant la fin de la connexion
+        self.tally.async_update(self.client.get_tally())
+        if self.audio is not None:
+            # L'abonnement aux mesures ne survit pas à la session
+            self.hass.async_create_task(self._async_set_audio_levels(True))
+        self.hass.async_create_task(self._async_publish({"connected"}))
+
+    @callback
+    def _async_on_disconnected(self) -> None:
+        """Publish the disconnected state and drop optimistic states."""
+        self.update_interval = SCAN_INTERVAL
+        for key in list(self._pending):
+            self._async_clear_pending(key)
+        # Sans mélangeur, aucune entrée n'est plus à l'antenne
+        self.tally.async_clear()
+        if self.audio is not None:
+            self.audio.async_clear()
+        self.hass.async_create_task(self._async_publish({"disconnected"}))
 
     async def _async_get_data(self) -> dict:
         """Get current data from ATEM - VERSION SIMPLE."""
+        started = time.monotonic()
         try:
             data = {}
+            restored = self._restored
             
-            if self.switcher.connected:
-                # Program input - direct access
-                try:
-                    program = str(self.switcher.programInput[0].videoSource)
-                    data["program"] = program
-                    _LOGGER.debug(f"Program: {program}")
-                except Exception as e:
-                    _LOGGER.error(f"Error reading program: {e}")
-                    data["program"] = "Unknown"
-                
-                # Preview input - direct access
-                try:
-                    preview = str(self.switcher.previewInput[0].videoSource)
-                    data["preview"] = preview
-                    _LOGGER.debug(f"Preview: {preview}")
-                except Exception as e:
-                    _LOGGER.error(f"Error reading preview: {e}")
-                    data["preview"] = "Unknown"
+            if self.connection.alive or restored is not None:
+                # État en direct, ou instantané restauré en attendant la connexion
+                if self.connection.alive:
+                    source_of = self.current_source
+                    model = self.client.model
+                    self.topology = (self.client.me_count, self.client.aux_count)
+                else:
+                    source_of = lambda bus, index: restored[bus].get(index)
+                    model = restored["model"]
+                    self.topology = restored["topology"]
+                mes, auxes = self.topology
+
+                # Program et preview de chaque M/E
+                for me in range(mes):
+                    for bus in ("program", "preview"):
+                        try:
+                            source = source_of(bus, me)
+                            name = self.client.source_name(source)
+                            data[me_key(bus, me)] = name
+                            data[me_key(f"{bus}_name", me)] = self.inputs.long_name(source) or name
+                        except Exception as e:
+                            _LOGGER.error(f"Error reading {bus} of M/E {me + 1}: {e}")
+                            data[me_key(bus, me)] = "Unknown"
+
+                # Source de chaque sortie aux
+                for aux in range(auxes):
+                    try:
+                        source = source_of("aux", aux)
+                        name = self.client.source_name(source)
+                        data[aux_key("aux", aux)] = name
+                        data[aux_key("aux_name", aux)] = self.inputs.long_name(source) or name
+                    except Exception as e:
+                        _LOGGER.error(f"Error reading aux {aux + 1}: {e}")
+                        data[aux_key("aux", aux)] = "Unknown"
+
+                data["model"] = model
+                # Même objet tant qu'aucune entrée n'a changé : pas de diff inutile
+                data["available_inputs"] = self.inputs.names
             else:
-                data["program"] = "Disconnected"
-                data["preview"] = "Disconnected"
+                mes, auxes = self.topology
+                for me in range(mes):
+                    data[me_key("program", me)] = "Disconnected"
+                    data[me_key("preview", me)] = "Disconnected"
+                for aux in range(auxes):
+                    data[aux_key("aux", aux)] = "Disconnected"
             
+            # Les plateformes créent les entités des M/E, aux et entrées découverts
+            data["topology"] = self.topology
+            data["tally_inputs"] = self.tally.inputs
+            data["audio_inputs"] = self.audio.inputs if self.audio is not None else ()
             return data
             
         except Exception as err:
             _LOGGER.error(f"Error getting ATEM data: {err}")
             return {"program": "Error", "preview": "Error"}
+        finally:
+            self.metrics.snapshot.record(time.monotonic() - started)
 
     async def _async_update_data(self) -> dict:
         """Update data - called by the polling interval as fallback."""
-        # S'assurer qu'on est connecté
-        if not await self._async_ensure_connected():
-            # Essayer de se reconnecter
-            if not self._reconnect_task or self._reconnect_task.done():
-                self._reconnect_task = self.hass.async_create_task(
-                    self._async_reconnect()
-                )
-            return {"program": "Disconnected", "preview": "Disconnected"}
-        
-        # Récupérer les données
+        # La reconnexion est l'affaire du gestionnaire de connexion
         return await self._async_get_data()
 
-    async def _async_reconnect(self) -> None:
-        """Background task to reconnect to ATEM."""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                await asyncio.sleep(5)
-                await self._async_connect()
-                if self.switcher.connected:
-                    _LOGGER.info("Reconnected to ATEM successfully")
-                    # Forcer une mise à jour après reconnexion
-                    data = await self._async_get_data()
-                    if data:
-                        self.async_set_updated_data(data)
-                    return
-            except Exception as err:
-                _LOGGER.warning(f"Reconnection attempt {attempt + 1} failed: {err}")
-        
-        _LOGGER.error("Failed to reconnect to ATEM after multiple attempts")
-
     async def async_shutdown(self) -> None:
-        """Shutdown the coordinator and close connections."""
+        """Shutdown the coordinator and close connections; later calls do nothing."""
+        if self._shut_down:
+            return
+        self._shut_down = True
         try:
-            # Annuler la tâche de reconnexion si elle existe
-            if self._reconnect_task and not self._reconnect_task.done():
-                self._reconnect_task.cancel()
+            # Arrêter les tentatives de reconnexion
+            await self.connection.async_stop()
+
+            # Abandonner les événements et états optimistes en attente
+            self.coalescer.async_cancel()
+            for key in list(self._pending):
+                self._async_clear_pending(key)
             
-            # Déconnecter du switcher
-            if self.switcher.connected:
-                await self.hass.async_add_executor_job(
-                    self.switcher.disconnect
-                )
+            if self.audio is not None:
+                self.audio.async_stop()
+                # La session peut rester ouverte pour d'autres utilisateurs
+                if self.connection.alive:
+                    await self._async_set_audio_levels(False)
+
+            # Les commandes encore en file échouent avant la déconnexion
+            await self.commands.async_stop()
+            if self.fanout is not None:
+                await self.fanout.async_stop()
+            await self.asrun.async_stop()
+
+            # Écrire tout de suite l'instantané en attente
+            if self._restore_task is not None:
+                self._restore_task.cancel()
+            if self._save_scheduled and self.connection.alive:
+                await self._store.async_save(self._snapshot())
+
+            # Rendre la session au registre, qui la ferme quand elle ne sert plus
+            await async_get_session_registry(self.hass).async_release(self.client)
             _LOGGER.info("ATEM coordinator shutdown complete")
         except Exception as err:
             _LOGGER.error(f"Error during shutdown: {err}")
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""Diagnostics support for the ATEM Switcher integration."""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import AtemDataUpdateCoordinator
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """Return the switcher description, state and counters of an entry."""
+    coordinator: AtemDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    client = coordinator.client
+    mes, auxes = coordinator.topology
+    return {
+        "options": dict(entry.options),
+        "switcher": {
+            "host": coordinator.atem_ip,
+            "transport": type(client).__name__,
+            "connected": coordinator.connection.alive,
+            "model": client.model,
+            "mes": mes,
+            "aux_outputs": auxes,
+            "inputs": {
+                str(source): list(names)
+                for source, names in client.get_all_input_properties().items()
+            },
+        },
+        "data": {
+            key: value for key, value in (coordinator.data or {}).items()
+            if key != "available_inputs"
+        },
+        "stats": {
+            "snapshots": coordinator.publish_stats,
+            "coalescer": coordinator.coalescer.stats,
+            "commands": coordinator.commands.stats,
+            "connection": coordinator.connection.stats,
+            "tally": coordinator.tally.stats,
+            "fanout": coordinator.fanout.stats if coordinator.fanout else None,
+            "as_run": coordinator.asrun.stats,
+            "audio": coordinator.audio.stats if coordinator.audio else None,
+            "metrics": coordinator.metrics.as_dict(),
+        },
+    }
@@ -0,0 +1,152 @@
+"""Discovery of ATEM switchers on a subnet."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import Dict, Iterable, Optional, Tuple
+
+from homeassistant.core import HomeAssistant
+
+from .protocol import (
+    ATEM_PORT,
+    FLAG_ACK_REQUEST,
+    FLAG_HELLO,
+    HEADER_LEN,
+    HELLO_FULL,
+    ack_packet,
+    close_packet,
+    hello_answer_packet,
+    hello_packet,
+    iter_commands,
+    read_string,
+    unpack_header,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Attente maximale de la réponse d'un hôte (s)
+DISCOVERY_TIMEOUT = 1.0
+# Sondes en cours au plus : un /24 entier tient dans une seule vague
+DISCOVERY_CONCURRENCY = 256
+# Modèle affiché pour un mélangeur qui n'a plus de session libre
+MODEL_UNKNOWN = ""
+
+
+class _Probe:
+    """Handshake state with one host."""
+
+    __slots__ = ("session_id", "future", "answered")
+
+    def __init__(self, future: asyncio.Future) -> None:
+        """Initialize the probe."""
+        self.session_id = random.randint(0x0001, 0x7FFF)
+        self.future = future
+        self.answered = False
+
+
+class AtemDiscoveryProtocol(asyncio.DatagramProtocol):
+    """Run the start of the ATEM handshake with many hosts from one socket.
+
+    A host is an ATEM once it answers the HELLO; its model is read from the
+    ``_pin`` command at the start of the initial state dump, after which the
+    session is closed so that it does not hold one of the switcher slots.
+    """
+
+    def __init__(self, port: int = ATEM_PORT) -> None:
+        """Initialize the protocol."""
+        self.port = port
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._probes: Dict[str, _Probe] = {}
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport  # type: ignore[assignment]
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP "port injoignable" des hôtes sans ATEM : rien à faire
+        pass
+
+    def probe(self, host: str) -> asyncio.Future:
+        """Send a HELLO to a host; the future resolves to its model."""
+        future = asyncio.get_running_loop().create_future()
+        probe = self._probes[host] = _Probe(future)
+        self._send(hello_packet(probe.session_id), host)
+        return future
+
+    def resend(self, host: str) -> None:
+        """Send the HELLO again if the host has not answered yet."""
+        probe = self._probes.get(host)
+        if probe is not None and not probe.answered:
+            self._send(hello_packet(probe.session_id), host)
+
+    def forget(self, host: str) -> None:
+        """Stop following a host."""
+        self._probes.pop(host, None)
+
+    def _send(self, packet: bytes, host: str) -> None:
+        if self._transport is not None:
+            self._transport.sendto(packet, (host, self.port))
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """Advance the handshake of the host that sent the packet."""
+        probe = self._probes.get(addr[0])
+        if probe is None or probe.future.done() or len(data) < HEADER_LEN:
+            return
+        flags, length, session_id, _ack_id, _resend_id, packet_id = unpack_header(data)
+
+        if flags & FLAG_HELLO:
+            if len(data) > HEADER_LEN and data[HEADER_LEN] == HELLO_FULL:
+                # C'est bien un ATEM, mais sans session libre pour lire son modèle
+                probe.future.set_result(MODEL_UNKNOWN)
+                return
+            probe.answered = True
+            self._send(hello_answer_packet(probe.session_id), addr[0])
+            return
+
+        if not flags & FLAG_ACK_REQUEST:
+            return
+        self._send(ack_packet(session_id, packet_id), addr[0])
+        for name, body in iter_commands(data[HEADER_LEN:length]):
+            if name == "_pin":
+                probe.future.set_result(read_string(body, 0, 44))
+                # Libère la session sans attendre son expiration
+                self._send(close_packet(session_id), addr[0])
+                return
+
+
+async def async_discover(
+    hass: HomeAssistant,
+    hosts: Iterable[str],
+    port: int = ATEM_PORT,
+    timeout: float = DISCOVERY_TIMEOUT,
+    concurrency: int = DISCOVERY_CONCURRENCY,
+) -> Dict[str, str]:
+    """Probe hosts concurrently and return the model of each ATEM found."""
+    transport, protocol = await hass.loop.create_datagram_endpoint(
+        lambda: AtemDiscoveryProtocol(port), local_addr=("0.0.0.0", 0)
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _async_probe(host: str) -> Tuple[str, Optional[str]]:
+        async with semaphore:
+            future = protocol.probe(host)
+            try:
+                async with asyncio.timeout(timeout):
+                    # Un seul renvoi du HELLO, à mi-parcours
+                    done, _ = await asyncio.wait((future,), timeout=timeout / 2)
+                    if not done:
+                        protocol.resend(host)
+                    return host, await future
+            except asyncio.TimeoutError:
+                return host, None
+            finally:
+                protocol.forget(host)
+
+    try:
+        results = await asyncio.gather(*(_async_probe(host) for host in hosts))
+    finally:
+        transport.close()
+
+    found = {host: model for host, model in results if model is not None}
+    _LOGGER.debug(f"ATEM discovery: {len(found)} switcher(s) among {len(results)} hosts")
+    return found
@@ -0,0 +1,76 @@
+"""Base entity for the ATEM Switcher integration."""
+from __future__ import annotations
+
+from typing import Callable, Iterable, Set, Tuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .coordinator import AtemDataUpdateCoordinator
+
+
+class AtemEntity(CoordinatorEntity):
+    """Base class for ATEM entities."""
+
+    # Commandes ATEM qui doivent déclencher une mise à jour de l'entité
+    _atem_commands: Tuple[str, ...] = ()
+    # Clés de coordinator.data lues par l'entité : seules leurs modifications
+    # provoquent une écriture d'état (toutes si vide)
+    _atem_data_keys: Tuple[str, ...] = ()
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+        """Initialize the entity."""
+        super().__init__(coordinator, context=frozenset(self._atem_data_keys) or None)
+        self.entry = entry
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, entry.entry_id)},
+            "name": f"ATEM {entry.data.get('host', 'Unknown')}",
+            "manufacturer": "Blackmagic Design",
+            "model": "ATEM Switcher",
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to the ATEM commands this entity depends on."""
+        await super().async_added_to_hass()
+        if self._atem_commands:
+            self.async_on_remove(
+                self.coordinator.async_register_command_handler(
+                    self._atem_commands, self.coordinator.coalescer.async_push
+                )
+            )
+
+
+@callback
+def async_add_topology_entities(
+    coordinator: AtemDataUpdateCoordinator,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    factory: Callable[[int, int], Iterable[Entity]],
+) -> None:
+    """Add the entities of every M/E, aux output and input, now and when they grow.
+
+    factory receives the (M/E, aux) counts and returns the entities of the
+    whole topology (inputs are read from coordinator.tally and
+    coordinator.audio); those already added are skipped.
+    """
+    added: Set[str] = set()
+
+    @callback
+    def _async_add(update_before_add: bool = False) -> None:
+        entities = [
+            entity for entity in factory(*coordinator.topology)
+            if entity.unique_id not in added
+        ]
+        if entities:
+            added.update(entity.unique_id for entity in entities)
+            async_add_entities(entities, update_before_add=update_before_add)
+
+    _async_add(update_before_add=True)
+    # La topologie et les entrées ne sont connues qu'avec l'état initial du mélangeur
+    entry.async_on_unload(coordinator.async_add_listener(
+        _async_add, context=frozenset({"topology", "tally_inputs", "audio_inputs"})
+    ))
@@ -0,0 +1,330 @@
+"""Push the tally of every input to external tally lights.
+
+Two feeds are supported, both fed straight from the tally engine so that
+no Home Assistant state write sits between a TlSr packet and the wire:
+
+* TSL UMD v5, over UDP or TCP (DLE/STX framing): one display message per
+  input, display index = source number, text = input long name, right
+  tally red on program, left tally green on preview, text tally red or
+  green.
+* JSON over UDP: ``{"source": 3, "name": "Camera 3", "program": true,
+  "preview": false}``, one datagram per flipped input.
+
+Frames are encoded once per input and tally state and reused until the
+input is renamed.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import socket
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import voluptuous as vol
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .inputs import AtemInputIndex
+from .tally import EXTERNAL_INPUTS, TALLY_PREVIEW, TALLY_PROGRAM, AtemTallyEngine
+
+_LOGGER = logging.getLogger(__name__)
+
+# Port par défaut des récepteurs TSL UMD et JSON
+DEFAULT_TSL_PORT = 8900
+DEFAULT_JSON_PORT = 8901
+
+# Renvoi complet périodique : les datagrammes perdus finissent par être corrigés
+FULL_REFRESH_INTERVAL = timedelta(seconds=5)
+# Attente entre deux tentatives de connexion TCP
+TCP_RETRY_INTERVAL = 5.0
+TCP_CONNECT_TIMEOUT = 3.0
+# Au-delà, un abonné TCP trop lent est déconnecté plutôt que de bufferiser
+TCP_MAX_BUFFER = 64 * 1024
+
+# TSL UMD v5 : couleurs de tally et champs du mot de contrôle
+TSL_OFF = 0
+TSL_RED = 1
+TSL_GREEN = 2
+TSL_BRIGHTNESS_FULL = 3
+TSL_DLE = 0xFE
+TSL_STX = 0x02
+# Longueur maximale du texte affiché
+TSL_MAX_TEXT = 64
+
+# Trames d'une entrée, indexées par ses drapeaux de tally (0 à 3)
+Frames = Tuple[bytes, bytes, bytes, bytes]
+
+
+def parse_targets(value: str, default_port: int) -> List[Tuple[str, int]]:
+    """Parse a comma separated list of host[:port]; raises vol.Invalid."""
+    targets: List[Tuple[str, int]] = []
+    for item in value.replace(";", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, sep, port = item.rpartition(":")
+        if not sep:
+            host, port = item, str(default_port)
+        try:
+            port_number = int(port)
+        except ValueError as err:
+            raise vol.Invalid(f"Invalid port in {item}") from err
+        if not host or not 0 < port_number < 65536:
+            raise vol.Invalid(f"Invalid target {item}")
+        targets.append((host.strip("[]"), port_number))
+    return targets
+
+
+def _tsl_control(flags: int) -> int:
+    """Return the TSL UMD v5 control word of a tally state."""
+    right = TSL_RED if flags & TALLY_PROGRAM else TSL_OFF
+    left = TSL_GREEN if flags & TALLY_PREVIEW else TSL_OFF
+    text = right or left
+    return right | text << 2 | left << 4 | TSL_BRIGHTNESS_FULL << 6
+
+
+def encode_tsl(screen: int, index: int, flags: int, text: str) -> bytes:
+    """Encode a TSL UMD v5 packet with one display message."""
+    label = text.encode("ascii", "replace")[:TSL_MAX_TEXT]
+    message = struct.pack("<HHH", index, _tsl_control(flags), len(label)) + label
+    body = struct.pack("<BBH", 0, 0, screen) + message
+    return struct.pack("<H", len(body)) + body
+
+
+def wrap_tsl_tcp(packet: bytes) -> bytes:
+    """Frame a TSL UMD v5 packet for TCP (DLE/STX, DLE doubled)."""
+    dle = bytes([TSL_DLE])
+    return bytes([TSL_DLE, TSL_STX]) + packet.replace(dle, dle + dle)
+
+
+def encode_json(source: int, flags: int, name: str) -> bytes:
+    """Encode the JSON datagram of an input tally."""
+    return json.dumps({
+        "source": source,
+        "name": name,
+        "program": bool(flags & TALLY_PROGRAM),
+        "preview": bool(flags & TALLY_PREVIEW),
+    }, separators=(",", ":")).encode()
+
+
+class _TcpSubscriber:
+    """A TSL UMD v5 receiver reached over TCP, reconnected forever."""
+
+    def __init__(self, fanout: AtemTallyFanout, host: str, port: int) -> None:
+        self.fanout = fanout
+        self.host = host
+        self.port = port
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def async_run(self) -> None:
+        """Keep the connection open and send the full tally on each connect."""
+        while True:
+            try:
+                async with asyncio.timeout(TCP_CONNECT_TIMEOUT):
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+            except (OSError, asyncio.TimeoutError) as err:
+                _LOGGER.debug(f"TSL receiver {self.host}:{self.port} unreachable: {err}")
+                await asyncio.sleep(TCP_RETRY_INTERVAL)
+                continue
+
+            self.writer = writer
+            self.fanout.async_send_all(self)
+            try:
+                # Le récepteur n'envoie rien : la lecture ne sert qu'à voir la fermeture
+                while await reader.read(1024):
+                    pass
+            except OSError:
+                pass
+            finally:
+                self.writer = None
+                writer.close()
+            await asyncio.sleep(TCP_RETRY_INTERVAL)
+
+    @callback
+    def async_write(self, frame: bytes) -> bool:
+        """Write a frame, dropping a subscriber that does not keep up.
+
+        Returns True when the frame was written.
+        """
+        writer = self.writer
+        if writer is None or writer.transport.is_closing():
+            return False
+        if writer.transport.get_write_buffer_size() > TCP_MAX_BUFFER:
+            _LOGGER.warning(f"TSL receiver {self.host}:{self.port} too slow, reconnecting")
+            writer.transport.abort()
+            return False
+        writer.write(frame)
+        return True
+
+
+class AtemTallyFanout:
+    """Send the tally flips of the engine to TSL UMD and JSON subscribers."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tally: AtemTallyEngine,
+        inputs: AtemInputIndex,
+        tsl_udp: List[Tuple[str, int]],
+        tsl_tcp: List[Tuple[str, int]],
+        json_udp: List[Tuple[str, int]],
+        screen: int = 0,
+    ) -> None:
+        """Initialize the fan-out (targets as (host, port))."""
+        self.hass = hass
+        self.tally = tally
+        self.inputs = inputs
+        self.screen = screen
+        self._tsl_udp_targets = tsl_udp
+        self._json_udp_targets = json_udp
+        self._tcp = [_TcpSubscriber(self, host, port) for host, port in tsl_tcp]
+        # Adresses résolues au démarrage : sendto ne fait plus de résolution
+        self._tsl_udp: List[Tuple[str, int]] = []
+        self._json_udp: List[Tuple[str, int]] = []
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._unsubs: List[CALLBACK_TYPE] = []
+
+        # Source -> trames TSL UDP, TSL TCP et JSON, selon les drapeaux
+        self._frames: Dict[int, Tuple[Frames, Frames, Frames]] = {}
+        self._frames_version = -1
+
+        # Compteurs
+        self.frames_sent = 0
+        self.send_errors = 0
+        self.last_send_time: Optional[float] = None
+        self.max_send_time = 0.0
+
+    async def async_start(self) -> None:
+        """Open the UDP socket, connect the TCP subscribers and follow the tally."""
+        if self._tsl_udp_targets or self._json_udp_targets:
+            self._tsl_udp = await self._async_resolve(self._tsl_udp_targets)
+            self._json_udp = await self._async_resolve(self._json_udp_targets)
+            self._transport, _ = await self.hass.loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, family=socket.AF_INET
+            )
+        for subscriber in self._tcp:
+            subscriber.task = self.hass.async_create_background_task(
+                subscriber.async_run(), f"ATEM TSL {subscriber.host}:{subscriber.port}"
+            )
+        self._unsubs.append(self.tally.async_add_flip_listener(self._async_flip))
+        self._unsubs.append(async_track_time_interval(
+            self.hass, self._async_refresh, FULL_REFRESH_INTERVAL
+        ))
+
+    async def async_stop(self) -> None:
+        """Stop following the tally and close every connection."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs.clear()
+        for subscriber in self._tcp:
+            if subscriber.task is not None:
+                subscriber.task.cancel()
+                subscriber.task = None
+            if subscriber.writer is not None:
+                subscriber.writer.close()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def _async_resolve(self, targets: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Resolve host names once, skipping the ones that do not resolve."""
+        resolved: List[Tuple[str, int]] = []
+        for host, port in targets:
+            try:
+                infos = await self.hass.loop.getaddrinfo(
+                    host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM
+                )
+            except OSError as err:
+                _LOGGER.warning(f"Cannot resolve tally subscriber {host}: {err}")
+                continue
+            resolved.append(infos[0][4][:2])
+        return resolved
+
+    def _build_frames(self, source: int) -> Tuple[Frames, Frames, Frames]:
+        """Encode every tally state of an input."""
+        name = self.inputs.long_name(source) or str(source)
+        tsl = tuple(encode_tsl(self.screen, source, flags, name) for flags in range(4))
+        return (
+            tsl,
+            tuple(wrap_tsl_tcp(packet) for packet in tsl),
+            tuple(encode_json(source, flags, name) for flags in range(4)),
+        )
+
+    def _get_frames(self, source: int) -> Tuple[Frames, Frames, Frames]:
+        """Return the frames of an input, re-encoded after a rename."""
+        if self._frames_version != self.inputs.version:
+            self._frames.clear()
+            self._frames_version = self.inputs.version
+        frames = self._frames.get(source)
+        if frames is None:
+            frames = self._frames[source] = self._build_frames(source)
+        return frames
+
+    @callback
+    def _async_flip(self, source: int, flags: int) -> None:
+        """Send the new tally of an input to every subscriber."""
+        if source not in EXTERNAL_INPUTS:
+            return
+        start = self.hass.loop.time()
+        tsl_udp, tsl_tcp, json_udp = self._get_frames(source)
+        self._async_send(tsl_udp[flags], tsl_tcp[flags], json_udp[flags], self._tcp)
+        elapsed = self.hass.loop.time() - start
+        self.last_send_time = elapsed
+        self.max_send_time = max(self.max_send_time, elapsed)
+
+    @callback
+    def _async_send(
+        self, tsl_udp: bytes, tsl_tcp: bytes, json_udp: bytes, tcp: List[_TcpSubscriber]
+    ) -> None:
+        """Send the frames of one input to the given TCP and every UDP subscriber."""
+        transport = self._transport
+        if transport is not None:
+            for addr in self._tsl_udp:
+                try:
+                    transport.sendto(tsl_udp, addr)
+                    self.frames_sent += 1
+                except OSError:
+                    self.send_errors += 1
+            for addr in self._json_udp:
+                try:
+                    transport.sendto(json_udp, addr)
+                    self.frames_sent += 1
+                except OSError:
+                    self.send_errors += 1
+        for subscriber in tcp:
+            # Un abonné TCP déconnecté ne reçoit rien
+            if subscriber.async_write(tsl_tcp):
+                self.frames_sent += 1
+
+    @callback
+    def _async_refresh(self, _now: datetime) -> None:
+        """Send the whole tally periodically, for receivers that missed a flip."""
+        self.async_send_all()
+
+    @callback
+    def async_send_all(self, subscriber: Optional[_TcpSubscriber] = None) -> None:
+        """Send the tally of every input, to one new TCP subscriber or to all."""
+        tcp = self._tcp if subscriber is None else [subscriber]
+        for source in self.tally.inputs:
+            flags = self.tally.flags(source)
+            tsl_udp, tsl_tcp, json_udp = self._get_frames(source)
+            if subscriber is None:
+                self._async_send(tsl_udp[flags], tsl_tcp[flags], json_udp[flags], tcp)
+            elif subscriber.async_write(tsl_tcp[flags]):
+                self.frames_sent += 1
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        """Return the fan-out counters."""
+        return {
+            "frames_sent": self.frames_sent,
+            "send_errors": self.send_errors,
+            "tcp_connected": sum(1 for sub in self._tcp if sub.writer is not None),
+            "last_send_ms": None if self.last_send_time is None else round(self.last_send_time * 1000, 3),
+            "max_send_ms": round(self.max_send_time * 1000, 3),
+        }
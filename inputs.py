@@ -0,0 +1,95 @@
+"""Bidirectional index of ATEM input names."""
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple, Union
+
+from .atem_models import get_input_choices
+
+
+class AtemInputIndex:
+    """Map long names, short names and model aliases to source ids, and back.
+
+    The index is updated one input at a time from InPr events; lookups are
+    plain dict accesses (names are case-insensitive).
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        # Source -> (nom long, nom court)
+        self._names: Dict[int, Tuple[str, str]] = {}
+        # Source -> alias du modèle (atem_models)
+        self._aliases: Dict[int, str] = {}
+        # Nom normalisé -> source
+        self._lookup: Dict[str, int] = {}
+        # Clés enregistrées pour chaque source, pour les retirer au renommage
+        self._keys: Dict[int, Tuple[str, ...]] = {}
+        self._names_cache: Optional[Dict[int, str]] = None
+        self.version = 0
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return name.strip().casefold()
+
+    def _index_source(self, source: int) -> None:
+        """(Re)build the lookup keys of one source."""
+        for key in self._keys.pop(source, ()):
+            if self._lookup.get(key) == source:
+                del self._lookup[key]
+
+        names = self._names.get(source, ("", ""))
+        keys = tuple(dict.fromkeys(
+            self._normalize(name)
+            for name in (*names, self._aliases.get(source, ""))
+            if name and name.strip()
+        ))
+        for key in keys:
+            self._lookup[key] = source
+        self._keys[source] = keys
+
+        self._names_cache = None
+        self.version += 1
+
+    def set_model(self, model: str) -> None:
+        """Load the input aliases of a switcher model."""
+        aliases = dict(get_input_choices(model))
+        if aliases == self._aliases:
+            return
+        previous = self._aliases
+        self._aliases = aliases
+        for source in previous.keys() | aliases.keys():
+            self._index_source(source)
+
+    def update(self, source: int, long_name: str, short_name: str) -> bool:
+        """Update one input; returns True if its names changed."""
+        if self._names.get(source) == (long_name, short_name):
+            return False
+        self._names[source] = (long_name, short_name)
+        self._index_source(source)
+        return True
+
+    def resolve(self, value: Union[int, str]) -> Optional[int]:
+        """Return the source id for a number, a name or an alias."""
+        if isinstance(value, int):
+            return value
+        text = str(value).strip()
+        if text.isdigit():
+            return int(text)
+        return self._lookup.get(self._normalize(text))
+
+    def long_name(self, source: Optional[int]) -> Optional[str]:
+        """Return the long name of a source, falling back to the model alias."""
+        if source is None:
+            return None
+        names = self._names.get(source)
+        if names and names[0]:
+            return names[0]
+        return self._aliases.get(source)
+
+    @property
+    def names(self) -> Dict[int, str]:
+        """Return source -> long name; the same dict is reused until a change."""
+        if self._names_cache is None:
+            self._names_cache = {
+                source: names[0] for source, names in self._names.items() if names[0]
+            }
+        return self._names_cache
@@ -0,0 +1,110 @@
+"""Low-overhead counters and latency histograms for the hot paths."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+# Bornes supérieures des classes de latence (secondes), de 50 µs à 5 s ;
+# une dernière classe reçoit tout ce qui dépasse
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+class AtemLatencyHistogram:
+    """Fixed-bucket latency histogram.
+
+    Storage is allocated once; recording a sample is a bisect on the bucket
+    bounds and a few integer/float updates.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize an empty histogram (bounds in seconds)."""
+        self.bounds = bounds
+        self.counts = array("Q", bytes(8 * (len(bounds) + 1)))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        """Add one sample (seconds)."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Return the upper bound of the bucket holding a percentile (seconds)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and index < len(self.bounds):
+                # Borne de la classe, sans dépasser le maximum observé
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    def as_dict(self) -> Dict[str, object]:
+        """Return the summary and the non-empty buckets, in milliseconds."""
+
+        def _ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 3)
+
+        buckets = {
+            f"le_{_ms(bound)}ms": count
+            for bound, count in zip(self.bounds, self.counts) if count
+        }
+        if self.counts[-1]:
+            buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": _ms(self.total / self.count) if self.count else None,
+            "p50_ms": _ms(self.percentile(0.50)),
+            "p99_ms": _ms(self.percentile(0.99)),
+            "max_ms": _ms(self.max),
+            "buckets": buckets,
+        }
+
+
+class AtemMetrics:
+    """Per-command counters and latency histograms of one switcher."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        # Commandes ATEM reçues, et celles sans abonné, par type
+        self.received: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+        # Passage du thread de réception à la boucle (client PyATEMMax)
+        self.receive_hop = AtemLatencyHistogram()
+        # Construction d'un instantané (_async_get_data)
+        self.snapshot = AtemLatencyHistogram()
+        # Appel de service (état optimiste) -> écho du mélangeur
+        self.service_echo = AtemLatencyHistogram()
+
+    @property
+    def received_total(self) -> int:
+        """Return the number of commands received."""
+        return sum(self.received.values())
+
+    @property
+    def dropped_total(self) -> int:
+        """Return the number of commands without subscriber."""
+        return sum(self.dropped.values())
+
+    def as_dict(self) -> Dict[str, object]:
+        """Return every counter and histogram."""
+        return {
+            "received": dict(self.received),
+            "dropped": dict(self.dropped),
+            "receive_hop": self.receive_hop.as_dict(),
+            "snapshot": self.snapshot.as_dict(),
+            "service_echo": self.service_echo.as_dict(),
+        }
@@ -0,0 +1,141 @@
+"""ATEM UDP protocol wire format helpers."""
+from __future__ import annotations
+
+import struct
+from typing import Iterator, Tuple
+
+# Port UDP standard des mélangeurs ATEM
+ATEM_PORT = 9910
+
+HEADER_LEN = 12
+CMD_HEADER_LEN = 8
+
+# Drapeaux de l'en-tête (5 bits de poids fort du premier mot)
+FLAG_ACK_REQUEST = 0x01
+FLAG_HELLO = 0x02
+FLAG_RESEND = 0x04
+FLAG_REQUEST_RESEND = 0x08
+FLAG_ACK = 0x10
+
+# Les identifiants de paquet sont codés sur 15 bits
+PACKET_ID_MASK = 0x7FFF
+
+# Réponses du mélangeur au HELLO (premier octet de la charge utile)
+HELLO_ACCEPTED = 0x02
+HELLO_FULL = 0x03
+# Fermeture d'une session par le client, et sa confirmation
+HELLO_CLOSE = 0x04
+HELLO_CLOSED = 0x05
+
+HELLO_PAYLOAD = bytes([0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+
+_HEADER = struct.Struct(">HHHHHH")
+_CMD_HEADER = struct.Struct(">HH4s")
+_U8_PAD_U16 = struct.Struct(">BxH")
+
+
+def pack_packet(
+    flags: int,
+    session_id: int,
+    payload: bytes = b"",
+    ack_id: int = 0,
+    packet_id: int = 0,
+    resend_id: int = 0,
+    extra: int = 0,
+) -> bytes:
+    """Build a full packet (header + payload)."""
+    length = HEADER_LEN + len(payload)
+    return _HEADER.pack(
+        (flags << 11) | (length & 0x07FF),
+        session_id,
+        ack_id,
+        resend_id,
+        extra,
+        packet_id,
+    ) + payload
+
+
+def unpack_header(data: bytes) -> Tuple[int, int, int, int, int, int]:
+    """Return (flags, length, session_id, ack_id, resend_id, packet_id)."""
+    word, session_id, ack_id, resend_id, _extra, packet_id = _HEADER.unpack_from(data)
+    return word >> 11, word & 0x07FF, session_id, ack_id, resend_id, packet_id
+
+
+def hello_packet(session_id: int) -> bytes:
+    """Build the client HELLO that opens a session."""
+    return pack_packet(FLAG_HELLO, session_id, HELLO_PAYLOAD, extra=0x3A)
+
+
+def close_packet(session_id: int) -> bytes:
+    """Build the packet that closes an established session."""
+    return pack_packet(FLAG_HELLO, session_id, bytes([HELLO_CLOSE]) + bytes(7))
+
+
+def hello_answer_packet(session_id: int) -> bytes:
+    """Build the ACK that answers the switcher HELLO."""
+    return pack_packet(FLAG_ACK, session_id, extra=0x03)
+
+
+def ack_packet(session_id: int, ack_id: int) -> bytes:
+    """Build the ACK for a received packet."""
+    return pack_packet(FLAG_ACK, session_id, ack_id=ack_id)
+
+
+def pack_command(name: str, body: bytes) -> bytes:
+    """Build one command block (length, reserved, 4-char name, body)."""
+    return _CMD_HEADER.pack(CMD_HEADER_LEN + len(body), 0, name.encode("ascii")) + body
+
+
+def iter_commands(payload: bytes) -> Iterator[Tuple[str, bytes]]:
+    """Iterate over the (name, body) command blocks of a packet payload."""
+    offset = 0
+    end = len(payload)
+    while offset + CMD_HEADER_LEN <= end:
+        length, _reserved, name = _CMD_HEADER.unpack_from(payload, offset)
+        if length < CMD_HEADER_LEN or offset + length > end:
+            # Bloc corrompu, on abandonne le reste du paquet
+            return
+        yield name.decode("ascii", "replace"), payload[offset + CMD_HEADER_LEN:offset + length]
+        offset += length
+
+
+def read_string(body: bytes, offset: int, length: int) -> str:
+    """Decode a NUL padded string field."""
+    return body[offset:offset + length].split(b"\x00", 1)[0].decode("utf-8", "replace")
+
+
+def unpack_u8_u16(body: bytes) -> Tuple[int, int]:
+    """Decode the common ``u8 index, pad, u16 source`` layout (PrgI, PrvI, AuxS...)."""
+    return _U8_PAD_U16.unpack_from(body)
+
+
+# Commandes envoyées au mélangeur
+
+def encode_cut(me: int) -> bytes:
+    """DCut: cut on an M/E."""
+    return pack_command("DCut", bytes([me, 0, 0, 0]))
+
+
+def encode_auto(me: int) -> bytes:
+    """DAut: auto transition on an M/E."""
+    return pack_command("DAut", bytes([me, 0, 0, 0]))
+
+
+def encode_program_input(me: int, source: int) -> bytes:
+    """CPgI: set the program source of an M/E."""
+    return pack_command("CPgI", _U8_PAD_U16.pack(me, source))
+
+
+def encode_preview_input(me: int, source: int) -> bytes:
+    """CPvI: set the preview source of an M/E."""
+    return pack_command("CPvI", _U8_PAD_U16.pack(me, source))
+
+
+def encode_aux_source(aux: int, source: int) -> bytes:
+    """CAuS: set the source of an aux output."""
+    return pack_command("CAuS", struct.pack(">BBH", 1, aux, source))
+
+
+def encode_audio_levels(name: str, enable: bool) -> bytes:
+    """SALN (audio mixer) or SFLN (Fairlight): enable the level metering stream."""
+    return pack_command(name, bytes([int(enable), 0, 0, 0]))
@@ -0,0 +1,69 @@
+"""Platform for ATEM select integration."""
+from __future__ import annotations
+
+from typing import List, Optional
+
+from homeassistant.components.select import SelectEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .client import AtemCommand
+from .const import DOMAIN
+from .coordinator import AtemDataUpdateCoordinator, aux_key
+from .entity import AtemEntity, async_add_topology_entities
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up ATEM selects from a config entry."""
+    # Récupération du coordinateur
+    coordinator: AtemDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    def _selects(mes: int, auxes: int) -> List[SelectEntity]:
+        # Un choix de source par sortie aux
+        return [AtemAuxSelect(coordinator, entry, aux) for aux in range(auxes)]
+
+    # Ajout des entités, complétées quand la topologie est découverte
+    async_add_topology_entities(coordinator, entry, async_add_entities, _selects)
+
+
+class AtemAuxSelect(AtemEntity, SelectEntity):
+    """Select the source of an ATEM aux output."""
+
+    _atem_commands = ("AuxS",)
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry, aux: int):
+        """Initialize the select."""
+        self.aux = aux
+        self._name_key = aux_key("aux_name", aux)
+        self._atem_data_keys = (self._name_key, "available_inputs")
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_aux{aux + 1}_source"
+        self._attr_name = f"ATEM Aux {aux + 1} Source"
+        self._attr_icon = "mdi:video-switch"
+
+    @property
+    def options(self) -> List[str]:
+        """Return the input names."""
+        if self.coordinator.data and "available_inputs" in self.coordinator.data:
+            return list(self.coordinator.data["available_inputs"].values())
+        return []
+
+    @property
+    def current_option(self) -> Optional[str]:
+        """Return the name of the source on the aux output."""
+        if self.coordinator.data:
+            return self.coordinator.data.get(self._name_key)
+        return None
+
+    async def async_select_option(self, option: str) -> None:
+        """Route an input to the aux output."""
+        source = self.coordinator.inputs.resolve(option)
+        if source is None:
+            raise HomeAssistantError(f"Unknown ATEM input: {option}")
+        await self.coordinator.async_switch([AtemCommand("CAuS", self.aux, source)])
@@ -1,14 +1,27 @@
 """Platform for ATEM sensor integration - SIMPLIFIED."""
 from __future__ import annotations
 
-from homeassistant.components.sensor import SensorEntity
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.helpers.event import async_track_time_interval
 
+from .audio import AUDIO_LEVEL
 from .const import DOMAIN
-from .coordinator import AtemDataUpdateCoordinator
+from .coordinator import AtemDataUpdateCoordinator, aux_key, me_key
+from .entity import AtemEntity, async_add_topology_entities
+
+# Les métriques sont publiées à ce rythme, jamais à chaque événement
+METRICS_INTERVAL = timedelta(seconds=30)
 
 
 async def async_setup_entry(
@@ -20,87 +33,391 @@ async def async_setup_entry(
     # Récupération du coordinateur
     coordinator: AtemDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
     
-    # Création des 2 sensors uniquement
-    sensors = [
-        AtemProgramSensor(coordinator, entry),
-        AtemPreviewSensor(coordinator, entry),
-    ]
+    def _sensors(mes: int, auxes: int) -> List[SensorEntity]:
+        # Program et preview de chaque M/E, puis une source par sortie aux
+        sensors: List[SensorEntity] = []
+        for me in range(mes):
+            sensors.append(AtemProgramSensor(coordinator, entry, me))
+            sensors.append(AtemPreviewSensor(coordinator, entry, me))
+        sensors.extend(AtemAuxSensor(coordinator, entry, aux) for aux in range(auxes))
+        # Niveau et crête de chaque entrée audio mesurée
+        if coordinator.audio is not None:
+            for source in coordinator.audio.inputs:
+                sensors.append(AtemAudioLevelSensor(coordinator, entry, source, "level"))
+                sensors.append(AtemAudioLevelSensor(coordinator, entry, source, "peak"))
+        # Données statiques et volumineuses, hors des lignes de chaque commutation
+        sensors.append(AtemModelSensor(coordinator, entry))
+        sensors.append(AtemInputsSensor(coordinator, entry))
+        # Métriques des chemins chauds, désactivées par défaut
+        sensors.append(AtemEventCountSensor(coordinator, entry, "received"))
+        sensors.append(AtemEventCountSensor(coordinator, entry, "dropped"))
+        latencies = ["snapshot", "service_echo"]
+        if not coordinator.client.runs_in_loop:
+            # Le passage entre threads n'existe qu'avec le client PyATEMMax
+            latencies.insert(0, "receive_hop")
+        sensors.extend(AtemLatencySensor(coordinator, entry, kind) for kind in latencies)
+        sensors.append(AtemQueueDepthSensor(coordinator, entry))
+        sensors.append(AtemReconnectsSensor(coordinator, entry))
+        return sensors
     
-    # Ajout des entités
-    async_add_entities(sensors, update_before_add=True)
+    # Ajout des entités, complétées quand la topologie est découverte
+    async_add_topology_entities(coordinator, entry, async_add_entities, _sensors)
+
+
+class AtemSourceSensor(AtemEntity, SensorEntity):
+    """Base sensor for the source of a bus, with cached attributes."""
 
+    # Clé de coordinator.data du numéro de source
+    _source_key: str
 
-class AtemProgramSensor(CoordinatorEntity, SensorEntity):
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry)
+        # Même dict tant que la source ne change pas
+        self._attrs_source: Optional[Any] = None
+        self._attrs: Dict[str, Any] = {}
+
+    @property
+    def extra_state_attributes(self):
+        """Return additional attributes, reused until the source changes."""
+        source = self.coordinator.data.get(self._source_key) if self.coordinator.data else None
+        if source != self._attrs_source:
+            self._attrs_source = source
+            self._attrs = {} if source is None else {"input_number": source}
+        return self._attrs
+
+
+class AtemProgramSensor(AtemSourceSensor):
     """Sensor for ATEM program input."""
+
+    _atem_commands = ("PrgI",)
     
-    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry, me: int = 0):
         """Initialize the sensor."""
-        super().__init__(coordinator)
-        self.entry = entry
-        self._attr_unique_id = f"{entry.entry_id}_program"
-        self._attr_name = "ATEM Program"
+        self.me = me
+        self._source_key = me_key("program", me)
+        self._name_key = me_key("program_name", me)
+        self._atem_data_keys = (self._source_key, self._name_key)
+        super().__init__(coordinator, entry)
+        # Le M/E 1 garde l'identifiant et le nom d'origine
+        if me == 0:
+            self._attr_unique_id = f"{entry.entry_id}_program"
+            self._attr_name = "ATEM Program"
+        else:
+            self._attr_unique_id = f"{entry.entry_id}_me{me + 1}_program"
+            self._attr_name = f"ATEM M/E {me + 1} Program"
         self._attr_icon = "mdi:video-input-hdmi"
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, entry.entry_id)},
-            "name": f"ATEM {entry.data.get('host', 'Unknown')}",
-            "manufacturer": "Blackmagic Design",
-            "model": "ATEM Switcher",
-        }
     
     @property
     def native_value(self):
         """Return the state of the sensor."""
-        if self.coordinator.data and "program_name" in self.coordinator.data:
-            return self.coordinator.data["program_name"]
-        elif self.coordinator.data and "program" in self.coordinator.data:
-            return self.coordinator.data["program"]
+        if self.coordinator.data and self._name_key in self.coordinator.data:
+            return self.coordinator.data[self._name_key]
+        elif self.coordinator.data and self._source_key in self.coordinator.data:
+            return self.coordinator.data[self._source_key]
         return "Unknown"
-    
-    @property
-    def extra_state_attributes(self):
-        """Return additional attributes."""
-        attrs = {}
-        if self.coordinator.data:
-            if "program" in self.coordinator.data:
-                attrs["input_number"] = self.coordinator.data["program"]
-            if "model" in self.coordinator.data:
-                attrs["atem_model"] = self.coordinator.data["model"]
-        return attrs
 
 
-class AtemPreviewSensor(CoordinatorEntity, SensorEntity):
+class AtemPreviewSensor(AtemSourceSensor):
     """Sensor for ATEM preview input."""
+
+    _atem_commands = ("PrvI",)
     
-    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry, me: int = 0):
         """Initialize the sensor."""
-        super().__init__(coordinator)
-        self.entry = entry
-        self._attr_unique_id = f"{entry.entry_id}_preview"
-        self._attr_name = "ATEM Preview"
+        self.me = me
+        self._source_key = me_key("preview", me)
+        self._name_key = me_key("preview_name", me)
+        self._atem_data_keys = (self._source_key, self._name_key)
+        super().__init__(coordinator, entry)
+        # Le M/E 1 garde l'identifiant et le nom d'origine
+        if me == 0:
+            self._attr_unique_id = f"{entry.entry_id}_preview"
+            self._attr_name = "ATEM Preview"
+        else:
+            self._attr_unique_id = f"{entry.entry_id}_me{me + 1}_preview"
+            self._attr_name = f"ATEM M/E {me + 1} Preview"
         self._attr_icon = "mdi:video-input-hdmi"
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, entry.entry_id)},
-            "name": f"ATEM {entry.data.get('host', 'Unknown')}",
-            "manufacturer": "Blackmagic Design",
-            "model": "ATEM Switcher",
-        }
     
     @property
     def native_value(self):
         """Return the state of the sensor."""
-        if self.coordinator.data and "preview_name" in self.coordinator.data:
-            return self.coordinator.data["preview_name"]
-        elif self.coordinator.data and "preview" in self.coordinator.data:
-            return self.coordinator.data["preview"]
+        if self.coordinator.data and self._name_key in self.coordinator.data:
+            return self.coordinator.data[self._name_key]
+        elif self.coordinator.data and self._source_key in self.coordinator.data:
+            return self.coordinator.data[self._source_key]
         return "Unknown"
+
+
+class AtemAuxSensor(AtemSourceSensor):
+    """Sensor for the source of an ATEM aux output."""
+
+    _atem_commands = ("AuxS",)
+    
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry, aux: int):
+        """Initialize the sensor."""
+        self.aux = aux
+        self._source_key = aux_key("aux", aux)
+        self._name_key = aux_key("aux_name", aux)
+        self._atem_data_keys = (self._source_key, self._name_key)
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_aux{aux + 1}"
+        self._attr_name = f"ATEM Aux {aux + 1}"
+        self._attr_icon = "mdi:video-switch"
     
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        if self.coordinator.data and self._name_key in self.coordinator.data:
+            return self.coordinator.data[self._name_key]
+        elif self.coordinator.data and self._source_key in self.coordinator.data:
+            return self.coordinator.data[self._source_key]
+        return "Unknown"
+
+
+class AtemAudioLevelSensor(AtemEntity, SensorEntity):
+    """RMS level or peak of an audio input over the metering window, in dBFS."""
+
+    # Les niveaux sont écrits par le vumètre à chaque fenêtre, pas par le
+    # coordinateur : seule la liste des entrées audio est suivie ici
+    _atem_data_keys = ("audio_inputs",)
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "dBFS"
+    _attr_suggested_display_precision = 0
+
+    def __init__(
+        self,
+        coordinator: AtemDataUpdateCoordinator,
+        entry: ConfigEntry,
+        source: int,
+        kind: str,
+    ):
+        """Initialize the sensor (kind is level or peak)."""
+        super().__init__(coordinator, entry)
+        self.source = source
+        self.kind = kind
+        self._attr_unique_id = f"{entry.entry_id}_audio{source}_{kind}"
+        self._attr_name = f"ATEM Audio {source} {kind.capitalize()}"
+        self._attr_icon = "mdi:volume-high" if kind == "level" else "mdi:chart-bell-curve"
+        # La crête double le niveau, à activer au besoin
+        self._attr_entity_registry_enabled_default = kind == "level"
+        # Attributs réutilisés tant qu'aucune entrée n'est renommée
+        self._attrs_version = -1
+        self._attrs: Dict[str, Any] = {}
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to the level changes of the input."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.audio.async_add_listener(
+                self.source, AUDIO_LEVEL, self.async_write_ha_state
+            )
+        )
+
+    @property
+    def native_value(self):
+        """Return the level of the last window."""
+        if self.kind == "level":
+            return self.coordinator.audio.level(self.source)
+        return self.coordinator.audio.peak(self.source)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the audio input number and, for video inputs, their name."""
+        inputs = self.coordinator.inputs
+        if inputs.version != self._attrs_version:
+            self._attrs_version = inputs.version
+            self._attrs = {
+                "input_number": self.source,
+                "input_name": inputs.long_name(self.source),
+            }
+        return self._attrs
+
+
+class AtemModelSensor(AtemEntity, SensorEntity):
+    """Diagnostic sensor for the switcher model and capabilities."""
+
+    _atem_data_keys = ("model", "topology")
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_model"
+        self._attr_name = "ATEM Model"
+        self._attr_icon = "mdi:information-outline"
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    @property
+    def native_value(self):
+        """Return the model name."""
+        if self.coordinator.data:
+            return self.coordinator.data.get("model") or None
+        return None
+
     @property
     def extra_state_attributes(self):
-        """Return additional attributes."""
-        attrs = {}
+        """Return the capabilities of the switcher."""
+        mes, auxes = self.coordinator.topology
+        return {"mes": mes, "aux_outputs": auxes}
+
+
+class AtemInputsSensor(AtemEntity, SensorEntity):
+    """Diagnostic sensor for the input names; the list itself is not recorded."""
+
+    _atem_data_keys = ("available_inputs",)
+    _unrecorded_attributes = frozenset({"inputs"})
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_inputs"
+        self._attr_name = "ATEM Inputs"
+        self._attr_icon = "mdi:format-list-bulleted"
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def _names(self) -> Dict[int, str]:
+        """Return source -> long name."""
         if self.coordinator.data:
-            if "preview" in self.coordinator.data:
-                attrs["input_number"] = self.coordinator.data["preview"]
-            if "available_inputs" in self.coordinator.data:
-                attrs["available_inputs"] = list(self.coordinator.data["available_inputs"].values())
-        return attrs
\ No newline at end of file
+            return self.coordinator.data.get("available_inputs") or {}
+        return {}
+
+    @property
+    def native_value(self):
+        """Return the number of named inputs."""
+        return len(self._names())
+
+    @property
+    def extra_state_attributes(self):
+        """Return the input names."""
+        return {"inputs": list(self._names().values())}
+
+
+class AtemMetricSensor(AtemEntity, SensorEntity):
+    """Base diagnostic sensor for the integration metrics, written on a timer."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    async def async_added_to_hass(self) -> None:
+        """Write the state periodically instead of on coordinator updates."""
+        await super().async_added_to_hass()
+
+        @callback
+        def _async_refresh(_now) -> None:
+            self.async_write_ha_state()
+
+        self.async_on_remove(
+            async_track_time_interval(self.hass, _async_refresh, METRICS_INTERVAL)
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Ignore coordinator updates; the timer writes the state."""
+
+
+class AtemEventCountSensor(AtemMetricSensor):
+    """Diagnostic sensor for the ATEM commands received or dropped, per type."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _unrecorded_attributes = frozenset({"commands"})
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry, kind: str):
+        """Initialize the sensor (kind is received or dropped)."""
+        super().__init__(coordinator, entry)
+        self.kind = kind
+        self._attr_unique_id = f"{entry.entry_id}_events_{kind}"
+        self._attr_name = f"ATEM Events {kind.capitalize()}"
+        self._attr_icon = "mdi:counter"
+
+    def _counts(self) -> Dict[str, int]:
+        """Return command -> count."""
+        return getattr(self.coordinator.metrics, self.kind)
+
+    @property
+    def native_value(self):
+        """Return the number of commands."""
+        return sum(self._counts().values())
+
+    @property
+    def extra_state_attributes(self):
+        """Return the count of each command type."""
+        return {"commands": dict(self._counts())}
+
+
+LATENCY_NAMES = {
+    "receive_hop": "Event Hop Latency",
+    "snapshot": "Refresh Latency",
+    "service_echo": "Switch Echo Latency",
+}
+
+
+class AtemLatencySensor(AtemMetricSensor):
+    """Diagnostic sensor for the 99th percentile of a latency histogram."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _unrecorded_attributes = frozenset({"buckets"})
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry, kind: str):
+        """Initialize the sensor (kind is an AtemMetrics histogram)."""
+        super().__init__(coordinator, entry)
+        self.kind = kind
+        self._attr_unique_id = f"{entry.entry_id}_latency_{kind}"
+        self._attr_name = f"ATEM {LATENCY_NAMES[kind]}"
+        self._attr_icon = "mdi:timer-outline"
+
+    @property
+    def native_value(self):
+        """Return the 99th percentile in milliseconds."""
+        return getattr(self.coordinator.metrics, self.kind).as_dict()["p99_ms"]
+
+    @property
+    def extra_state_attributes(self):
+        """Return the histogram summary."""
+        summary = getattr(self.coordinator.metrics, self.kind).as_dict()
+        del summary["p99_ms"]
+        return summary
+
+
+class AtemQueueDepthSensor(AtemMetricSensor):
+    """Diagnostic sensor for the number of commands waiting to be sent."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_command_queue"
+        self._attr_name = "ATEM Command Queue"
+        self._attr_icon = "mdi:tray-full"
+
+    @property
+    def native_value(self):
+        """Return the queue depth."""
+        return self.coordinator.commands.depth
+
+
+class AtemReconnectsSensor(AtemMetricSensor):
+    """Diagnostic sensor for the number of reconnections."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    def __init__(self, coordinator: AtemDataUpdateCoordinator, entry: ConfigEntry):
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_reconnects"
+        self._attr_name = "ATEM Reconnects"
+        self._attr_icon = "mdi:lan-connect"
+
+    @property
+    def native_value(self):
+        """Return the number of reconnections."""
+        return self.coordinator.connection.reconnects
+
+    @property
+    def extra_state_attributes(self):
+        """Return the connection state and reconnection times."""
+        stats = self.coordinator.connection.stats
+        del stats["reconnects"]
+        return stats
@@ -0,0 +1,135 @@
+"""Per-host registry of ATEM client sessions."""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Optional
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .client import AtemClient, AtemThreadedClient
+from .const import DATA_SESSIONS, TRANSPORT_NATIVE
+from .transport import AtemAsyncClient
+
+_LOGGER = logging.getLogger(__name__)
+
+# Durée pendant laquelle une session connectée mais inutilisée reste ouverte,
+# pour être reprise (config flow -> configuration, rechargement de l'entrée)
+SESSION_LINGER = 60.0
+
+
+def create_client(hass: HomeAssistant, host: str, transport: str) -> AtemClient:
+    """Create an ATEM client for a transport."""
+    if transport == TRANSPORT_NATIVE:
+        return AtemAsyncClient(hass, host)
+    return AtemThreadedClient(hass, host)
+
+
+class AtemSession:
+    """A client shared by every consumer of one host."""
+
+    __slots__ = ("client", "transport", "refcount", "unsub_linger")
+
+    def __init__(self, client: AtemClient, transport: str) -> None:
+        """Initialize the session."""
+        self.client = client
+        self.transport = transport
+        self.refcount = 0
+        self.unsub_linger: Optional[CALLBACK_TYPE] = None
+
+
+class AtemSessionRegistry:
+    """Hand out one client per switcher, with reference counting.
+
+    ATEMs only accept a few client sessions: the config flow, the
+    coordinator and any other consumer of a host share the same one. The
+    consumer that sets the client callbacks owns the event stream.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the registry."""
+        self.hass = hass
+        self._sessions: Dict[str, AtemSession] = {}
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_stop)
+
+    @callback
+    def async_acquire(self, host: str, transport: str) -> AtemClient:
+        """Return the client of a host, creating it if needed."""
+        session = self._sessions.get(host)
+        if session is not None and session.transport != transport and session.refcount == 0:
+            # Session inutilisée d'un autre transport : on la remplace
+            self._async_cancel_linger(session)
+            self.hass.async_create_task(session.client.async_close())
+            session = None
+        if session is None:
+            session = AtemSession(create_client(self.hass, host, transport), transport)
+            self._sessions[host] = session
+        elif session.refcount == 0 and session.client.connected:
+            _LOGGER.debug(f"Reusing the open ATEM session with {host}")
+
+        self._async_cancel_linger(session)
+        session.refcount += 1
+        return session.client
+
+    async def async_release(self, client: AtemClient) -> None:
+        """Release a client; it is closed once nobody uses it."""
+        session = self._sessions.get(client.host)
+        if session is None or session.client is not client:
+            await client.async_close()
+            return
+        if session.refcount <= 0:
+            # Libération en trop : la session n'a déjà plus d'utilisateur
+            _LOGGER.debug(f"Ignoring an extra release of the ATEM session with {client.host}")
+            return
+
+        session.refcount -= 1
+        if session.refcount > 0:
+            return
+
+        # Plus personne ne consomme les événements
+        client.set_command_callback(lambda cmd, index: None)
+        client.set_connection_callback(lambda connected: None)
+        client.set_audio_level_callback(lambda source, level, peak: None)
+
+        if not client.connected:
+            await self._async_close(client.host)
+            return
+
+        @callback
+        def _async_linger_expired(_now: Any) -> None:
+            session.unsub_linger = None
+            self.hass.async_create_task(self._async_close(client.host))
+
+        session.unsub_linger = async_call_later(self.hass, SESSION_LINGER, _async_linger_expired)
+
+    @callback
+    def _async_cancel_linger(self, session: AtemSession) -> None:
+        if session.unsub_linger is not None:
+            session.unsub_linger()
+            session.unsub_linger = None
+
+    async def _async_close(self, host: str) -> None:
+        """Close the session of a host if it is still unused."""
+        session = self._sessions.get(host)
+        if session is None or session.refcount > 0:
+            return
+        del self._sessions[host]
+        self._async_cancel_linger(session)
+        await session.client.async_close()
+
+    async def _async_stop(self, _event: Event) -> None:
+        """Close every session when Home Assistant stops."""
+        for host, session in list(self._sessions.items()):
+            self._async_cancel_linger(session)
+            await session.client.async_close()
+            del self._sessions[host]
+
+
+@callback
+def async_get_session_registry(hass: HomeAssistant) -> AtemSessionRegistry:
+    """Return the session registry, creating it on first use."""
+    registry: Optional[AtemSessionRegistry] = hass.data.get(DATA_SESSIONS)
+    if registry is None:
+        registry = hass.data[DATA_SESSIONS] = AtemSessionRegistry(hass)
+    return registry
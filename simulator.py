@@ -0,0 +1,530 @@
+"""Local ATEM switcher simulator for tests and benchmarks.
+
+Run it standalone with ``python -m hass_atem.simulator --model "ATEM Mini Extreme ISO"``
+and point the integration (or a benchmark) at its address.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import struct
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .atem_models import get_model_config
+from .protocol import (
+    ATEM_PORT,
+    FLAG_ACK,
+    FLAG_ACK_REQUEST,
+    FLAG_HELLO,
+    FLAG_RESEND,
+    HEADER_LEN,
+    HELLO_ACCEPTED,
+    HELLO_CLOSE,
+    HELLO_CLOSED,
+    HELLO_FULL,
+    PACKET_ID_MASK,
+    iter_commands,
+    pack_command,
+    pack_packet,
+    unpack_header,
+    unpack_u8_u16,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Taille maximale de la charge utile d'un paquet de l'état initial
+MAX_PAYLOAD = 1300
+TICK_INTERVAL = 0.05
+RESEND_INTERVAL = 0.1
+# Le vrai mélangeur envoie un paquet vide à acquitter environ toutes les 500 ms
+KEEPALIVE_INTERVAL = 0.5
+SESSION_TIMEOUT = 5.0
+
+# Type de port (InPr) selon la plage de la source
+_PORT_TYPES = (
+    (1, 999, 0, 2),        # entrées externes, HDMI
+    (0, 0, 1, 0),          # noir
+    (1000, 1000, 2, 0),    # barres de couleur
+    (2001, 2999, 3, 0),    # générateurs de couleur
+    (3010, 3999, 4, 0),    # lecteurs média
+    (6000, 6999, 6, 0),    # super source
+    (10010, 10999, 128, 0),  # sorties M/E
+)
+
+
+def _port_types(source: int) -> Tuple[int, int]:
+    """Return (switcher port type, external port type) for a source."""
+    for low, high, port_type, external in _PORT_TYPES:
+        if low <= source <= high:
+            return port_type, external
+    return 0, 0
+
+
+def _fixed(text: str, length: int) -> bytes:
+    """Encode a NUL padded string field."""
+    return text.encode("utf-8")[:length].ljust(length, b"\x00")
+
+
+class _Session:
+    """State of one client session."""
+
+    def __init__(self, addr: Tuple[str, int], client_session_id: int) -> None:
+        self.addr = addr
+        self.client_session_id = client_session_id
+        self.session_id = 0
+        self.ready = False
+        self.packet_id = 0
+        self.last_contact = 0.0
+        self.last_sent = 0.0
+        self.last_remote_packet_id = 0
+        # Paquets non acquittés : id -> [paquet, envoi]
+        self.inflight: Dict[int, List[Any]] = {}
+
+
+class AtemSimulator(asyncio.DatagramProtocol):
+    """UDP stand-in implementing the ATEM session protocol.
+
+    Knobs:
+        packet_loss: probability of dropping each outgoing and incoming packet.
+        latency: delay (seconds) added to every outgoing packet.
+        event_rate: random program/preview changes per second (0 = off).
+        frame_rate: rate of ``Time`` packets sent to every client (0 = off).
+        meter_rate: rate of audio level packets once a client enables them,
+            ``FMLv`` per input (Fairlight) or one ``AMLv`` (audio mixer).
+    """
+
+    def __init__(
+        self,
+        model: str = "ATEM Mini Extreme ISO",
+        mes: int = 1,
+        aux_busses: int = 1,
+        max_sessions: int = 8,
+        packet_loss: float = 0.0,
+        latency: float = 0.0,
+        event_rate: float = 0.0,
+        frame_rate: float = 0.0,
+        auto_duration: float = 0.5,
+        meter_rate: float = 25.0,
+        fairlight: bool = True,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Initialize the simulator."""
+        self.model = model
+        self.mes = mes
+        self.aux_busses = aux_busses
+        self.max_sessions = max_sessions
+        self.packet_loss = packet_loss
+        self.latency = latency
+        self.event_rate = event_rate
+        self.frame_rate = frame_rate
+        self.auto_duration = auto_duration
+        self.meter_rate = meter_rate
+        self.fairlight = fairlight
+        self._random = random.Random(seed)
+
+        config = get_model_config(model)
+        self.inputs: Dict[int, Tuple[str, str]] = {}
+        for source, alias in sorted(config["inputs"].items()):
+            if 1 <= source <= 999:
+                self.inputs[source] = (f"Camera {source}", f"CAM{source}")
+            else:
+                self.inputs[source] = (alias, alias[:4].upper())
+        self.external_inputs = [s for s in self.inputs if 1 <= s <= 999]
+
+        self.program: Dict[int, int] = {me: 1 for me in range(mes)}
+        self.preview: Dict[int, int] = {me: 2 for me in range(mes)}
+        self.aux: Dict[int, int] = {aux: 1 for aux in range(aux_busses)}
+        # M/E en cours de transition : le preview est aussi à l'antenne
+        self.transitions: Set[int] = set()
+        self.timecode = 0
+        # Niveau audio (dBFS) de chaque entrée externe, envoyé une fois activé
+        self.audio_levels: Dict[int, float] = {source: -20.0 for source in self.external_inputs}
+        self.metering = False
+
+        # Compteurs
+        self.commands_received: Dict[str, int] = {}
+        self.packets_sent = 0
+        self.packets_dropped = 0
+
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sessions: Dict[Tuple[str, int], _Session] = {}
+        self._next_session_id = 0x8001
+        self._tasks: List[asyncio.Task] = []
+        self._tick_handle: Optional[asyncio.TimerHandle] = None
+
+    # Cycle de vie
+
+    async def async_start(self, host: str = "127.0.0.1", port: int = ATEM_PORT) -> Tuple[str, int]:
+        """Start listening; returns the bound address."""
+        self._loop = asyncio.get_running_loop()
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: self, local_addr=(host, port)
+        )
+        self._tick_handle = self._loop.call_later(TICK_INTERVAL, self._tick)
+        if self.event_rate > 0:
+            self._tasks.append(self._loop.create_task(self._random_events()))
+        if self.frame_rate > 0:
+            self._tasks.append(self._loop.create_task(self._timecode()))
+        if self.meter_rate > 0:
+            self._tasks.append(self._loop.create_task(self._audio_levels()))
+        return self._transport.get_extra_info("sockname")[:2]
+
+    async def async_stop(self) -> None:
+        """Stop the simulator."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if self._tick_handle is not None:
+            self._tick_handle.cancel()
+            self._tick_handle = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._sessions.clear()
+
+    @property
+    def sessions(self) -> int:
+        """Return the number of established sessions."""
+        return sum(1 for session in self._sessions.values() if session.ready)
+
+    # Envoi
+
+    def _sendto(self, packet: bytes, addr: Tuple[str, int]) -> None:
+        """Send a packet, applying the loss and latency knobs."""
+        if self._transport is None:
+            return
+        if self.packet_loss and self._random.random() < self.packet_loss:
+            self.packets_dropped += 1
+            return
+        self.packets_sent += 1
+        if self.latency:
+            self._loop.call_later(self.latency, self._transport.sendto, packet, addr)
+        else:
+            self._transport.sendto(packet, addr)
+
+    def _send_reliable(self, session: _Session, payload: bytes) -> None:
+        """Send a payload that the client must acknowledge."""
+        session.packet_id = (session.packet_id + 1) & PACKET_ID_MASK
+        packet = pack_packet(
+            FLAG_ACK_REQUEST, session.session_id, payload, packet_id=session.packet_id
+        )
+        now = self._loop.time()
+        session.inflight[session.packet_id] = [packet, now]
+        session.last_sent = now
+        self._sendto(packet, session.addr)
+
+    def broadcast(self, payload: bytes) -> None:
+        """Send commands to every established session."""
+        for session in self._sessions.values():
+            if session.ready:
+                self._send_reliable(session, payload)
+
+    # Réception
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """Handle a packet from a client."""
+        if len(data) < HEADER_LEN:
+            return
+        if self.packet_loss and self._random.random() < self.packet_loss:
+            self.packets_dropped += 1
+            return
+        flags, length, session_id, ack_id, _resend_id, packet_id = unpack_header(data)
+        session = self._sessions.get(addr)
+
+        if flags & FLAG_HELLO:
+            if len(data) > HEADER_LEN and data[HEADER_LEN] == HELLO_CLOSE:
+                # Fermeture demandée par le client
+                if session is not None:
+                    del self._sessions[addr]
+                    self._sendto(
+                        pack_packet(FLAG_HELLO, session_id, bytes([HELLO_CLOSED]) + bytes(7)), addr
+                    )
+                return
+            if session is None and len(self._sessions) >= self.max_sessions:
+                self._sendto(pack_packet(FLAG_HELLO, session_id, bytes([HELLO_FULL]) + bytes(7)), addr)
+                return
+            session = _Session(addr, session_id)
+            session.last_contact = self._loop.time()
+            self._sessions[addr] = session
+            self._sendto(pack_packet(FLAG_HELLO, session_id, bytes([HELLO_ACCEPTED]) + bytes(7)), addr)
+            return
+
+        if session is None:
+            return
+        session.last_contact = self._loop.time()
+
+        if not session.ready:
+            # ACK du HELLO : on attribue la session et on envoie l'état initial
+            if flags & FLAG_ACK:
+                session.session_id = self._next_session_id
+                self._next_session_id = 0x8000 | ((self._next_session_id + 1) & 0x7FFF)
+                session.ready = True
+                for payload in self._initial_state():
+                    self._send_reliable(session, payload)
+                # Paquet vide de fin d'état initial, attendu par PyATEMMax
+                self._send_reliable(session, b"")
+            return
+
+        if flags & FLAG_ACK:
+            session.inflight.pop(ack_id, None)
+
+        if flags & FLAG_ACK_REQUEST:
+            self._sendto(pack_packet(FLAG_ACK, session.session_id, ack_id=packet_id), addr)
+            # Les renvois d'un paquet déjà traité sont seulement acquittés
+            if packet_id == session.last_remote_packet_id:
+                return
+            session.last_remote_packet_id = packet_id
+            for name, body in iter_commands(data[HEADER_LEN:length]):
+                self._handle_command(name, body)
+
+    def _handle_command(self, name: str, body: bytes) -> None:
+        """Apply a client command and broadcast the resulting state."""
+        self.commands_received[name] = self.commands_received.get(name, 0) + 1
+        if name == "CPgI":
+            me, source = unpack_u8_u16(body)
+            self.set_program(me, source)
+        elif name == "CPvI":
+            me, source = unpack_u8_u16(body)
+            self.set_preview(me, source)
+        elif name == "DCut":
+            self.cut(body[0])
+        elif name == "DAut":
+            self._tasks.append(self._loop.create_task(self._auto(body[0])))
+        elif name == "CAuS":
+            _mask, aux, source = struct.unpack_from(">BBH", body)
+            self.aux[aux] = source
+            self.broadcast(self._auxs(aux))
+        elif name == ("SFLN" if self.fairlight else "SALN"):
+            self.metering = bool(body[0])
+
+    # Opérations du pupitre
+
+    def set_program(self, me: int, source: int) -> None:
+        """Change the program source as if done from the panel."""
+        self.program[me] = source
+        self.broadcast(self._prgi(me) + self._tally())
+
+    def set_preview(self, me: int, source: int) -> None:
+        """Change the preview source as if done from the panel."""
+        self.preview[me] = source
+        self.broadcast(self._prvi(me) + self._tally())
+
+    def cut(self, me: int) -> None:
+        """Swap program and preview."""
+        self.program[me], self.preview[me] = self.preview[me], self.program[me]
+        self.broadcast(self._prgi(me) + self._prvi(me) + self._tally())
+
+    def set_audio_level(self, source: int, level: float) -> None:
+        """Change the audio level (dBFS) of an input."""
+        self.audio_levels[source] = level
+
+    def rename_input(self, source: int, long_name: str, short_name: str) -> None:
+        """Rename an input."""
+        self.inputs[source] = (long_name, short_name)
+        self.broadcast(self._inpr(source))
+
+    async def _auto(self, me: int) -> None:
+        """Run an auto transition over ``auto_duration`` seconds."""
+        steps = 5
+        self.transitions.add(me)
+        self.broadcast(self._tally())
+        for step in range(steps):
+            position = int(10000 * step / steps)
+            self.broadcast(pack_command(
+                "TrPs", struct.pack(">BBBxHxx", me, 1, steps - step, position)
+            ))
+            await asyncio.sleep(self.auto_duration / steps)
+        self.broadcast(pack_command("TrPs", struct.pack(">BBBxHxx", me, 0, 0, 0)))
+        self.transitions.discard(me)
+        self.cut(me)
+
+    async def _random_events(self) -> None:
+        """Generate random switching at ``event_rate`` per second."""
+        while True:
+            await asyncio.sleep(1 / self.event_rate)
+            me = self._random.randrange(self.mes)
+            source = self._random.choice(self.external_inputs)
+            if self._random.random() < 0.5:
+                self.set_program(me, source)
+            else:
+                self.set_preview(me, source)
+
+    async def _timecode(self) -> None:
+        """Send a Time packet every frame."""
+        while True:
+            await asyncio.sleep(1 / self.frame_rate)
+            self.timecode += 1
+            frames = self.timecode
+            self.broadcast(pack_command("Time", struct.pack(
+                ">BBBBxxxx",
+                (frames // 90000) % 24,
+                (frames // 1500) % 60,
+                (frames // 25) % 60,
+                frames % 25,
+            )))
+
+    async def _audio_levels(self) -> None:
+        """Send the audio levels at ``meter_rate`` while metering is enabled."""
+        while True:
+            await asyncio.sleep(1 / self.meter_rate)
+            if self.metering:
+                self.broadcast(self._fmlv() if self.fairlight else self._amlv())
+
+    def _tick(self) -> None:
+        """Resend unacknowledged packets, send keepalives, drop dead sessions."""
+        now = self._loop.time()
+        for addr, session in list(self._sessions.items()):
+            if now - session.last_contact > SESSION_TIMEOUT:
+                del self._sessions[addr]
+                continue
+            if not session.ready:
+                continue
+            for entry in session.inflight.values():
+                if now - entry[1] >= RESEND_INTERVAL:
+                    entry[1] = now
+                    packet = entry[0]
+                    self._sendto(bytes([packet[0] | (FLAG_RESEND << 3)]) + packet[1:], addr)
+            if now - session.last_sent >= KEEPALIVE_INTERVAL:
+                self._send_reliable(session, b"")
+        self._tick_handle = self._loop.call_later(TICK_INTERVAL, self._tick)
+
+    # Encodage de l'état
+
+    def _initial_state(self) -> List[bytes]:
+        """Build the initial state dump, split into packets."""
+        commands = [
+            pack_command("_ver", struct.pack(">HH", 2, 30)),
+            pack_command("_pin", _fixed(self.model, 44)),
+            pack_command("_top", bytes([
+                self.mes, len(self.inputs), 2, self.aux_busses, 1, 1, 1, 0, 0, 0, 0, 0,
+            ])),
+        ]
+        commands.extend(self._inpr(source) for source in self.inputs)
+        for me in range(self.mes):
+            commands.append(self._prgi(me))
+            commands.append(self._prvi(me))
+        commands.extend(self._auxs(aux) for aux in range(self.aux_busses))
+        commands.append(self._tally())
+        commands.append(pack_command("InCm", bytes([1, 0, 0, 0])))
+
+        packets: List[bytes] = []
+        current = b""
+        for command in commands:
+            if current and len(current) + len(command) > MAX_PAYLOAD:
+                packets.append(current)
+                current = b""
+            current += command
+        packets.append(current)
+        return packets
+
+    def _inpr(self, source: int) -> bytes:
+        long_name, short_name = self.inputs[source]
+        port_type, external = _port_types(source)
+        body = bytearray(36)
+        struct.pack_into(">H", body, 0, source)
+        body[2:22] = _fixed(long_name, 20)
+        body[22:26] = _fixed(short_name, 4)
+        body[27] = 1 << (external - 1) if external else 0
+        body[29] = external
+        body[30] = port_type
+        body[34] = 0x1F
+        body[35] = 0x03
+        return pack_command("InPr", bytes(body))
+
+    def _prgi(self, me: int) -> bytes:
+        return pack_command("PrgI", struct.pack(">BxHxxxx", me, self.program[me]))
+
+    def _prvi(self, me: int) -> bytes:
+        return pack_command("PrvI", struct.pack(">BxHBxxx", me, self.preview[me], 0))
+
+    def _auxs(self, aux: int) -> bytes:
+        return pack_command("AuxS", struct.pack(">BxH", aux, self.aux[aux]))
+
+    def _fmlv(self) -> bytes:
+        """Build one FMLv per input (levels in hundredths of dB)."""
+        commands = []
+        for source, level in self.audio_levels.items():
+            centi = max(-10000, int(level * 100))
+            commands.append(pack_command("FMLv", struct.pack(
+                ">H6xq15h2x", source, -65280, *([centi] * 4), 0, 0, 0, *([centi] * 8)
+            )))
+        return b"".join(commands)
+
+    def _amlv(self) -> bytes:
+        """Build an AMLv with every input (24-bit linear levels)."""
+        sources = list(self.audio_levels)
+        body = bytearray(36)
+        struct.pack_into(">H", body, 0, len(sources))
+        body += struct.pack(f">{len(sources)}H", *sources)
+        body += bytes(2 * (len(sources) & 1))
+        for source in sources:
+            linear = int(10 ** (self.audio_levels[source] / 20) * (1 << 23))
+            body += struct.pack(">IIII", linear, linear, linear, linear)
+        return pack_command("AMLv", bytes(body))
+
+    def _tally_flags(self, source: int) -> int:
+        flags = 0
+        if source in self.program.values() or any(
+            self.preview[me] == source for me in self.transitions
+        ):
+            flags |= 0x01
+        if source in self.preview.values():
+            flags |= 0x02
+        return flags
+
+    def _tally(self) -> bytes:
+        """Build TlIn (by input index) and TlSr (by source) commands."""
+        by_index = bytes(self._tally_flags(source) for source in self.external_inputs)
+        tlin = struct.pack(">H", len(by_index)) + by_index
+        tlin += bytes(-len(tlin) % 4)
+        tlsr = struct.pack(">H", len(self.inputs)) + b"".join(
+            struct.pack(">HB", source, self._tally_flags(source)) for source in self.inputs
+        )
+        tlsr += bytes(-len(tlsr) % 4)
+        return pack_command("TlIn", tlin) + pack_command("TlSr", tlsr)
+
+
+def main() -> None:
+    """Run the simulator from the command line."""
+    parser = argparse.ArgumentParser(description="ATEM switcher simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=ATEM_PORT)
+    parser.add_argument("--model", default="ATEM Mini Extreme ISO")
+    parser.add_argument("--mes", type=int, default=1)
+    parser.add_argument("--aux", type=int, default=1)
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss probability")
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency (s)")
+    parser.add_argument("--event-rate", type=float, default=0.0, help="random switches per second")
+    parser.add_argument("--frame-rate", type=float, default=0.0, help="Time packets per second")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def _run() -> None:
+        simulator = AtemSimulator(
+            model=args.model,
+            mes=args.mes,
+            aux_busses=args.aux,
+            packet_loss=args.loss,
+            latency=args.latency,
+            event_rate=args.event_rate,
+            frame_rate=args.frame_rate,
+        )
+        host, port = await simulator.async_start(args.host, args.port)
+        _LOGGER.info(f"ATEM simulator '{args.model}' listening on {host}:{port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await simulator.async_stop()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
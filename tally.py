@@ -0,0 +1,151 @@
+"""Incremental tally engine fed by the switcher TlSr events."""
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Mapping, Tuple
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+# Bits des drapeaux de tally du protocole ATEM
+TALLY_PROGRAM = 0x01
+TALLY_PREVIEW = 0x02
+TALLY_BOTH = TALLY_PROGRAM | TALLY_PREVIEW
+
+# Entrées externes ayant des entités de tally (noir, barres, couleurs... exclus)
+EXTERNAL_INPUTS = range(1, 1000)
+
+
+class AtemTallyEngine:
+    """Keep the tally of every source as two bitmasks and notify the flips.
+
+    Each source gets a bit position the first time the switcher reports it;
+    the program and preview tallies are one integer each. The switcher
+    computes them itself, so keyers and transitions in progress are included.
+    An update only XORs the new masks with the old ones and calls the
+    listeners of the sources whose bits flipped.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty tally."""
+        # Source -> position du bit, et l'inverse
+        self._bits: Dict[int, int] = {}
+        self._sources: List[int] = []
+        self.program = 0
+        self.preview = 0
+        # Entrées externes connues, même tuple tant qu'aucune n'apparaît
+        self.inputs: Tuple[int, ...] = ()
+        # Source -> [(drapeaux suivis, callback)]
+        self._listeners: Dict[int, List[Tuple[int, Callable[[], None]]]] = {}
+        # Appelés pour chaque bascule avec (source, nouveaux drapeaux), avant les entités
+        self._flip_listeners: List[Callable[[int, int], None]] = []
+
+        # Compteurs
+        self.updates = 0
+        self.flips = 0
+
+    def _bit(self, source: int) -> int:
+        """Return the bit position of a source, allocating it on first sight."""
+        bit = self._bits.get(source)
+        if bit is None:
+            bit = self._bits[source] = len(self._sources)
+            self._sources.append(source)
+            if source in EXTERNAL_INPUTS:
+                self.inputs = tuple(sorted((*self.inputs, source)))
+        return bit
+
+    def flags(self, source: int) -> int:
+        """Return the TALLY_PROGRAM/TALLY_PREVIEW flags of a source."""
+        bit = self._bits.get(source)
+        if bit is None:
+            return 0
+        return (self.program >> bit & 1) * TALLY_PROGRAM | (self.preview >> bit & 1) * TALLY_PREVIEW
+
+    def as_dict(self) -> Dict[int, int]:
+        """Return source -> flags of every known source."""
+        return {source: self.flags(source) for source in self._sources}
+
+    @callback
+    def async_update(self, tally: Mapping[int, int]) -> int:
+        """Apply a full source -> flags tally; returns the number of flipped sources."""
+        program = preview = 0
+        for source, flags in tally.items():
+            bit = self._bit(source)
+            if flags & TALLY_PROGRAM:
+                program |= 1 << bit
+            if flags & TALLY_PREVIEW:
+                preview |= 1 << bit
+        return self._async_apply(program, preview)
+
+    @callback
+    def async_clear(self) -> int:
+        """Turn every tally off (e.g. when the switcher is lost)."""
+        return self._async_apply(0, 0)
+
+    @callback
+    def _async_apply(self, program: int, preview: int) -> int:
+        """Store the new masks and notify the listeners of the flipped sources."""
+        self.updates += 1
+        program_flips = program ^ self.program
+        preview_flips = preview ^ self.preview
+        self.program = program
+        self.preview = preview
+
+        flipped = 0
+        changed = program_flips | preview_flips
+        while changed:
+            low = changed & -changed
+            changed ^= low
+            flipped += 1
+            bit = low.bit_length() - 1
+            source = self._sources[bit]
+            if self._flip_listeners:
+                flags = (program >> bit & 1) * TALLY_PROGRAM | (preview >> bit & 1) * TALLY_PREVIEW
+                for flip_callback in self._flip_listeners:
+                    flip_callback(source, flags)
+            listeners = self._listeners.get(source)
+            if not listeners:
+                continue
+            flips = bool(program_flips & low) * TALLY_PROGRAM | bool(preview_flips & low) * TALLY_PREVIEW
+            for watched, update_callback in listeners:
+                if watched & flips:
+                    update_callback()
+        self.flips += flipped
+        return flipped
+
+    @callback
+    def async_add_listener(
+        self, source: int, watched: int, update_callback: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Call update_callback when the watched flags of a source flip."""
+        listener = (watched, update_callback)
+        self._listeners.setdefault(source, []).append(listener)
+
+        @callback
+        def _remove() -> None:
+            listeners = self._listeners.get(source)
+            if listeners and listener in listeners:
+                listeners.remove(listener)
+                if not listeners:
+                    del self._listeners[source]
+
+        return _remove
+
+    @callback
+    def async_add_flip_listener(self, flip_callback: Callable[[int, int], None]) -> CALLBACK_TYPE:
+        """Call flip_callback(source, flags) for every flipped source."""
+        self._flip_listeners.append(flip_callback)
+
+        @callback
+        def _remove() -> None:
+            if flip_callback in self._flip_listeners:
+                self._flip_listeners.remove(flip_callback)
+
+        return _remove
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return the tally counters."""
+        return {
+            "updates": self.updates,
+            "flips": self.flips,
+            "sources": len(self._sources),
+        }
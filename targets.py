@@ -0,0 +1,166 @@
+"""Routing of service targets to ATEM coordinators."""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_AREA_ID, ATTR_DEVICE_ID, ATTR_ENTITY_ID
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, ServiceCall, callback
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity_registry as er,
+)
+import homeassistant.helpers.config_validation as cv
+
+from .const import DATA_TARGETS
+
+if TYPE_CHECKING:
+    from .coordinator import AtemDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+
+# Champs de ciblage acceptés par tous les services
+TARGET_FIELDS = {
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Optional(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_AREA_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+}
+
+
+class AtemTargetIndex:
+    """Map devices, entities and config entries to their coordinator.
+
+    The index is filled when an entry is set up and kept in sync with the
+    entity registry, so resolving a service call is only dict lookups; areas
+    go through the registries, as the Home Assistant target helpers do.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the index."""
+        self.hass = hass
+        self.coordinators: Dict[str, AtemDataUpdateCoordinator] = {}
+        self._devices: Dict[str, str] = {}
+        self._entities: Dict[str, str] = {}
+        self._unsub_entities: Optional[CALLBACK_TYPE] = hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_updated
+        )
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop following the entity registry."""
+        if self._unsub_entities is not None:
+            self._unsub_entities()
+            self._unsub_entities = None
+
+    @callback
+    def async_add(self, entry_id: str, coordinator: AtemDataUpdateCoordinator) -> None:
+        """Index an entry, its devices and its entities."""
+        self.coordinators[entry_id] = coordinator
+        for device in dr.async_entries_for_config_entry(dr.async_get(self.hass), entry_id):
+            self._devices[device.id] = entry_id
+        for entity in er.async_entries_for_config_entry(er.async_get(self.hass), entry_id):
+            self._entities[entity.entity_id] = entry_id
+            if entity.device_id is not None:
+                self._devices[entity.device_id] = entry_id
+
+    @callback
+    def async_remove(self, entry_id: str) -> None:
+        """Forget an entry."""
+        self.coordinators.pop(entry_id, None)
+        self._devices = {key: value for key, value in self._devices.items() if value != entry_id}
+        self._entities = {key: value for key, value in self._entities.items() if value != entry_id}
+
+    @callback
+    def _async_entity_updated(self, event: Event) -> None:
+        """Follow the entities created, renamed or removed after setup."""
+        action = event.data["action"]
+        entity_id = event.data["entity_id"]
+        if action == "remove":
+            self._entities.pop(entity_id, None)
+            return
+        if action == "update" and "old_entity_id" in event.data:
+            self._entities.pop(event.data["old_entity_id"], None)
+        entity = er.async_get(self.hass).async_get(entity_id)
+        if entity is not None and entity.config_entry_id in self.coordinators:
+            self._entities[entity_id] = entity.config_entry_id
+            if entity.device_id is not None:
+                self._devices[entity.device_id] = entity.config_entry_id
+
+    @callback
+    def async_resolve(self, call: ServiceCall) -> List[AtemDataUpdateCoordinator]:
+        """Return the coordinators targeted by a service call.
+
+        Without target, the call goes to the only configured switcher.
+        """
+        entry_ids: Dict[str, None] = {}
+        unknown: List[str] = []
+        for field, mapping in (
+            (ATTR_CONFIG_ENTRY_ID, None),
+            (ATTR_DEVICE_ID, self._devices),
+            (ATTR_ENTITY_ID, self._entities),
+        ):
+            for target in call.data.get(field, ()):
+                entry_id: Optional[str] = (
+                    target if mapping is None else mapping.get(target)
+                )
+                if entry_id is None or entry_id not in self.coordinators:
+                    unknown.append(target)
+                else:
+                    entry_ids[entry_id] = None
+        for area_id in call.data.get(ATTR_AREA_ID, ()):
+            area_entries = self._async_resolve_area(area_id)
+            if not area_entries:
+                unknown.append(area_id)
+            entry_ids.update(dict.fromkeys(area_entries))
+
+        if unknown:
+            raise ValueError(f"Unknown ATEM target(s): {', '.join(unknown)}")
+        if entry_ids:
+            return [self.coordinators[entry_id] for entry_id in entry_ids]
+        if len(self.coordinators) == 1:
+            return list(self.coordinators.values())
+        if not self.coordinators:
+            raise ValueError("No ATEM coordinator available")
+        raise ValueError("Several ATEM switchers are configured, select a target")
+
+
+    @callback
+    def _async_resolve_area(self, area_id: str) -> List[str]:
+        """Return the entries of the switchers and entities placed in an area."""
+        if ar.async_get(self.hass).async_get_area(area_id) is None:
+            return []
+        entry_ids: Dict[str, None] = {}
+        # Appareils placés dans la zone (leurs entités en héritent), puis
+        # entités placées directement dans la zone
+        for device in dr.async_entries_for_area(dr.async_get(self.hass), area_id):
+            entry_id = self._devices.get(device.id)
+            if entry_id in self.coordinators:
+                entry_ids[entry_id] = None
+        for entity in er.async_entries_for_area(er.async_get(self.hass), area_id):
+            entry_id = self._entities.get(entity.entity_id)
+            if entry_id in self.coordinators:
+                entry_ids[entry_id] = None
+        return list(entry_ids)
+
+
+@callback
+def async_get_target_index(hass: HomeAssistant) -> AtemTargetIndex:
+    """Return the target index, creating it on first use."""
+    index: Optional[AtemTargetIndex] = hass.data.get(DATA_TARGETS)
+    if index is None:
+        index = hass.data[DATA_TARGETS] = AtemTargetIndex(hass)
+    return index
+
+
+@callback
+def async_release_target_index(hass: HomeAssistant) -> None:
+    """Drop the target index once the last entry is unloaded."""
+    index: Optional[AtemTargetIndex] = hass.data.pop(DATA_TARGETS, None)
+    if index is not None:
+        index.async_shutdown()
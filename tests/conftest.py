@@ -0,0 +1,25 @@
+"""Shared setup of the tests, run against the switcher simulator."""
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Le dépôt est lui-même le paquet de l'intégration : son select.py ne doit pas
+# masquer le module standard quand pytest est lancé depuis la racine
+for path in ("", ".", ROOT):
+    while path in sys.path and os.path.abspath(path) == ROOT:
+        sys.path.remove(path)
+if getattr(sys.modules.get("select"), "__file__", "").startswith(ROOT):
+    del sys.modules["select"]
+
+# Importable sous le nom hass_atem, comme dans custom_components
+if "hass_atem" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "hass_atem", os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT]
+    )
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["hass_atem"] = _module
+    _spec.loader.exec_module(_module)
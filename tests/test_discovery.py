@@ -0,0 +1,43 @@
+"""Subnet discovery against simulator listeners."""
+from __future__ import annotations
+
+import asyncio
+
+from homeassistant.core import HomeAssistant
+
+from hass_atem.discovery import MODEL_UNKNOWN, async_discover
+from hass_atem.simulator import AtemSimulator
+
+
+async def _discover(config_dir: str) -> None:
+    hass = HomeAssistant(config_dir)
+    simulators = {
+        "127.0.0.51": AtemSimulator(model="ATEM Mini Extreme ISO", meter_rate=0),
+        "127.0.0.52": AtemSimulator(model="ATEM Mini Extreme ISO", meter_rate=0),
+        # Plus de session libre : trouvé, mais sans modèle
+        "127.0.0.53": AtemSimulator(max_sessions=0, meter_rate=0),
+    }
+    for host, simulator in simulators.items():
+        await simulator.async_start(host)
+    try:
+        # 127.0.0.54 n'a pas de mélangeur et ne répond pas
+        found = await async_discover(
+            hass, ["127.0.0.51", "127.0.0.52", "127.0.0.53", "127.0.0.54"], timeout=0.5
+        )
+        assert found == {
+            "127.0.0.51": "ATEM Mini Extreme ISO",
+            "127.0.0.52": "ATEM Mini Extreme ISO",
+            "127.0.0.53": MODEL_UNKNOWN,
+        }
+        # Les sessions ouvertes par les sondes sont refermées
+        await asyncio.sleep(0.1)
+        assert all(not simulator._sessions for simulator in simulators.values())
+    finally:
+        for simulator in simulators.values():
+            await simulator.async_stop()
+        await hass.async_stop(force=True)
+
+
+def test_discover(tmp_path) -> None:
+    """ATEMs are found with their model; silent hosts are left out."""
+    asyncio.run(_discover(str(tmp_path)))
@@ -0,0 +1,76 @@
+"""Connect, switch and reconnect through the simulator with each transport."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+from homeassistant.core import HomeAssistant
+
+from hass_atem.client import AtemCommand
+from hass_atem.const import TRANSPORT_NATIVE, TRANSPORT_PYATEMMAX
+from hass_atem.coordinator import AtemDataUpdateCoordinator
+from hass_atem.simulator import AtemSimulator
+
+# Une adresse de bouclage par transport : le port ATEM est fixe
+HOSTS = {TRANSPORT_NATIVE: "127.0.0.41", TRANSPORT_PYATEMMAX: "127.0.0.42"}
+
+logging.getLogger("PyATEMMax").setLevel(logging.CRITICAL)
+
+
+async def _wait_for(predicate, timeout: float) -> None:
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.02)
+
+
+async def _connect_switch_reconnect(config_dir: str, transport: str) -> None:
+    host = HOSTS[transport]
+    hass = HomeAssistant(config_dir)
+    simulator = AtemSimulator(meter_rate=0)
+    await simulator.async_start(host)
+    entry = SimpleNamespace(
+        entry_id=f"test_{transport}",
+        title=host,
+        data={"host": host},
+        options={"transport": transport},
+    )
+    coordinator = AtemDataUpdateCoordinator(hass, entry)
+    try:
+        # Connexion : l'état initial du mélangeur est publié
+        await coordinator.async_config_entry_first_refresh()
+        assert coordinator.connection.alive
+        assert coordinator.data["model"] == simulator.model
+        # Abonnement d'une entité program/preview
+        coordinator.async_add_listener(lambda: None)
+        coordinator.async_register_command_handler(
+            ("PrgI", "PrvI"), coordinator.coalescer.async_push
+        )
+        assert coordinator.data["program_name"] == "Camera 1"
+
+        # Commutation : la commande arrive au mélangeur et son écho est publié
+        await coordinator.commands.async_submit(AtemCommand("CPgI", 0, 3))
+        await _wait_for(lambda: coordinator.data["program_name"] == "Camera 3", 5)
+        assert simulator.program[0] == 3
+        simulator.set_preview(0, 4)
+        await _wait_for(lambda: coordinator.data["preview_name"] == "Camera 4", 5)
+
+        # Redémarrage du mélangeur : la perte est détectée, puis la session rouverte
+        await simulator.async_stop()
+        await _wait_for(lambda: not coordinator.connection.alive, 10)
+        simulator.set_program(0, 5)
+        await simulator.async_start(host)
+        assert await coordinator.connection.async_wait_connected(20)
+        await _wait_for(lambda: coordinator.data["program_name"] == "Camera 5", 5)
+        assert coordinator.connection.reconnects == 1
+    finally:
+        await coordinator.async_shutdown()
+        await simulator.async_stop()
+        await hass.async_stop(force=True)
+
+
+@pytest.mark.parametrize("transport", [TRANSPORT_NATIVE, TRANSPORT_PYATEMMAX])
+def test_connect_switch_reconnect(tmp_path, transport: str) -> None:
+    """The coordinator follows the simulator across a restart."""
+    asyncio.run(_connect_switch_reconnect(str(tmp_path), transport))
@@ -0,0 +1,446 @@
+"""Native asyncio transport for the ATEM UDP protocol."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import struct
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from homeassistant.core import HomeAssistant
+
+from .client import AtemClient, AtemCommand
+from .protocol import (
+    ATEM_PORT,
+    FLAG_ACK,
+    FLAG_ACK_REQUEST,
+    FLAG_HELLO,
+    FLAG_REQUEST_RESEND,
+    FLAG_RESEND,
+    HEADER_LEN,
+    HELLO_FULL,
+    PACKET_ID_MASK,
+    ack_packet,
+    encode_audio_levels,
+    encode_aux_source,
+    encode_auto,
+    encode_cut,
+    encode_preview_input,
+    encode_program_input,
+    hello_answer_packet,
+    hello_packet,
+    iter_commands,
+    pack_packet,
+    read_string,
+    unpack_header,
+    unpack_u8_u16,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Cadence de la boucle de maintenance (renvois, timeouts)
+TICK_INTERVAL = 0.05
+# Délai avant de renvoyer un paquet non acquitté
+RESEND_INTERVAL = 0.1
+MAX_RESEND_ATTEMPTS = 10
+# Délai avant de renvoyer un HELLO resté sans réponse
+HELLO_RETRY_INTERVAL = 1.0
+# Sans nouvelles du mélangeur après ce délai, la session est perdue
+CONNECTION_TIMEOUT = 5.0
+
+# Entrée de TlSr : source, drapeaux de tally
+_TALLY_ENTRY = struct.Struct(">HB")
+# AMLv : en-tête (nombre de sources, master, monitor), puis les sources sur
+# 16 bits alignées sur 4 octets, puis gauche, droite, crête gauche, crête droite
+# de chaque source (linéaires sur 24 bits)
+_AMLV_HEADER_LEN = 36
+_AMLV_LEVELS = struct.Struct(">IIII")
+_AMLV_SCALE = 1 / (1 << 23)
+# FMLv : entrée, canal, puis niveaux d'entrée gauche, droite et crêtes (centièmes de dB)
+_FMLV_LEVELS = struct.Struct(">H6xq4h")
+
+
+def _is_newer(packet_id: int, reference: int) -> bool:
+    """Compare two 15-bit packet ids, taking wrap-around into account."""
+    return packet_id != reference and ((packet_id - reference) & PACKET_ID_MASK) < 0x4000
+
+
+class AtemUdpProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol forwarding packets to an AtemAsyncClient."""
+
+    def __init__(self, client: AtemAsyncClient) -> None:
+        """Initialize the protocol."""
+        self._client = client
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """Handle a packet from the switcher."""
+        self._client.handle_packet(data)
+
+    def error_received(self, exc: Exception) -> None:
+        """Handle a socket error (e.g. ICMP port unreachable)."""
+        _LOGGER.debug(f"ATEM UDP error: {exc}")
+
+
+class AtemAsyncClient(AtemClient):
+    """ATEM client speaking the UDP session protocol on the event loop."""
+
+    runs_in_loop = True
+    supports_audio_levels = True
+
+    def __init__(self, hass: HomeAssistant, host: str, port: int = ATEM_PORT) -> None:
+        """Initialize the client."""
+        super().__init__(hass, host)
+        self.port = port
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._unsub_tick: Optional[asyncio.TimerHandle] = None
+        self._connected_event = asyncio.Event()
+
+        # Session
+        self._session_id = 0
+        self._server_session = False
+        self._handshake_started = False
+        self._hello_sent_at = 0.0
+        self._connected = False
+        self._local_packet_id = 0
+        self._last_remote_packet_id = 0
+        # Paquets envoyés en attente d'acquittement : id -> [paquet, envoi, tentatives]
+        self._inflight: Dict[int, List[Any]] = {}
+        self.last_contact = 0.0
+
+        # État du mélangeur
+        self._model = ""
+        self.protocol_version: Tuple[int, int] = (0, 0)
+        self.topology: Dict[str, int] = {}
+        self.program_inputs: Dict[int, int] = {}
+        self.preview_inputs: Dict[int, int] = {}
+        self.aux_sources: Dict[int, int] = {}
+        # M/E en cours de transition (TrPs)
+        self.transitions: Dict[int, bool] = {}
+        # Tally par source (TlSr), remplacé en bloc à chaque paquet
+        self.tally: Dict[int, int] = {}
+        self.input_properties: Dict[int, Tuple[str, str]] = {}
+
+        # Chaque décodeur renvoie l'index concerné (M/E, source, aux) ou None
+        self._decoders: Dict[str, Callable[[bytes], Optional[int]]] = {
+            "_ver": self._decode_ver,
+            "_pin": self._decode_pin,
+            "_top": self._decode_top,
+            "InPr": self._decode_inpr,
+            "PrgI": self._decode_prgi,
+            "PrvI": self._decode_prvi,
+            "AuxS": self._decode_auxs,
+            "TlSr": self._decode_tlsr,
+            "TrPs": self._decode_trps,
+        }
+        # Mesures audio, envoyées au vumètre sans passer par le coordinateur
+        self._level_decoders: Dict[str, Callable[[bytes], None]] = {
+            "AMLv": self._decode_amlv,
+            "FMLv": self._decode_fmlv,
+        }
+
+    @property
+    def connected(self) -> bool:
+        """Return True once the initial state dump has been received."""
+        return self._connected
+
+    @property
+    def model(self) -> str:
+        """Return the switcher model name."""
+        return self._model
+
+    @property
+    def me_count(self) -> int:
+        """Return the number of M/Es of the switcher."""
+        return self.topology.get("mes") or 1
+
+    @property
+    def aux_count(self) -> int:
+        """Return the number of aux outputs of the switcher."""
+        return self.topology.get("aux_busses", 0)
+
+    def get_program_input(self, me: int) -> Optional[int]:
+        """Return the program source of an M/E."""
+        return self.program_inputs.get(me)
+
+    def get_preview_input(self, me: int) -> Optional[int]:
+        """Return the preview source of an M/E."""
+        return self.preview_inputs.get(me)
+
+    def get_aux_source(self, aux: int) -> Optional[int]:
+        """Return the source of an aux output."""
+        return self.aux_sources.get(aux)
+
+    def in_transition(self, me: int) -> bool:
+        """Return True while a transition runs on an M/E."""
+        return self.transitions.get(me, False)
+
+    def get_tally(self) -> Dict[int, int]:
+        """Return source -> tally flags (0x01 program, 0x02 preview) from TlSr."""
+        return self.tally
+
+    def get_input_properties(self, source: int) -> Optional[Tuple[str, str]]:
+        """Return the (long name, short name) of a source."""
+        return self.input_properties.get(source)
+
+    def get_all_input_properties(self) -> Dict[int, Tuple[str, str]]:
+        """Return the (long name, short name) of every known source."""
+        return dict(self.input_properties)
+
+    def idle_time(self) -> float:
+        """Return the seconds elapsed since the last packet from the switcher."""
+        return self.hass.loop.time() - self.last_contact
+
+    # Connexion
+
+    async def async_connect(self, timeout: float) -> bool:
+        """Open the session and wait for the initial state dump."""
+        if self._transport is None:
+            self._transport, _ = await self.hass.loop.create_datagram_endpoint(
+                lambda: AtemUdpProtocol(self),
+                remote_addr=(self.host, self.port),
+            )
+            self._start_session()
+            self._schedule_tick()
+
+        try:
+            await asyncio.wait_for(self._connected_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def async_disconnect(self) -> None:
+        """Close the session and the socket."""
+        if self._unsub_tick is not None:
+            self._unsub_tick.cancel()
+            self._unsub_tick = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._connected = False
+        self._connected_event.clear()
+        self._inflight.clear()
+
+    def _start_session(self) -> None:
+        """Reset the session state and send a HELLO."""
+        if self._connected:
+            self._connected = False
+            self._on_connection(False)
+        self._session_id = random.randint(0x0001, 0x7FFF)
+        self._server_session = False
+        self._handshake_started = False
+        self._connected = False
+        self._connected_event.clear()
+        self._local_packet_id = 0
+        self._last_remote_packet_id = 0
+        self._inflight.clear()
+        self._hello_sent_at = self.hass.loop.time()
+        self.last_contact = self._hello_sent_at
+        self._send(hello_packet(self._session_id))
+
+    def _send(self, packet: bytes) -> None:
+        """Send a raw packet."""
+        if self._transport is not None:
+            self._transport.sendto(packet)
+
+    def _schedule_tick(self) -> None:
+        """Schedule the next maintenance tick."""
+        self._unsub_tick = self.hass.loop.call_later(TICK_INTERVAL, self._tick)
+
+    def _tick(self) -> None:
+        """Resend lost packets and detect dead sessions."""
+        now = self.hass.loop.time()
+
+        if not self._handshake_started:
+            if now - self._hello_sent_at >= HELLO_RETRY_INTERVAL:
+                self._start_session()
+        elif now - self.last_contact >= CONNECTION_TIMEOUT:
+            _LOGGER.warning(f"ATEM session with {self.host} timed out, reconnecting")
+            self._start_session()
+        else:
+            for packet_id, entry in list(self._inflight.items()):
+                packet, sent_at, attempts = entry
+                if now - sent_at < RESEND_INTERVAL:
+                    continue
+                if attempts >= MAX_RESEND_ATTEMPTS:
+                    _LOGGER.warning(f"ATEM packet {packet_id} never acknowledged, reconnecting")
+                    self._start_session()
+                    break
+                entry[1] = now
+                entry[2] = attempts + 1
+                self._send(bytes([packet[0] | (FLAG_RESEND << 3)]) + packet[1:])
+
+        self._schedule_tick()
+
+    # Réception
+
+    def handle_packet(self, data: bytes) -> None:
+        """Process a packet received from the switcher."""
+        if len(data) < HEADER_LEN:
+            return
+        flags, length, session_id, ack_id, resend_id, packet_id = unpack_header(data)
+        self.last_contact = self.hass.loop.time()
+
+        if flags & FLAG_HELLO:
+            if len(data) > HEADER_LEN and data[HEADER_LEN] == HELLO_FULL:
+                _LOGGER.warning(f"ATEM at {self.host} has no free client slot")
+                return
+            self._handshake_started = True
+            self._send(hello_answer_packet(self._session_id))
+            return
+
+        # Le mélangeur attribue son propre identifiant de session après le HELLO
+        if not self._server_session:
+            self._session_id = session_id
+            self._server_session = True
+        elif session_id != self._session_id:
+            return
+
+        if flags & FLAG_ACK:
+            for inflight_id in list(self._inflight):
+                if not _is_newer(inflight_id, ack_id):
+                    del self._inflight[inflight_id]
+
+        if flags & FLAG_REQUEST_RESEND:
+            for inflight_id, entry in self._inflight.items():
+                if not _is_newer(resend_id, inflight_id):
+                    self._send(entry[0])
+
+        if not flags & FLAG_ACK_REQUEST:
+            return
+
+        expected = (self._last_remote_packet_id + 1) & PACKET_ID_MASK
+        if packet_id == expected:
+            self._last_remote_packet_id = packet_id
+            self._send(ack_packet(self._session_id, packet_id))
+            if length > HEADER_LEN:
+                self._parse_payload(data[HEADER_LEN:length])
+        elif not _is_newer(packet_id, self._last_remote_packet_id):
+            # Renvoi d'un paquet déjà traité : on acquitte de nouveau
+            self._send(ack_packet(self._session_id, packet_id))
+        # Sinon il manque un paquet : le mélangeur le renverra faute d'acquittement
+
+    def _parse_payload(self, payload: bytes) -> None:
+        """Decode the commands of a packet and notify the coordinator."""
+        for name, body in iter_commands(payload):
+            level_decoder = self._level_decoders.get(name)
+            if level_decoder is not None:
+                try:
+                    level_decoder(body)
+                except (struct.error, IndexError) as err:
+                    _LOGGER.debug(f"Malformed ATEM command {name}: {err}")
+                continue
+
+            index = None
+            decoder = self._decoders.get(name)
+            if decoder is not None:
+                try:
+                    index = decoder(body)
+                except (struct.error, IndexError) as err:
+                    _LOGGER.debug(f"Malformed ATEM command {name}: {err}")
+                    continue
+
+            if name == "InCm" and not self._connected:
+                self._connected = True
+                self._connected_event.set()
+                _LOGGER.info(f"Connected to ATEM at {self.host}: {self._model}")
+                self._on_connection(True)
+            elif self._connected:
+                self._on_command(name, index)
+
+    def _decode_ver(self, body: bytes) -> None:
+        self.protocol_version = struct.unpack_from(">HH", body)
+
+    def _decode_pin(self, body: bytes) -> None:
+        self._model = read_string(body, 0, 44)
+
+    def _decode_top(self, body: bytes) -> None:
+        self.topology = {
+            "mes": body[0],
+            "sources": body[1],
+            "color_generators": body[2],
+            "aux_busses": body[3],
+            "downstream_keyers": body[4],
+        }
+
+    def _decode_inpr(self, body: bytes) -> int:
+        (source,) = struct.unpack_from(">H", body)
+        self.input_properties[source] = (read_string(body, 2, 20), read_string(body, 22, 4))
+        return source
+
+    def _decode_prgi(self, body: bytes) -> int:
+        me, source = unpack_u8_u16(body)
+        self.program_inputs[me] = source
+        return me
+
+    def _decode_prvi(self, body: bytes) -> int:
+        me, source = unpack_u8_u16(body)
+        self.preview_inputs[me] = source
+        return me
+
+    def _decode_auxs(self, body: bytes) -> int:
+        aux, source = unpack_u8_u16(body)
+        self.aux_sources[aux] = source
+        return aux
+
+    def _decode_trps(self, body: bytes) -> int:
+        me = body[0]
+        self.transitions[me] = bool(body[1] & 0x01)
+        return me
+
+    def _decode_tlsr(self, body: bytes) -> None:
+        (count,) = struct.unpack_from(">H", body)
+        self.tally = {
+            source: flags for source, flags in _TALLY_ENTRY.iter_unpack(body[2:2 + 3 * count])
+        }
+
+    def _decode_amlv(self, body: bytes) -> None:
+        (count,) = struct.unpack_from(">H", body)
+        sources = struct.unpack_from(f">{count}H", body, _AMLV_HEADER_LEN)
+        offset = _AMLV_HEADER_LEN + 2 * count + 2 * (count & 1)
+        levels = _AMLV_LEVELS.iter_unpack(body[offset:offset + _AMLV_LEVELS.size * count])
+        record = self._on_audio_level
+        for source, (left, right, peak_left, peak_right) in zip(sources, levels):
+            record(
+                source,
+                (left if left > right else right) * _AMLV_SCALE,
+                (peak_left if peak_left > peak_right else peak_right) * _AMLV_SCALE,
+            )
+
+    def _decode_fmlv(self, body: bytes) -> None:
+        source, _channel, left, right, peak_left, peak_right = _FMLV_LEVELS.unpack_from(body)
+        self._on_audio_level(
+            source,
+            10 ** ((left if left > right else right) / 2000),
+            10 ** ((peak_left if peak_left > peak_right else peak_right) / 2000),
+        )
+
+    # Envoi de commandes
+
+    def send_commands(self, payload: bytes) -> None:
+        """Send one or more encoded commands in a single reliable packet."""
+        if not self._connected:
+            raise ConnectionError("ATEM switcher disconnected")
+        self._local_packet_id = (self._local_packet_id + 1) & PACKET_ID_MASK
+        packet = pack_packet(
+            FLAG_ACK_REQUEST, self._session_id, payload, packet_id=self._local_packet_id
+        )
+        self._inflight[self._local_packet_id] = [packet, self.hass.loop.time(), 0]
+        self._send(packet)
+
+    async def async_send_commands(self, commands: Sequence[AtemCommand]) -> None:
+        """Send commands to the switcher, packed in a single packet."""
+        self.send_commands(b"".join(
+            _ENCODERS[command.name](command) for command in commands
+        ))
+
+
+# Encodage des commandes sortantes
+_ENCODERS: Dict[str, Callable[[AtemCommand], bytes]] = {
+    "DCut": lambda command: encode_cut(command.index),
+    "DAut": lambda command: encode_auto(command.index),
+    "CPgI": lambda command: encode_program_input(command.index, command.source),
+    "CPvI": lambda command: encode_preview_input(command.index, command.source),
+    "CAuS": lambda command: encode_aux_source(command.index, command.source),
+    "SALN": lambda command: encode_audio_levels("SALN", bool(command.index)),
+    "SFLN": lambda command: encode_audio_levels("SFLN", bool(command.index)),
+}